@@ -0,0 +1,53 @@
+# standard library
+import json
+
+# django
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import setup_databases
+from django.test.utils import teardown_databases
+import django
+
+# magnet data
+from benchmarks import operations
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the statements, api requests and time per call of the most "
+        "used operations against a local stand-in of the api, and prints them "
+        "as JSON. Runs on a throw-away test database and a local memory cache"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=100,
+            help="Calls measured once an operation is warm",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=5,
+            help="Calls measured from the cold and database states",
+        )
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1 or options["rounds"] < 1:
+            raise CommandError("--repeat and --rounds must be at least 1")
+
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = operations.run(
+                repeat=options["repeat"], rounds=options["rounds"]
+            )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        self.stdout.write(json.dumps({
+            "database": connection.vendor,
+            "django": django.get_version(),
+            "results": results,
+        }, indent=2))
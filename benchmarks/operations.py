@@ -0,0 +1,200 @@
+"""
+Cost of the operations applications call the most, in statements, requests to
+the api and time per call.
+
+Each operation is measured in up to three states:
+
+    cold -- nothing is stored nor cached, so the api is read
+    database -- the data is stored, but the caches and the client are new
+    warm -- the same client is called again once everything is cached
+
+Requests are answered by benchmarks.server over HTTP, with the transport set
+in MAGNET_DATA_TRANSPORT, so the numbers include the real transport. The cache
+is a local memory one, whatever the project uses.
+"""
+# standard library
+import datetime
+import time
+
+# django
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+
+# magnet data
+from benchmarks.server import APIServer
+from magnet_data.currencies.cache import currency_cache
+from magnet_data.currencies.client import update_values
+from magnet_data.holidays import calendar
+from magnet_data.magnet_data_client import MagnetDataClient
+
+# the benchmarks clear the cache, so they run on their own instead of the
+# cache of the project, that may be shared with other processes
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "magnet-data-benchmarks",
+    },
+}
+
+DATE = datetime.date(2022, 7, 15)
+HOLIDAY = datetime.date(2022, 9, 19)
+FIRST_BUSINESS_DAY = datetime.date(2022, 1, 3)
+
+
+def clear_caches() -> None:
+    cache.clear()
+    currency_cache.clear_local()
+    calendar.clear()
+
+
+def clear() -> None:
+    """
+    Deletes everything stored and cached
+    """
+    clear_caches()
+    for model_name in ("CurrencyValue", "SyncState", "Holiday", "HolidayRefresh"):
+        model = apps.get_model(app_label="magnet_data", model_name=model_name)
+        model.objects.all().delete()
+
+
+def measure(server: APIServer, name: str, state: str, function,
+            setup=None, repeat: int = 1) -> dict:
+    """
+    Calls {function} {repeat} times, after calling {setup} if given, and returns
+    the statements, requests and seconds per call. Only {function} is measured
+    """
+    queries = 0
+    requests = 0
+    seconds = 0
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+
+        first_request = server.requests
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            function()
+            seconds += time.perf_counter() - start
+
+        queries += len(context.captured_queries)
+        requests += server.requests - first_request
+
+    return {
+        "operation": name,
+        "state": state,
+        "calls": repeat,
+        "queries": round(queries / repeat, 2),
+        "http_calls": round(requests / repeat, 2),
+        "seconds": round(seconds / repeat, 6),
+    }
+
+
+def measure_states(server: APIServer, name: str, get_function,
+                   repeat: int, rounds: int) -> list:
+    """
+    Measures the function that {get_function} returns for a new client in the
+    cold, database and warm states
+    """
+    functions = {}
+
+    def setup_cold():
+        clear()
+        functions["cold"] = get_function(MagnetDataClient())
+
+    def setup_database():
+        clear_caches()
+        functions["database"] = get_function(MagnetDataClient())
+
+    results = [
+        measure(
+            server,
+            name,
+            "cold",
+            lambda: functions["cold"](),
+            setup=setup_cold,
+            repeat=rounds,
+        ),
+        measure(
+            server,
+            name,
+            "database",
+            lambda: functions["database"](),
+            setup=setup_database,
+            repeat=rounds,
+        ),
+    ]
+
+    # the last client of the database state already cached everything
+    results.append(measure(
+        server, name, "warm", functions["database"], repeat=repeat
+    ))
+    return results
+
+
+def on_date(base_currency: str, counter_currency: str):
+    def get_function(client):
+        pair = client.currencies.get_pair(base_currency, counter_currency)
+        return lambda: pair.on_date(DATE)
+    return get_function
+
+
+def is_business_day(client):
+    return lambda: client.holidays.is_business_day(HOLIDAY, "CL")
+
+
+def get_next_business_day(business_days_count: int):
+    def get_function(client):
+        return lambda: client.holidays.get_next_business_day(
+            "CL", business_days_count, from_date=FIRST_BUSINESS_DAY
+        )
+    return get_function
+
+
+def get_business_days_count(client):
+    return lambda: client.holidays.get_business_days_count(
+        "CL", datetime.date(2013, 1, 1), datetime.date(2022, 12, 31)
+    )
+
+
+def run(repeat: int = 100, rounds: int = 5) -> list:
+    """
+    Measures every operation, calling it {repeat} times once warm, and
+    {rounds} times from the cold and database states, which are set up again
+    before each call
+    """
+    operations = [
+        ("CurrencyPair.on_date", on_date("USD", "CLP")),
+        ("CurrencyPair.on_date, cross pair", on_date("USD", "EUR")),
+        ("Holidays.is_business_day", is_business_day),
+    ] + [
+        (
+            f"Holidays.get_next_business_day, {count} days",
+            get_next_business_day(count),
+        )
+        for count in (1, 30, 365)
+    ] + [
+        ("Holidays.get_business_days_count, 10 years", get_business_days_count),
+    ]
+
+    results = []
+    with APIServer() as server, override_settings(
+        MAGNET_DATA_API_URL=server.url,
+        CACHES=CACHES,
+    ):
+        for name, get_function in operations:
+            results += measure_states(server, name, get_function, repeat, rounds)
+
+        def write_month():
+            update_values(DATE.year, DATE.month, "USD", "CLP")
+
+        name = "update_values, a month"
+        results.append(measure(
+            server, name, "cold", write_month, setup=clear, repeat=rounds
+        ))
+        results.append(measure(server, name, "warm", write_month, repeat=rounds))
+
+        clear()
+    return results
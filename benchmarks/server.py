@@ -0,0 +1,144 @@
+"""
+A local stand-in for data.magnet.cl, served over HTTP from a thread of the
+benchmark process, so the benchmarks measure the real transport without
+reaching the network.
+
+Every currency has a value on each day, and every country the same holidays
+on each year. Holidays are answered with an ETag, and with a 304 when the
+request carries it, like the api does.
+"""
+# standard library
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import datetime
+import hashlib
+import json
+import re
+import threading
+
+CURRENCY_PATH = re.compile(
+    r"/currencies/(?P<base>[a-z]+)/(?P<counter>[a-z]+)/"
+    r"(?P<year>\d{4})/(?P<month>\d{2})/$"
+)
+HOLIDAY_PATH = re.compile(r"/holidays/(?P<country>[a-z]+)/(?P<year>\d{4})/$")
+
+CLP_VALUES = {
+    "usd": Decimal("900.5"),
+    "eur": Decimal("950.25"),
+    "clf": Decimal("33000.75"),
+    "utm": Decimal("59000"),
+}
+
+
+def currency_objects(base_currency: str, year: int, month: int) -> list:
+    date = datetime.date(year, month, 1)
+    objects = []
+    while date.month == month:
+        value = CLP_VALUES.get(base_currency, Decimal("100")) + date.day
+        objects.append({"date": date.isoformat(), "value": str(value)})
+        date += datetime.timedelta(days=1)
+    return objects
+
+
+def holiday_objects(year: int) -> list:
+    return [
+        {"date": datetime.date(year, month, day).isoformat(), "name": name}
+        for month, day, name in (
+            (1, 1, "Año Nuevo"),
+            (5, 1, "Día del Trabajo"),
+            (9, 18, "Independencia Nacional"),
+            (9, 19, "Día de las Glorias del Ejército"),
+            (12, 25, "Navidad"),
+        )
+    ]
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are written apart, so Nagle's algorithm would delay
+    # every response of a kept alive connection
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.count_request()
+        path = self.path[len(self.server.prefix):]
+
+        match = CURRENCY_PATH.search(path)
+        if match and match["counter"] == "clp":
+            objects = currency_objects(
+                match["base"], int(match["year"]), int(match["month"])
+            )
+            self.send_json({"objects": objects})
+            return
+
+        match = HOLIDAY_PATH.search(path)
+        if match:
+            self.send_json(
+                {"objects": holiday_objects(int(match["year"]))}, etag=True
+            )
+            return
+
+        self.send_body(404, b"")
+
+    def send_json(self, data: dict, etag: bool = False) -> None:
+        body = json.dumps(data).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if etag:
+            headers["ETag"] = f'"{hashlib.sha256(body).hexdigest()}"'
+            if self.headers.get("If-None-Match") == headers["ETag"]:
+                self.send_body(304, b"", headers)
+                return
+        self.send_body(200, body, headers)
+
+    def send_body(self, status: int, body: bytes, headers: dict = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class APIServer(ThreadingHTTPServer):
+    """
+    Serves the stand-in api on a free local port until stopped, counting the
+    requests it answers
+    """
+
+    daemon_threads = True
+    prefix = "/api/v1"
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), RequestHandler)
+        self.requests = 0
+        self.requests_lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{self.prefix}/"
+
+    def count_request(self) -> None:
+        with self.requests_lock:
+            self.requests += 1
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+    def __enter__(self) -> "APIServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,175 @@
+"""
+Write cost of storing the values fetched from the api.
+
+Measures the statements and time spent by currencies.client.update_values
+and Holiday.update_holidays to store a month and a year of data, on an empty
+table (cold) and rewriting the same rows (warm), next to the row by row
+update_or_create they replaced.
+
+Usage:
+
+    python -m benchmarks.upserts
+
+Runs against a throw-away test database of the default database in
+tests/settings.py, which is SQLite unless MAGNETDATA_TEST_POSTGRES_NAME is
+set.
+"""
+# standard library
+from contextlib import contextmanager
+from decimal import Decimal
+import datetime
+import json
+import os
+import time
+import unittest
+
+
+@contextmanager
+def stub_api(objects: list):
+    """
+    Makes the api answer every request with {objects} within the block
+    """
+    from tests.test_django_magnet_data import stub_transport
+
+    # the helper of the tests undoes its patch with the cleanups of a test case
+    test_case = unittest.TestCase()
+    body = json.dumps({"objects": objects})
+    stub_transport(test_case, lambda url: body)
+    try:
+        yield
+    finally:
+        test_case.doCleanups()
+
+
+def currency_objects(year: int, month: int) -> list:
+    date = datetime.date(year, month, 1)
+    objects = []
+    while date.month == month:
+        objects.append({
+            "date": date.isoformat(),
+            "value": str(Decimal("900.5") + date.day),
+        })
+        date += datetime.timedelta(days=1)
+    return objects
+
+
+def holiday_objects(year: int) -> list:
+    return [
+        {"date": datetime.date(year, month, 10).isoformat(), "name": "Feriado"}
+        for month in range(1, 13)
+    ] + [
+        {"date": datetime.date(year, 9, day).isoformat(), "name": "Fiestas Patrias"}
+        for day in (18, 19)
+    ]
+
+
+def update_values_row_by_row(year: int, month: int) -> None:
+    """
+    The update_or_create per row that update_values used before bulk upserts
+    """
+    from magnet_data.models import CurrencyValue
+
+    for values_data in currency_objects(year, month):
+        CurrencyValue.objects.update_or_create(
+            date=datetime.date.fromisoformat(values_data["date"]),
+            base_currency="USD",
+            counter_currency="CLP",
+            defaults={"value": values_data["value"]},
+        )
+
+
+def update_values_in_bulk(year: int, month: int) -> None:
+    from magnet_data.currencies.client import update_values
+
+    with stub_api(currency_objects(year, month)):
+        update_values(year, month, "USD", "CLP")
+
+
+def update_holidays_in_bulk(year: int) -> None:
+    from magnet_data.models import Holiday
+
+    with stub_api(holiday_objects(year)):
+        Holiday.update_holidays("CL", year)
+
+
+def measure(name: str, state: str, rows: int, function) -> dict:
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+
+    return {
+        "operation": name,
+        "state": state,
+        "rows": rows,
+        "statements": len(context.captured_queries),
+        "seconds": round(seconds, 6),
+    }
+
+
+def run() -> list:
+    from magnet_data.models import CurrencyValue
+    from magnet_data.models import Holiday
+
+    months = {
+        "month": [(2022, 7)],
+        "year": [(2022, month) for month in range(1, 13)],
+    }
+
+    results = []
+    for period, year_months in months.items():
+        rows = sum(
+            len(currency_objects(year, month)) for year, month in year_months
+        )
+        for name, function in (
+            ("update_values (row by row)", update_values_row_by_row),
+            ("update_values", update_values_in_bulk),
+        ):
+            CurrencyValue.objects.all().delete()
+            for state in ("cold", "warm"):
+                results.append(measure(
+                    f"{name}, a {period}",
+                    state,
+                    rows,
+                    lambda: [function(*year_month) for year_month in year_months],
+                ))
+
+    Holiday.objects.all().delete()
+    for state in ("cold", "warm"):
+        results.append(measure(
+            "Holiday.update_holidays, a year",
+            state,
+            len(holiday_objects(2022)),
+            lambda: update_holidays_in_bulk(2022),
+        ))
+
+    return results
+
+
+def main() -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+
+    import django
+    from django.db import connection
+    from django.test.utils import setup_databases
+    from django.test.utils import teardown_databases
+
+    django.setup()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        results = run()
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    print(json.dumps({
+        "database": connection.vendor,
+        "django": django.get_version(),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
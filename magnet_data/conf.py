@@ -0,0 +1,52 @@
+# django
+from django.conf import settings
+
+DEFAULTS = {
+    # seconds that a value not found upstream is remembered as missing, a
+    # falsy value disables it
+    "NEGATIVE_CACHE_TIMEOUT": 300,
+    # entries of the process local cache of currency values, 0 disables it
+    "LOCAL_CACHE_SIZE": 0,
+    # seconds that values that may still change are kept in the local cache
+    "LOCAL_CACHE_TIMEOUT": 60,
+    # whether now() and latest() return the last known value, flagged as
+    # stale, while the current one is fetched in the background
+    "STALE_WHILE_REVALIDATE": False,
+    # seconds during which a single background refresh of a stale value is
+    # started, by any process
+    "REFRESH_TIMEOUT": 60,
+    # seconds that a fetch holds a lock in the django cache so other processes
+    # wait for it instead of repeating it, 0 only coalesces fetches in process
+    "SINGLE_FLIGHT_TIMEOUT": 0,
+    # path of a rate store file that currency values are read from before the
+    # cache and the database, None disables it
+    "RATE_STORE_PATH": None,
+    # times a request to the api that failed with a temporary error is retried
+    "RETRIES": 2,
+    # seconds of the first wait before a retry, each retry waits a random time
+    # up to twice the previous one
+    "RETRY_BACKOFF": 0.5,
+    # consecutive failed requests to the api that open its circuit, 0 disables
+    # the circuit breaker
+    "CIRCUIT_BREAKER_THRESHOLD": 5,
+    # seconds that requests fail without being made while the circuit is open
+    "CIRCUIT_BREAKER_TIMEOUT": 30,
+    # seconds that a process fetching holidays holds its claim, meanwhile
+    # other processes without stored holidays wait for it. None is the longest
+    # a fetch may take with the timeouts and retries set, plus a minute
+    "REFRESH_LEASE_TIMEOUT": None,
+    # root url of the magnet data api
+    "API_URL": "https://data.magnet.cl/api/v1/",
+    # transport used to read the api, a Transport or the dotted path of its class
+    "TRANSPORT": "magnet_data.transport.HTTPTransport",
+    # seconds to wait to connect to the api, and for each read of a response
+    "CONNECT_TIMEOUT": 5,
+    "READ_TIMEOUT": 30,
+}
+
+
+def get_setting(name: str):
+    """
+    Returns the value of the MAGNET_DATA_{name} django setting, or its default
+    """
+    return getattr(settings, f"MAGNET_DATA_{name}", DEFAULTS[name])
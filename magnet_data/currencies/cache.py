@@ -0,0 +1,247 @@
+# standard library
+from collections import OrderedDict
+import datetime
+import threading
+import time
+
+# django
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+# magnet data
+from magnet_data import conf
+from magnet_data.currencies.enums import CurrencyAcronyms
+
+
+def get_cache_key(base_currency: str, counter_currency: str,
+                  date: datetime.date) -> str:
+    """
+    Returns the cache key of the value of a currency pair on a date
+    """
+    return f"md-{base_currency}/{counter_currency}/{date}"
+
+
+def get_missing_cache_key(base_currency: str, counter_currency: str,
+                          date: datetime.date) -> str:
+    """
+    Returns the cache key that marks the value of a currency pair on a date as
+    not found upstream
+    """
+    return f"md-missing-{base_currency}/{counter_currency}/{date}"
+
+
+def get_month_cache_key(base_currency: str, counter_currency: str,
+                        year: int, month: int) -> str:
+    """
+    Returns the cache key of the values of a currency pair on a month
+    """
+    return f"md-{base_currency}/{counter_currency}/{year}-{month:02}"
+
+
+def get_asof_cache_key(base_currency: str, counter_currency: str,
+                       date: datetime.date) -> str:
+    """
+    Returns the cache key of the last value of a currency pair known on a date
+    """
+    return f"md-asof-{base_currency}/{counter_currency}/{date}"
+
+
+def get_refresh_cache_key(base_currency: str, counter_currency: str,
+                          date: datetime.date) -> str:
+    """
+    Returns the cache key that marks the value of a currency pair on a date as
+    being refreshed in the background
+    """
+    return f"md-refresh-{base_currency}/{counter_currency}/{date}"
+
+
+class LocalCache:
+    """
+    A bounded, thread-safe, least recently used cache with expiration, that
+    lives in the memory of the process
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: list) -> dict:
+        now = time.monotonic()
+        values = {}
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is not None and (entry[0] is None or entry[0] > now):
+                    self.entries.move_to_end(key)
+                    values[key] = entry[1]
+                    self.hits += 1
+                else:
+                    if entry is not None:
+                        del self.entries[key]
+                    self.misses += 1
+        return values
+
+    def set(self, key: str, value, timeout) -> None:
+        """
+        Stores {value} for {timeout} seconds, or forever if {timeout} is None
+        """
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys: list) -> None:
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+
+class TieredCache:
+    """
+    The django cache, with an optional LocalCache in front of it that is
+    enabled by the MAGNET_DATA_LOCAL_CACHE_SIZE setting
+    """
+
+    def __init__(self) -> None:
+        self.local_cache = None
+
+    def get_local_cache(self):
+        max_size = conf.get_setting("LOCAL_CACHE_SIZE")
+        if not max_size:
+            return None
+
+        local_cache = self.local_cache
+        if local_cache is None or local_cache.max_size != max_size:
+            local_cache = self.local_cache = LocalCache(max_size)
+        return local_cache
+
+    def get(self, key: str, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: list) -> dict:
+        local_cache = self.get_local_cache()
+        if local_cache is None:
+            return cache.get_many(keys)
+
+        values = local_cache.get_many(keys)
+        missing_keys = [key for key in keys if key not in values]
+        if missing_keys:
+            cached_values = cache.get_many(missing_keys)
+            for key, value in cached_values.items():
+                local_cache.set(key, value, conf.get_setting("LOCAL_CACHE_TIMEOUT"))
+            values.update(cached_values)
+        return values
+
+    async def aget_many(self, keys: list) -> dict:
+        """
+        Async version of get_many, for django >= 4.0
+        """
+        local_cache = self.get_local_cache()
+        if local_cache is None:
+            return await cache.aget_many(keys)
+
+        values = local_cache.get_many(keys)
+        missing_keys = [key for key in keys if key not in values]
+        if missing_keys:
+            cached_values = await cache.aget_many(missing_keys)
+            for key, value in cached_values.items():
+                local_cache.set(key, value, conf.get_setting("LOCAL_CACHE_TIMEOUT"))
+            values.update(cached_values)
+        return values
+
+    def set(self, key: str, value, timeout=DEFAULT_TIMEOUT,
+            local_timeout=DEFAULT_TIMEOUT) -> None:
+        """
+        Stores {value} on both caches. {local_timeout} defaults to the
+        MAGNET_DATA_LOCAL_CACHE_TIMEOUT setting, and can be None for values
+        that never change
+        """
+        cache.set(key, value, timeout)
+        self.set_local(key, value, local_timeout)
+
+    async def aset(self, key: str, value, timeout=DEFAULT_TIMEOUT,
+                   local_timeout=DEFAULT_TIMEOUT) -> None:
+        """
+        Async version of set, for django >= 4.0
+        """
+        await cache.aset(key, value, timeout)
+        self.set_local(key, value, local_timeout)
+
+    def set_local(self, key: str, value, local_timeout=DEFAULT_TIMEOUT) -> None:
+        local_cache = self.get_local_cache()
+        if local_cache is not None:
+            if local_timeout is DEFAULT_TIMEOUT:
+                local_timeout = conf.get_setting("LOCAL_CACHE_TIMEOUT")
+            local_cache.set(key, value, local_timeout)
+
+    def delete_many(self, keys: list) -> None:
+        cache.delete_many(keys)
+        if self.local_cache is not None:
+            self.local_cache.delete_many(keys)
+
+    def clear_local(self) -> None:
+        if self.local_cache is not None:
+            self.local_cache.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the hits, misses and size of the local cache
+        """
+        if self.local_cache is None:
+            return {"hits": 0, "misses": 0, "size": 0}
+        return self.local_cache.stats()
+
+
+currency_cache = TieredCache()
+
+
+# days after a stored value whose last known value may be that one
+ASOF_INVALIDATION_DAYS = 7
+
+
+def invalidate(currency: str, dates: list) -> None:
+    """
+    Deletes every cached entry derived from the values of {currency} in CLP on
+    {dates}: the values and misses of every pair that includes it on those
+    dates, and their months
+    """
+    pairs = []
+    for other_currency, _ in CurrencyAcronyms.django_model_choices:
+        pairs.append((currency, other_currency))
+        if other_currency != currency:
+            pairs.append((other_currency, currency))
+
+    keys = []
+    months = {(date.year, date.month) for date in dates}
+    # the last values known on the following days may be the new ones
+    asof_dates = {
+        date + datetime.timedelta(days=days)
+        for date in dates
+        for days in range(ASOF_INVALIDATION_DAYS + 1)
+    }
+    for base_currency, counter_currency in pairs:
+        for date in dates:
+            keys.append(get_cache_key(base_currency, counter_currency, date))
+            keys.append(get_missing_cache_key(base_currency, counter_currency, date))
+        for date in asof_dates:
+            keys.append(get_asof_cache_key(base_currency, counter_currency, date))
+        for year, month in months:
+            keys.append(
+                get_month_cache_key(base_currency, counter_currency, year, month)
+            )
+
+    currency_cache.delete_many(keys)
@@ -1,14 +1,19 @@
 # standard library
-from urllib.request import Request
-from urllib.request import urlopen
 import datetime
-import json
+import hashlib
 
 # django
 from django.apps import apps
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 
 # magnet data
-from magnet_data.currencies.urls import API_URL
+from magnet_data import resilience
+from magnet_data import transport
+from magnet_data import utils
+from magnet_data.singleflight import flights
+from magnet_data.currencies import cache as currencies_cache
 
 
 def get_url(year: int, month: int, base_currency: str, counter_currency: str) -> str:
@@ -22,36 +27,247 @@ def get_url(year: int, month: int, base_currency: str, counter_currency: str) ->
     if month < 10:
         month = "0{}".format(month)
 
-    return f"{API_URL}{base_currency}/{counter_currency}/{year}/{month}/"
+    return transport.get_url(
+        f"currencies/{base_currency}/{counter_currency}/{year}/{month}/"
+    )
 
 
-def update_values(year: int, month: int, base_currency: str,
-                  counter_currency: str) -> None:
+def fetch_values(year: int, month: int, base_currency: str,
+                 counter_currency: str) -> dict:
     """
     Obtain all values of the {month}-{year} month from {base_currency} to
-    {counter_currency}
+    {counter_currency} from the api, by date, without storing them
     """
     url = get_url(year, month, base_currency, counter_currency)
+    return parse_values(resilience.get_json(url))
 
-    request = Request(url)
 
-    response = urlopen(request)
-    data = json.loads(response.read())
+async def afetch_values(year: int, month: int, base_currency: str,
+                        counter_currency: str) -> dict:
+    """
+    Async version of fetch_values
+    """
+    url = get_url(year, month, base_currency, counter_currency)
+    return parse_values(await resilience.aget_json(url))
+
 
+def parse_values(data: dict) -> dict:
+    """
+    Returns the values of an api response, by date
+    """
+    values = {}
     for values_data in data["objects"]:
         date_string = values_data["date"]
         date = datetime.datetime.strptime(date_string, "%Y-%m-%d").date()
+        values[date] = values_data["value"]
+    return values
 
-        CurrencyValue = apps.get_model(
-            app_label='magnet_data',
-            model_name='CurrencyValue'
-        )
 
-        CurrencyValue.objects.update_or_create(
+def save_values(base_currency: str, counter_currency: str, values: dict,
+                sync_states: list = ()) -> None:
+    """
+    Stores the {values}, by date, of {base_currency} as {counter_currency} with
+    a single bulk upsert, along with the {sync_states} of the months they were
+    fetched for
+    """
+    if not values and not sync_states:
+        return
+
+    CurrencyValue = apps.get_model(
+        app_label='magnet_data',
+        model_name='CurrencyValue'
+    )
+    SyncState = apps.get_model(
+        app_label='magnet_data',
+        model_name='SyncState'
+    )
+
+    currency_values = [
+        CurrencyValue(
             date=date,
             base_currency=base_currency,
             counter_currency=counter_currency,
-            defaults={
-                "value": values_data["value"],
-            },
+            value=value,
+        )
+        for date, value in values.items()
+    ]
+
+    with transaction.atomic():
+        if values:
+            utils.bulk_upsert(
+                CurrencyValue.objects.filter(
+                    base_currency=base_currency,
+                    counter_currency=counter_currency,
+                    date__range=[min(values), max(values)],
+                ),
+                currency_values,
+                unique_fields=["base_currency", "counter_currency", "date"],
+                update_fields=["value"],
+            )
+        utils.bulk_upsert(
+            SyncState.objects.filter(
+                base_currency=base_currency,
+                counter_currency=counter_currency,
+                year__in={sync_state.year for sync_state in sync_states},
+            ),
+            list(sync_states),
+            unique_fields=["base_currency", "counter_currency", "year", "month"],
+            update_fields=["fetched_at", "row_count", "content_hash", "closed"],
         )
+
+    if values:
+        # values that were not found before may have been published now, and
+        # months that were cached may be complete now
+        currencies_cache.invalidate(base_currency, list(values))
+
+
+def get_content_hash(values: dict) -> str:
+    """
+    Returns the SHA-256 hash of {values}, by date, which does not depend on
+    their order
+    """
+    content = "\n".join(
+        f"{date}={values[date]}" for date in sorted(values)
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def is_closed_month(year: int, month: int) -> bool:
+    """
+    Returns if the month {month}-{year} already ended, so every value of it
+    was published
+    """
+    if month == 12:
+        return datetime.date(year + 1, 1, 1) <= utils.today()
+    return datetime.date(year, month + 1, 1) <= utils.today()
+
+
+def get_sync_state(year: int, month: int, base_currency: str,
+                   counter_currency: str, values: dict,
+                   content_hash: str = None):
+    """
+    Returns an unsaved SyncState recording that {values} are the values of the
+    {month}-{year} month of {base_currency} as {counter_currency} fetched now
+    """
+    SyncState = apps.get_model(
+        app_label='magnet_data',
+        model_name='SyncState'
+    )
+
+    if content_hash is None:
+        content_hash = get_content_hash(values)
+
+    return SyncState(
+        base_currency=base_currency,
+        counter_currency=counter_currency,
+        year=year,
+        month=month,
+        fetched_at=timezone.now(),
+        row_count=len(values),
+        content_hash=content_hash,
+        closed=is_closed_month(year, month),
+    )
+
+
+def sync_values(year: int, month: int, base_currency: str,
+                counter_currency: str, values: dict) -> bool:
+    """
+    Stores the {values} fetched for the {month}-{year} month of {base_currency}
+    as {counter_currency} and its sync state. If they are the same values
+    fetched last time, only the sync state is updated, with a single query.
+    Returns whether the values were written
+    """
+    SyncState = apps.get_model(
+        app_label='magnet_data',
+        model_name='SyncState'
+    )
+
+    content_hash = get_content_hash(values)
+    sync_state = get_sync_state(
+        year, month, base_currency, counter_currency, values, content_hash
+    )
+
+    unchanged = SyncState.objects.filter(
+        base_currency=base_currency,
+        counter_currency=counter_currency,
+        year=year,
+        month=month,
+        content_hash=content_hash,
+    ).update(fetched_at=sync_state.fetched_at, closed=sync_state.closed)
+    if unchanged:
+        return False
+
+    save_values(base_currency, counter_currency, values, [sync_state])
+    return True
+
+
+def get_closed_months(currencies: list, counter_currency: str,
+                      start_date: datetime.date, end_date: datetime.date,
+                      fetched_since: datetime.datetime = None) -> set:
+    """
+    Returns the (currency, year, month) of the closed months of {currencies}
+    as {counter_currency} between two dates that were fetched, which do not
+    need to be fetched again. If {fetched_since} is given, the open months
+    fetched after it are returned too
+    """
+    SyncState = apps.get_model(
+        app_label='magnet_data',
+        model_name='SyncState'
+    )
+
+    fresh = Q(closed=True)
+    if fetched_since is not None:
+        fresh |= Q(fetched_at__gt=fetched_since)
+
+    return {
+        (currency, year, month)
+        for currency, year, month in SyncState.objects.filter(
+            fresh,
+            base_currency__in=currencies,
+            counter_currency=counter_currency,
+            year__range=[start_date.year, end_date.year],
+        ).values_list("base_currency", "year", "month")
+        if (start_date.year, start_date.month) <= (year, month)
+        <= (end_date.year, end_date.month)
+    }
+
+
+def update_values(year: int, month: int, base_currency: str,
+                  counter_currency: str) -> None:
+    """
+    Obtain all values of the {month}-{year} month from {base_currency} to
+    {counter_currency}. Concurrent updates of the same month are coalesced
+    into a single fetch
+    """
+    def update():
+        sync_values(
+            year,
+            month,
+            base_currency,
+            counter_currency,
+            fetch_values(year, month, base_currency, counter_currency),
+        )
+
+    flights.do(get_flight_key(year, month, base_currency, counter_currency), update)
+
+
+def get_flight_key(year: int, month: int, base_currency: str,
+                   counter_currency: str) -> str:
+    return f"currencies/{base_currency}/{counter_currency}/{year}-{month:02}"
+
+
+async def aupdate_values(year: int, month: int, base_currency: str,
+                         counter_currency: str) -> None:
+    """
+    Async version of update_values. The values are fetched without blocking
+    the event loop, and stored in a single transaction
+    """
+    async def update():
+        values = await afetch_values(year, month, base_currency, counter_currency)
+        await utils.run_sync(
+            sync_values, year, month, base_currency, counter_currency, values
+        )
+
+    await flights.ado(
+        get_flight_key(year, month, base_currency, counter_currency), update
+    )
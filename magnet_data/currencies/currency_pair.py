@@ -1,16 +1,53 @@
 # standard library
 from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+import asyncio
 import datetime
+import logging
+import threading
 
 # django
-from django.core.cache import cache
 from django.apps import apps
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Max
+from django.db.models.functions import ExtractMonth
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
 
 # magnet data
+from magnet_data import conf
 from magnet_data import utils
+from magnet_data.currencies.cache import currency_cache
+from magnet_data.currencies.cache import get_asof_cache_key
+from magnet_data.currencies.cache import get_cache_key
+from magnet_data.currencies.cache import get_missing_cache_key
+from magnet_data.currencies.cache import get_month_cache_key
+from magnet_data.currencies.cache import get_refresh_cache_key
 from magnet_data.currencies.enums import CurrencyAcronyms
 from magnet_data.currencies.exceptions import ValueNotFoundException
+from magnet_data.currencies.series import CurrencySeries
+from magnet_data.currencies.store import get_rate_store
+from magnet_data.currencies.client import aupdate_values
+from magnet_data.currencies.client import get_closed_months
 from magnet_data.currencies.client import update_values
+from magnet_data.transport import TransportError
+
+logger = logging.getLogger(__name__)
+
+
+class StaleValue(Decimal):
+    """
+    A value returned while the requested one is refreshed in the background.
+    It is the last known value, from the date stored in its date attribute
+    """
+    stale = True
+
+    def __new__(cls, value, date: datetime.date) -> "StaleValue":
+        stale_value = super().__new__(cls, value)
+        stale_value.date = date
+        return stale_value
 
 
 class CurrencyPair:
@@ -78,25 +115,51 @@ class CurrencyPair:
         """
         return self.last_knowable_date() >= date
 
-    def on_date(self, date: datetime.date) -> Decimal:
-        """returns the value for a given date"""
+    def on_date(self, date: datetime.date, fallback: str = None) -> Decimal:
+        """
+        returns the value for a given date.
+
+        With {fallback} "previous", dates without a value, like weekends and
+        holidays, return the last value known before them (see asof)
+        """
+        if fallback == "previous":
+            return self.asof(date)
+        elif fallback is not None:
+            raise ValueError(f"fallback {fallback} is not a valid choice")
+
         if self.base_currency == self.counter_currency:
             return self.cast_value(1)
 
         if not self.is_conversion_possible(date):
             raise ValueNotFoundException(self, date)
 
+        rate_store = get_rate_store()
+        if rate_store is not None:
+            try:
+                return self.cast_value(self.get_value_from_clp_values(
+                    rate_store.get_clp_values(date, self.clp_currencies())
+                ))
+            except KeyError:
+                pass
+
         CurrencyValue = apps.get_model(
             app_label='magnet_data',
             model_name='CurrencyValue'
         )
 
-        cache_key = f"md-{self.base_currency}/{self.counter_currency}/{date}"
+        cache_key = get_cache_key(self.base_currency, self.counter_currency, date)
+        missing_cache_key = get_missing_cache_key(
+            self.base_currency, self.counter_currency, date
+        )
 
-        value = cache.get(cache_key)
+        cached_values = currency_cache.get_many([cache_key, missing_cache_key])
+        value = cached_values.get(cache_key)
         if value:
             return self.cast_value(value)
 
+        if cached_values.get(missing_cache_key):
+            raise ValueNotFoundException(self, date)
+
         if self.counter_currency == CurrencyAcronyms.CLP:
             queryset = CurrencyValue.objects.filter(
                 base_currency=self.base_currency,
@@ -107,43 +170,809 @@ class CurrencyPair:
             try:
                 value = queryset.get().value
             except CurrencyValue.DoesNotExist:
-                update_values(
-                    date.year, date.month, self.base_currency, self.counter_currency
-                )
+                # closed months that were fetched have every published value
+                if not get_closed_months(
+                    [self.base_currency], self.counter_currency, date, date
+                ):
+                    update_values(
+                        date.year,
+                        date.month,
+                        self.base_currency,
+                        self.counter_currency,
+                    )
 
                 try:
                     value = queryset.get().value
                 except CurrencyValue.DoesNotExist:
+                    negative_cache_timeout = conf.get_setting("NEGATIVE_CACHE_TIMEOUT")
+                    if negative_cache_timeout:
+                        currency_cache.set(
+                            missing_cache_key,
+                            True,
+                            timeout=negative_cache_timeout,
+                            local_timeout=negative_cache_timeout,
+                        )
                     raise ValueNotFoundException(self, date)
         else:
-            base_value = CurrencyPair(
-                base_currency=self.base_currency,
-                counter_currency=CurrencyAcronyms.CLP,
-            ).on_date(date)
+            clp_values = get_clp_values_on_date(date, self.clp_currencies())
+            try:
+                value = self.get_value_from_clp_values(clp_values)
+            except KeyError:
+                raise ValueNotFoundException(self, date)
 
-            counter_value = CurrencyPair(
-                base_currency=self.counter_currency,
-                counter_currency=CurrencyAcronyms.CLP,
-            ).on_date(date)
+        # values of past dates do not change, so the local cache keeps them
+        if date < utils.today():
+            currency_cache.set(cache_key, value, local_timeout=None)
+        else:
+            currency_cache.set(cache_key, value)
+        return self.cast_value(value)
+
+    def asof(self, date: datetime.date) -> Decimal:
+        """
+        Returns the last value known on or before {date}, so a saturday gets
+        the value of the previous friday. Dates after the last knowable date
+        get the latest value.
+
+        The value is read with a single "latest date <= {date}" query per
+        currency in CLP. The month of {date} is fetched only when that value
+        is older than MAX_DAYS_WITHOUT_VALUES days, or {date} is recent and
+        has no value yet, and not again while that miss is cached. The value
+        found is cached for {date}. If the api fails, the stored value is
+        returned without caching it
+        """
+        if self.base_currency == self.counter_currency:
+            return self.cast_value(1)
+
+        date = min(date, self.last_knowable_date())
+        asof_cache_key = get_asof_cache_key(
+            self.base_currency, self.counter_currency, date
+        )
+        missing_cache_key = get_missing_cache_key(
+            self.base_currency, self.counter_currency, date
+        )
+
+        cached_values = currency_cache.get_many([asof_cache_key, missing_cache_key])
+        value = cached_values.get(asof_cache_key)
+        if value:
+            return self.cast_value(value)
+
+        # values of recent dates may not be published yet
+        recent_date = utils.today() - datetime.timedelta(MAX_DAYS_WITHOUT_VALUES)
+
+        last_date, value = self.get_last_known_value(date)
+        if not self.is_last_known_date(last_date, date, recent_date):
+            if not cached_values.get(missing_cache_key):
+                # closed months that were fetched have every published value
+                closed_months = get_closed_months(
+                    self.clp_currencies(), CurrencyAcronyms.CLP, date, date
+                )
+                try:
+                    for currency in get_open_currencies(
+                        self.clp_currencies(), closed_months, date
+                    ):
+                        update_values(
+                            date.year, date.month, currency, CurrencyAcronyms.CLP
+                        )
+                except TransportError:
+                    # the stored value is the last known one while the api fails
+                    if last_date is None:
+                        raise
+                    logger.warning(
+                        "Using the stored value of %s on %s", self, last_date,
+                        exc_info=True,
+                    )
+                    return self.cast_value(value)
+                last_date, value = self.get_last_known_value(date)
+
+            if last_date != date:
+                negative_cache_timeout = conf.get_setting("NEGATIVE_CACHE_TIMEOUT")
+                if negative_cache_timeout:
+                    currency_cache.set(
+                        missing_cache_key,
+                        True,
+                        timeout=negative_cache_timeout,
+                        local_timeout=negative_cache_timeout,
+                    )
+
+        if last_date is None:
+            raise ValueNotFoundException(self, date)
+
+        if date < recent_date:
+            currency_cache.set(asof_cache_key, value, local_timeout=None)
+        elif last_date == date:
+            currency_cache.set(asof_cache_key, value)
+        return self.cast_value(value)
+
+    def is_last_known_date(self, last_date: datetime.date, date: datetime.date,
+                           recent_date: datetime.date) -> bool:
+        """
+        Returns if {last_date}, the date of the last stored value on or before
+        {date}, can be trusted to be the last value published on {date}
+        without fetching it
+        """
+        if last_date is None:
+            return False
+        if last_date == date:
+            return True
+        if date >= recent_date:
+            return False
+        return (date - last_date).days <= MAX_DAYS_WITHOUT_VALUES
+
+    async def aon_date(self, date: datetime.date) -> Decimal:
+        """
+        Async version of on_date, for django >= 4.1. The values of both
+        currencies of the pair are fetched concurrently when they are missing
+        """
+        if self.base_currency == self.counter_currency:
+            return self.cast_value(1)
+
+        if not self.is_conversion_possible(date):
+            raise ValueNotFoundException(self, date)
+
+        cache_key = get_cache_key(self.base_currency, self.counter_currency, date)
+        missing_cache_key = get_missing_cache_key(
+            self.base_currency, self.counter_currency, date
+        )
+
+        cached_values = await currency_cache.aget_many([cache_key, missing_cache_key])
+        value = cached_values.get(cache_key)
+        if value:
+            return self.cast_value(value)
+
+        if cached_values.get(missing_cache_key):
+            raise ValueNotFoundException(self, date)
 
-            value = counter_value / base_value
+        clp_values = await aget_clp_values_on_date(date, self.clp_currencies())
+        try:
+            value = self.get_value_from_clp_values(clp_values)
+        except KeyError:
+            raise ValueNotFoundException(self, date)
 
-        cache.set(cache_key, value)
+        if date < utils.today():
+            await currency_cache.aset(cache_key, value, local_timeout=None)
+        else:
+            await currency_cache.aset(cache_key, value)
         return self.cast_value(value)
 
-    def now(self) -> Decimal:
+    async def anow(self) -> Decimal:
         """
-        Return the current value of base_currency as counter_currency
+        Async version of now
         """
-        return self.on_date(utils.today())
+        return await self.aon_date(utils.today())
 
-    def latest(self) -> Decimal:
+    async def alatest(self) -> Decimal:
+        """
+        Async version of latest
+        """
+        return await self.aon_date(self.last_knowable_date())
+
+    def now(self, allow_stale: bool = None) -> Decimal:
+        """
+        Return the current value of base_currency as counter_currency.
+
+        If {allow_stale} is True, or the MAGNET_DATA_STALE_WHILE_REVALIDATE
+        setting is when it is not given, a value that is not cached nor stored
+        yet is not waited for: the last known value is returned as a
+        StaleValue while the current one is fetched in the background
+        """
+        return self.on_date_or_stale(utils.today(), allow_stale)
+
+    def latest(self, allow_stale: bool = None) -> Decimal:
         """
         Return the latest known value of the currency.
         If a currency has predefined values (like CLF) this will return future values.
         For everything else, it will return the same as self.now()
+
+        {allow_stale} works like it does on now()
+        """
+        return self.on_date_or_stale(self.last_knowable_date(), allow_stale)
+
+    def on_date_or_stale(self, date: datetime.date,
+                         allow_stale: bool = None) -> Decimal:
+        """
+        Returns the value on {date} if it is cached or stored. Otherwise, if
+        {allow_stale}, returns the last known value as a StaleValue and starts
+        a single background refresh of the value on {date}
+        """
+        if allow_stale is None:
+            allow_stale = conf.get_setting("STALE_WHILE_REVALIDATE")
+
+        if not allow_stale or self.base_currency == self.counter_currency:
+            return self.on_date(date)
+
+        cache_key = get_cache_key(self.base_currency, self.counter_currency, date)
+        value = currency_cache.get(cache_key)
+        if value:
+            return self.cast_value(value)
+
+        last_date, value = self.get_last_known_value(date)
+        if last_date is None:
+            return self.on_date(date)
+
+        if last_date == date:
+            currency_cache.set(cache_key, value)
+            return self.cast_value(value)
+
+        self.refresh_in_background(date)
+        return StaleValue(self.cast_value(value), date=last_date)
+
+    def get_last_known_value(self, date: datetime.date) -> tuple:
+        """
+        Returns the date and value of the last value of this pair stored on or
+        before {date}, without the inverse applied, or (None, None) if there is
+        none. The date is the oldest of the dates of the values in CLP used
+        """
+        CurrencyValue = apps.get_model(
+            app_label='magnet_data',
+            model_name='CurrencyValue'
+        )
+
+        clp_values = {}
+        dates = []
+        for currency in self.clp_currencies():
+            row = CurrencyValue.objects.filter(
+                base_currency=currency,
+                counter_currency=CurrencyAcronyms.CLP,
+                date__lte=date,
+            ).order_by("-date").values_list("date", "value").first()
+            if row is None:
+                return None, None
+            dates.append(row[0])
+            clp_values[currency] = row[1]
+
+        return min(dates), self.get_value_from_clp_values(clp_values)
+
+    def refresh_in_background(self, date: datetime.date) -> None:
+        """
+        Fetches the value on {date} in a background thread, unless a refresh of
+        it was started by any process during the last
+        MAGNET_DATA_REFRESH_TIMEOUT seconds
+        """
+        refresh_cache_key = get_refresh_cache_key(
+            self.base_currency, self.counter_currency, date
+        )
+        if not cache.add(
+            refresh_cache_key, True, conf.get_setting("REFRESH_TIMEOUT")
+        ):
+            return
+
+        def refresh():
+            try:
+                self.on_date(date)
+            except ValueNotFoundException:
+                pass
+            except Exception:
+                logger.exception("Could not refresh %s on %s", self, date)
+            finally:
+                connections.close_all()
+
+        self.refresh_thread = threading.Thread(target=refresh, daemon=True)
+        self.refresh_thread.start()
+
+    def on_month(self, year: int, month: int) -> dict:
+        """
+        Returns the values of every day of a month whose value is known, as a
+        dict where the key is a datetime.date
+        """
+        start_date, end_date = month_range(year, month)
+
+        if self.base_currency == self.counter_currency:
+            return {
+                start_date + datetime.timedelta(days=days): self.cast_value(1)
+                for days in range((end_date - start_date).days + 1)
+            }
+
+        cache_key = get_month_cache_key(
+            self.base_currency, self.counter_currency, year, month
+        )
+
+        values = currency_cache.get(cache_key)
+        if values is None:
+            values = self.get_values(start_date, end_date)
+            if end_date < utils.today():
+                currency_cache.set(cache_key, values, local_timeout=None)
+            else:
+                currency_cache.set(cache_key, values)
+
+        return {date: self.cast_value(value) for date, value in values.items()}
+
+    def on_range(self,
+                 start_date: datetime.date,
+                 end_date: datetime.date,
+                 chunk_size: int = 2000):
+        """
+        Yields a (datetime.date, Decimal) tuple for every day between two dates
+        whose value is known, ordered by date. Values are streamed from the
+        database {chunk_size} rows at a time, after fetching once each month
+        that is not complete in the database.
+        """
+        if self.base_currency == self.counter_currency:
+            for days in range((end_date - start_date).days + 1):
+                yield start_date + datetime.timedelta(days=days), self.cast_value(1)
+            return
+
+        end_date = min(end_date, self.last_knowable_date())
+        if start_date > end_date:
+            return
+
+        currencies = self.clp_currencies()
+        update_missing_values(
+            currencies,
+            get_last_dates(currencies, start_date, end_date),
+            start_date,
+            end_date,
+        )
+
+        CurrencyValue = apps.get_model(
+            app_label='magnet_data',
+            model_name='CurrencyValue'
+        )
+        rows = CurrencyValue.objects.filter(
+            base_currency__in=currencies,
+            counter_currency=CurrencyAcronyms.CLP,
+            date__range=[start_date, end_date],
+        ).order_by("date").values_list(
+            "date", "base_currency", "value"
+        ).iterator(chunk_size=chunk_size)
+
+        if self.counter_currency == CurrencyAcronyms.CLP:
+            for date, base_currency, value in rows:
+                yield date, self.cast_value(value)
+            return
+
+        for date, date_rows in groupby(rows, key=itemgetter(0)):
+            values = {base_currency: value for _, base_currency, value in date_rows}
+            if len(values) == 2:
+                yield date, self.cast_value(
+                    values[self.counter_currency] / values[self.base_currency]
+                )
+
+    def series(self,
+               start_date: datetime.date,
+               end_date: datetime.date) -> CurrencySeries:
+        """
+        Returns the values between two dates as a CurrencySeries of floats,
+        fetching once each month that is not complete in the database. Values
+        of pairs without CLP are computed as a single division of series
+        """
+        if self.base_currency == self.counter_currency:
+            days = range(start_date.toordinal(), end_date.toordinal() + 1)
+            return CurrencySeries(days, [1.0] * len(days))
+
+        end_date = min(end_date, self.last_knowable_date())
+        if start_date > end_date:
+            return CurrencySeries()
+
+        currencies = self.clp_currencies()
+        update_missing_values(
+            currencies,
+            get_last_dates(currencies, start_date, end_date),
+            start_date,
+            end_date,
+        )
+        clp_series = get_clp_series(currencies, start_date, end_date)
+
+        if self.counter_currency == CurrencyAcronyms.CLP:
+            series = clp_series[self.base_currency]
+        else:
+            series = clp_series[self.counter_currency].divide(
+                clp_series[self.base_currency]
+            )
+
+        if self.inverse_value:
+            return series.inverse()
+        return series
+
+    def get_value_from_clp_values(self, clp_values: dict) -> Decimal:
+        """
+        Returns the value of this pair, without the inverse applied, given the
+        values in CLP of its currencies. Raises KeyError if one is missing
+        """
+        if self.base_currency == self.counter_currency:
+            return Decimal(1)
+
+        if self.counter_currency == CurrencyAcronyms.CLP:
+            return clp_values[self.base_currency]
+
+        return clp_values[self.counter_currency] / clp_values[self.base_currency]
+
+    def convert_many(self, rows) -> list:
         """
-        return self.on_date(self.last_knowable_date())
+        Returns the conversion of each (amount, date) of {rows}, as the amount
+        times the value of this pair on the date, in Decimals. Amounts may be
+        ints, floats or Decimals. Every value is read with a single query,
+        fetching once each month that is not complete in the database. Raises
+        ValueNotFoundException if a value is not known.
+        """
+        rows = list(rows)
+        if not rows:
+            return []
+
+        dates = {date for _, date in rows}
+
+        if self.base_currency == self.counter_currency:
+            rates = {date: self.cast_value(1) for date in dates}
+        else:
+            values = self.get_values(
+                min(dates),
+                max(dates),
+                months={(date.year, date.month) for date in dates},
+            )
+            rates = {}
+            for date in sorted(dates):
+                if date not in values:
+                    raise ValueNotFoundException(self, date)
+                rates[date] = self.cast_value(values[date])
+
+        return [to_decimal(amount) * rates[date] for amount, date in rows]
+
+    def clp_currencies(self) -> list:
+        """
+        Returns the currencies whose values in CLP give the values of this pair
+        """
+        if self.counter_currency == CurrencyAcronyms.CLP:
+            return [self.base_currency]
+        return [self.base_currency, self.counter_currency]
+
+    def get_values(self,
+                   start_date: datetime.date,
+                   end_date: datetime.date,
+                   months: set = None) -> dict:
+        """
+        Returns the values of this pair between two dates, without the inverse
+        applied, by date. Values are read with a single query, fetching once
+        each month that is not complete in the database, or only those of
+        {months}, a set of (year, month), if given.
+        """
+        end_date = min(end_date, self.last_knowable_date())
+        if start_date > end_date:
+            return {}
+
+        currencies = self.clp_currencies()
+        clp_values = get_clp_values(currencies, start_date, end_date)
+
+        last_dates = {}
+        for currency in currencies:
+            for date in clp_values[currency]:
+                key = (currency, date.year, date.month)
+                if date > last_dates.get(key, date.min):
+                    last_dates[key] = date
+
+        if update_missing_values(
+            currencies, last_dates, start_date, end_date, months
+        ):
+            clp_values = get_clp_values(currencies, start_date, end_date)
+
+        if self.counter_currency == CurrencyAcronyms.CLP:
+            return clp_values[self.base_currency]
+
+        base_values = clp_values[self.base_currency]
+        counter_values = clp_values[self.counter_currency]
+        return {
+            date: counter_values[date] / base_value
+            for date, base_value in base_values.items()
+            if date in counter_values
+        }
+
+
+# days in a row a currency can go without a published value, like a weekend
+# next to holidays
+MAX_DAYS_WITHOUT_VALUES = 4
+
+
+def to_decimal(amount) -> Decimal:
+    """
+    Returns {amount} as a Decimal. Floats are converted from their shortest
+    representation, so 0.1 is Decimal("0.1") and not its binary approximation
+    """
+    if isinstance(amount, float):
+        return Decimal(str(amount))
+    return Decimal(amount)
+
+
+def month_range(year: int, month: int) -> tuple:
+    """
+    Returns the first and last date of a month
+    """
+    start_date = datetime.date(year, month, 1)
+    if month == 12:
+        return start_date, datetime.date(year, 12, 31)
+    return start_date, datetime.date(year, month + 1, 1) - datetime.timedelta(1)
+
+
+def get_clp_values(currencies: list,
+                   start_date: datetime.date,
+                   end_date: datetime.date) -> dict:
+    """
+    Returns the values in CLP stored between two dates, by currency and date
+    """
+    CurrencyValue = apps.get_model(
+        app_label='magnet_data',
+        model_name='CurrencyValue'
+    )
+
+    clp_values = {currency: {} for currency in currencies}
+    for base_currency, date, value in CurrencyValue.objects.filter(
+        base_currency__in=currencies,
+        counter_currency=CurrencyAcronyms.CLP,
+        date__range=[start_date, end_date],
+    ).values_list("base_currency", "date", "value"):
+        clp_values[base_currency][date] = value
+    return clp_values
+
+
+def get_clp_series(currencies: list,
+                   start_date: datetime.date,
+                   end_date: datetime.date) -> dict:
+    """
+    Returns the values in CLP stored between two dates as a CurrencySeries by
+    currency, read with a single query
+    """
+    CurrencyValue = apps.get_model(
+        app_label='magnet_data',
+        model_name='CurrencyValue'
+    )
+
+    clp_series = {currency: CurrencySeries() for currency in currencies}
+    for base_currency, date, value in CurrencyValue.objects.filter(
+        base_currency__in=currencies,
+        counter_currency=CurrencyAcronyms.CLP,
+        date__range=[start_date, end_date],
+    ).order_by("base_currency", "date").values_list(
+        "base_currency", "date", "value"
+    ).iterator():
+        series = clp_series[base_currency]
+        series.ordinals.append(date.toordinal())
+        series.values.append(float(value))
+    return clp_series
+
+
+def get_clp_values_on_date(date: datetime.date, currencies: list) -> dict:
+    """
+    Returns the values in CLP of every currency stored on a date, by currency,
+    read with a single query. The months of the {currencies} that are missing
+    are fetched once, unless they were recently not found upstream or are
+    closed months already fetched; those still missing are left out.
+    """
+    CurrencyValue = apps.get_model(
+        app_label='magnet_data',
+        model_name='CurrencyValue'
+    )
+
+    queryset = CurrencyValue.objects.filter(
+        counter_currency=CurrencyAcronyms.CLP,
+        date=date,
+    ).values_list("base_currency", "value")
+
+    clp_values = dict(queryset)
+    missing_currencies = [
+        currency
+        for currency in currencies
+        if currency not in clp_values
+        and CurrencyPair(currency, CurrencyAcronyms.CLP).is_conversion_possible(date)
+    ]
+    if not missing_currencies:
+        return clp_values
+
+    missing_cache_keys = {
+        currency: get_missing_cache_key(currency, CurrencyAcronyms.CLP, date)
+        for currency in missing_currencies
+    }
+    cached_values = currency_cache.get_many(list(missing_cache_keys.values()))
+    missing_currencies = [
+        currency
+        for currency in missing_currencies
+        if not cached_values.get(missing_cache_keys[currency])
+    ]
+    if not missing_currencies:
+        return clp_values
+
+    closed_months = get_closed_months(
+        missing_currencies, CurrencyAcronyms.CLP, date, date
+    )
+    open_currencies = get_open_currencies(missing_currencies, closed_months, date)
+    if open_currencies:
+        for currency in open_currencies:
+            update_values(date.year, date.month, currency, CurrencyAcronyms.CLP)
+        clp_values = dict(queryset.all())
+
+    negative_cache_timeout = conf.get_setting("NEGATIVE_CACHE_TIMEOUT")
+    if negative_cache_timeout:
+        for currency in missing_currencies:
+            if currency not in clp_values:
+                currency_cache.set(
+                    missing_cache_keys[currency],
+                    True,
+                    timeout=negative_cache_timeout,
+                    local_timeout=negative_cache_timeout,
+                )
+
+    return clp_values
+
+
+def get_open_currencies(currencies: list, closed_months: set,
+                        date: datetime.date) -> list:
+    """
+    Returns the {currencies} whose month of {date} is not in {closed_months},
+    so their missing values on {date} may still be fetched
+    """
+    return [
+        currency
+        for currency in currencies
+        if (currency, date.year, date.month) not in closed_months
+    ]
+
+
+async def aget_clp_values_on_date(date: datetime.date, currencies: list) -> dict:
+    """
+    Async version of get_clp_values_on_date. The missing months of the
+    {currencies} are fetched concurrently
+    """
+    CurrencyValue = apps.get_model(
+        app_label='magnet_data',
+        model_name='CurrencyValue'
+    )
+
+    queryset = CurrencyValue.objects.filter(
+        counter_currency=CurrencyAcronyms.CLP,
+        date=date,
+    ).values_list("base_currency", "value")
+
+    clp_values = {currency: value async for currency, value in queryset}
+    missing_currencies = [
+        currency
+        for currency in currencies
+        if currency not in clp_values
+        and CurrencyPair(currency, CurrencyAcronyms.CLP).is_conversion_possible(date)
+    ]
+    if not missing_currencies:
+        return clp_values
+
+    missing_cache_keys = {
+        currency: get_missing_cache_key(currency, CurrencyAcronyms.CLP, date)
+        for currency in missing_currencies
+    }
+    cached_values = await currency_cache.aget_many(
+        list(missing_cache_keys.values())
+    )
+    missing_currencies = [
+        currency
+        for currency in missing_currencies
+        if not cached_values.get(missing_cache_keys[currency])
+    ]
+    if not missing_currencies:
+        return clp_values
+
+    closed_months = await utils.run_sync(
+        get_closed_months, missing_currencies, CurrencyAcronyms.CLP, date, date
+    )
+    open_currencies = get_open_currencies(missing_currencies, closed_months, date)
+    if open_currencies:
+        await asyncio.gather(*[
+            aupdate_values(date.year, date.month, currency, CurrencyAcronyms.CLP)
+            for currency in open_currencies
+        ])
+        clp_values = {currency: value async for currency, value in queryset.all()}
+
+    negative_cache_timeout = conf.get_setting("NEGATIVE_CACHE_TIMEOUT")
+    if negative_cache_timeout:
+        for currency in missing_currencies:
+            if currency not in clp_values:
+                await currency_cache.aset(
+                    missing_cache_keys[currency],
+                    True,
+                    timeout=negative_cache_timeout,
+                    local_timeout=negative_cache_timeout,
+                )
+
+    return clp_values
+
+
+def get_last_dates(currencies: list,
+                   start_date: datetime.date,
+                   end_date: datetime.date) -> dict:
+    """
+    Returns the last date with a value in CLP stored between two dates, by
+    currency, year and month
+    """
+    CurrencyValue = apps.get_model(
+        app_label='magnet_data',
+        model_name='CurrencyValue'
+    )
+
+    return {
+        (row["base_currency"], row["year"], row["month"]): row["last_date"]
+        for row in CurrencyValue.objects.filter(
+            base_currency__in=currencies,
+            counter_currency=CurrencyAcronyms.CLP,
+            date__range=[start_date, end_date],
+        ).annotate(
+            year=ExtractYear("date"),
+            month=ExtractMonth("date"),
+        ).order_by().values(
+            "base_currency", "year", "month"
+        ).annotate(last_date=Max("date"))
+    }
+
+
+def update_missing_values(currencies: list,
+                          last_dates: dict,
+                          start_date: datetime.date,
+                          end_date: datetime.date,
+                          months: set = None) -> bool:
+    """
+    Fetches once each month between two dates that is missing for any of the
+    {currencies}, given the {last_dates} stored by currency, year and month.
+    If {months} is given, only those (year, month) are fetched. Closed months
+    that were already fetched are not fetched again, even if they have gaps,
+    nor are open months fetched less than NEGATIVE_CACHE_TIMEOUT seconds ago.
+    Returns whether anything was fetched.
+    """
+    missing_months = []
+    for currency in currencies:
+        currency_last_dates = {
+            (year, month): date
+            for (last_date_currency, year, month), date in last_dates.items()
+            if last_date_currency == currency
+        }
+        for year, month in get_missing_months(
+            currency_last_dates, start_date, end_date
+        ):
+            if months is None or (year, month) in months:
+                missing_months.append((currency, year, month))
+
+    if not missing_months:
+        return False
+
+    closed_months = get_closed_months(
+        currencies, CurrencyAcronyms.CLP, start_date, end_date,
+        fetched_since=get_fetched_since(),
+    )
+    fetched = False
+    for currency, year, month in missing_months:
+        if (currency, year, month) not in closed_months:
+            update_values(year, month, currency, CurrencyAcronyms.CLP)
+            fetched = True
+    return fetched
+
+
+def get_fetched_since() -> datetime.datetime:
+    """
+    Returns the time after which the open months that were fetched are not
+    fetched again for missing values, like the missing values of on_date, or
+    None if NEGATIVE_CACHE_TIMEOUT disables it
+    """
+    negative_cache_timeout = conf.get_setting("NEGATIVE_CACHE_TIMEOUT")
+    if not negative_cache_timeout:
+        return None
+    return timezone.now() - datetime.timedelta(seconds=negative_cache_timeout)
+
+
+def get_missing_months(last_dates: dict,
+                       start_date: datetime.date,
+                       end_date: datetime.date) -> list:
+    """
+    Returns the (year, month) of the months between two dates whose
+    {last_dates}, by year and month, do not reach the end of the month, or
+    {end_date} if it comes first. Gaps of up to MAX_DAYS_WITHOUT_VALUES days
+    are allowed on closed months.
+    """
+    today = utils.today()
+    missing_months = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        last_expected_date = min(month_range(year, month)[1], end_date)
+        last_date = last_dates.get((year, month))
+
+        if last_date is None:
+            missing_months.append((year, month))
+        elif last_expected_date >= today:
+            # the month is still being published
+            if last_date < last_expected_date:
+                missing_months.append((year, month))
+        elif (last_expected_date - last_date).days > MAX_DAYS_WITHOUT_VALUES:
+            missing_months.append((year, month))
+
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
 
-    def on_month(self, year: int, month: int) -> Decimal:
-        raise NotImplementedError(f"{self.__class__.__name__}.on_month")
+    return missing_months
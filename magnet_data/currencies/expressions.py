@@ -0,0 +1,94 @@
+# django
+from django.apps import apps
+from django.db.models import DecimalField
+from django.db.models import ExpressionWrapper
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import Value
+
+# magnet data
+from magnet_data.currencies.currency_pair import CurrencyPair
+from magnet_data.currencies.enums import CurrencyAcronyms
+
+
+def get_clp_value(currency: str, date) -> Subquery:
+    """
+    Returns a subquery of the stored value of {currency} in CLP on {date},
+    which is either a date or an F() of a date of the outer query
+    """
+    CurrencyValue = apps.get_model(
+        app_label='magnet_data',
+        model_name='CurrencyValue'
+    )
+
+    if isinstance(date, F):
+        date = OuterRef(date.name)
+
+    return Subquery(
+        CurrencyValue.objects.filter(
+            base_currency=currency,
+            counter_currency=CurrencyAcronyms.CLP,
+            date=date,
+        ).order_by().values("value")[:1],
+        output_field=DecimalField(),
+    )
+
+
+class DecimalAmount(ExpressionWrapper):
+    """
+    An amount used in decimal operations. SQLite stores integral decimals as
+    integers, so the amount is cast to a real number there to avoid integer
+    divisions
+    """
+
+    def __init__(self, amount) -> None:
+        super().__init__(amount, output_field=DecimalField())
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.expression)
+        return "CAST(%s AS REAL)" % sql, params
+
+
+class ConvertCurrency(ExpressionWrapper):
+    """
+    Converts an amount from {base_currency} to {counter_currency} inside a
+    query, using the values stored in the CurrencyValue model on {date}, so it
+    can be annotated, filtered and aggregated by the database:
+
+        Invoice.objects.annotate(
+            amount_in_clp=ConvertCurrency(
+                F("amount"), base="USD", counter="CLP", date=F("issued_on")
+            )
+        ).aggregate(Sum("amount_in_clp"))
+
+    The amount is converted with the same value that
+    CurrencyPair(base, counter).on_date(date) returns. Values are never fetched
+    from the api, so amounts whose value is not stored convert to NULL.
+    """
+
+    def __init__(self, amount, base: str, counter: str, date,
+                 output_field=None) -> None:
+        if not hasattr(amount, "resolve_expression"):
+            amount = Value(amount)
+        amount = DecimalAmount(amount)
+
+        pair = CurrencyPair(base_currency=base, counter_currency=counter)
+
+        if pair.base_currency == pair.counter_currency:
+            expression = amount
+        elif pair.counter_currency != CurrencyAcronyms.CLP:
+            expression = (
+                amount
+                * get_clp_value(pair.counter_currency, date)
+                / get_clp_value(pair.base_currency, date)
+            )
+        elif pair.inverse_value:
+            expression = amount / get_clp_value(pair.base_currency, date)
+        else:
+            expression = amount * get_clp_value(pair.base_currency, date)
+
+        if output_field is None:
+            output_field = DecimalField()
+
+        super().__init__(expression, output_field=output_field)
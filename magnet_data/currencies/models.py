@@ -42,3 +42,55 @@ class CurrencyValue(models.Model):
 
     def __str__(self) -> str:
         return f"{self.base_currency}/{self.counter_currency}-{self.date}-{self.value}"
+
+
+class SyncState(models.Model):
+    """
+    Stores when the values of a month of a currency pair were last fetched
+    from the api, and a hash of them, so closed months are not fetched again
+    and unchanged months are not written again
+    """
+
+    base_currency = models.CharField(
+        _("base currency"),
+        max_length=5,
+        help_text=_("The acronym of the base currency"),
+        choices=CurrencyAcronyms.django_model_choices,
+    )
+    counter_currency = models.CharField(
+        _("counter currency"),
+        max_length=5,
+        help_text=_("The acronym of the counter currency"),
+        choices=CurrencyAcronyms.django_model_choices,
+    )
+    year = models.PositiveIntegerField(_("year"))
+    month = models.PositiveSmallIntegerField(_("month"))
+    fetched_at = models.DateTimeField(
+        _("fetched at"),
+        help_text=_("When the values of the month were last fetched from the api"),
+    )
+    row_count = models.PositiveIntegerField(
+        _("row count"),
+        help_text=_("The number of values of the month in the api"),
+    )
+    content_hash = models.CharField(
+        _("content hash"),
+        max_length=64,
+        help_text=_("The SHA-256 hash of the values of the month in the api"),
+    )
+    closed = models.BooleanField(
+        _("closed"),
+        default=False,
+        help_text=_("Whether the month had ended when it was fetched"),
+    )
+
+    class Meta:
+        verbose_name = _("sync state")
+        verbose_name_plural = _("sync states")
+        unique_together = (("base_currency", "counter_currency", "year", "month"),)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.base_currency}/{self.counter_currency}-"
+            f"{self.year}-{self.month:02}-{self.fetched_at}"
+        )
@@ -0,0 +1,209 @@
+# -*- encoding: utf-8 -*-
+""" Compact series of currency values """
+
+# standard library
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+import datetime
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def to_array(typecode: str, items) -> array:
+    """
+    Returns an array of {items}, copying the buffer of NumPy arrays at once
+    """
+    if numpy is not None and isinstance(items, numpy.ndarray):
+        return array(typecode, items.astype(typecode).tobytes())
+    return array(typecode, items)
+
+
+class CurrencySeries:
+    """
+    The values of a currency pair on a sequence of days, stored as a sorted
+    array of date ordinals and an array of floats, so years of values take a
+    few bytes per day and lookups are a bisect.
+
+    Operations return new series and never create Decimal objects.
+    """
+
+    def __init__(self, ordinals=(), values=()) -> None:
+        self.ordinals = to_array("l", ordinals)
+        self.values = to_array("d", values)
+        if len(self.ordinals) != len(self.values):
+            raise ValueError("ordinals and values must have the same length")
+
+    @classmethod
+    def from_values(cls, values: dict) -> "CurrencySeries":
+        """
+        Returns the series of {values}, a dict of values by date
+        """
+        dates = sorted(values)
+        return cls(
+            (date.toordinal() for date in dates),
+            (float(values[date]) for date in dates),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def __iter__(self):
+        """
+        Yields a (datetime.date, float) tuple for every value of the series
+        """
+        for ordinal, value in zip(self.ordinals, self.values):
+            yield datetime.date.fromordinal(ordinal), value
+
+    def __getitem__(self, date: datetime.date) -> float:
+        """
+        Returns the value on {date}, raising KeyError if there is none
+        """
+        ordinal = date.toordinal()
+        index = bisect_left(self.ordinals, ordinal)
+        if index == len(self.ordinals) or self.ordinals[index] != ordinal:
+            raise KeyError(date)
+        return self.values[index]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CurrencySeries):
+            return NotImplemented
+        return self.ordinals == other.ordinals and self.values == other.values
+
+    def __repr__(self) -> str:
+        if not self.ordinals:
+            return "<CurrencySeries: empty>"
+        return "<CurrencySeries: {} values from {} to {}>".format(
+            len(self),
+            datetime.date.fromordinal(self.ordinals[0]),
+            datetime.date.fromordinal(self.ordinals[-1]),
+        )
+
+    @property
+    def dates(self) -> list:
+        return [datetime.date.fromordinal(ordinal) for ordinal in self.ordinals]
+
+    def asof(self, date: datetime.date):
+        """
+        Returns the last value on or before {date}, or None if the series
+        starts after it
+        """
+        index = bisect_right(self.ordinals, date.toordinal()) - 1
+        if index < 0:
+            return None
+        return self.values[index]
+
+    def forward_fill(self, end_date: datetime.date = None) -> "CurrencySeries":
+        """
+        Returns a series with a value for every day from the first date of this
+        series until {end_date}, or its last date, where days without a value
+        repeat the last known one
+        """
+        if not self.ordinals:
+            return CurrencySeries()
+
+        last_ordinal = self.ordinals[-1]
+        if end_date is not None:
+            last_ordinal = end_date.toordinal()
+
+        ordinals = array("l")
+        values = array("d")
+        index = 0
+        count = len(self.ordinals)
+        for ordinal in range(self.ordinals[0], last_ordinal + 1):
+            while index + 1 < count and self.ordinals[index + 1] <= ordinal:
+                index += 1
+            ordinals.append(ordinal)
+            values.append(self.values[index])
+
+        return CurrencySeries(ordinals, values)
+
+    def resample_month_end(self) -> "CurrencySeries":
+        """
+        Returns a series with the last known value of each month, on the last
+        day of the month
+        """
+        ordinals = array("l")
+        values = array("d")
+        for ordinal, value in zip(self.ordinals, self.values):
+            date = datetime.date.fromordinal(ordinal)
+            if date.month == 12:
+                month_end = datetime.date(date.year, 12, 31)
+            else:
+                month_end = (
+                    datetime.date(date.year, date.month + 1, 1)
+                    - datetime.timedelta(1)
+                )
+            month_end_ordinal = month_end.toordinal()
+            if ordinals and ordinals[-1] == month_end_ordinal:
+                values[-1] = value
+            else:
+                ordinals.append(month_end_ordinal)
+                values.append(value)
+        return CurrencySeries(ordinals, values)
+
+    def inverse(self) -> "CurrencySeries":
+        """
+        Returns the series of the inverse of each value
+        """
+        if numpy is not None:
+            return CurrencySeries(
+                self.ordinals, 1 / numpy.frombuffer(self.values, dtype="d")
+            )
+        return CurrencySeries(self.ordinals, (1 / value for value in self.values))
+
+    def divide(self, other: "CurrencySeries") -> "CurrencySeries":
+        """
+        Returns the series of the values of this series divided by the ones of
+        {other}, on the dates both have. The cross rate of two currencies is
+        the division of their series in a common currency
+        """
+        if numpy is not None:
+            ordinals = numpy.frombuffer(self.ordinals, dtype="l")
+            _, indexes, other_indexes = numpy.intersect1d(
+                ordinals,
+                numpy.frombuffer(other.ordinals, dtype="l"),
+                assume_unique=True,
+                return_indices=True,
+            )
+            values = numpy.frombuffer(self.values, dtype="d")
+            other_values = numpy.frombuffer(other.values, dtype="d")
+            return CurrencySeries(
+                ordinals[indexes], values[indexes] / other_values[other_indexes]
+            )
+
+        other_values = dict(zip(other.ordinals, other.values))
+        ordinals = array("l")
+        values = array("d")
+        for ordinal, value in zip(self.ordinals, self.values):
+            other_value = other_values.get(ordinal)
+            if other_value is not None:
+                ordinals.append(ordinal)
+                values.append(value / other_value)
+        return CurrencySeries(ordinals, values)
+
+    def to_fixed_point(self, decimal_places: int = 6) -> array:
+        """
+        Returns the values as an int64 array of fixed point numbers with
+        {decimal_places} decimal places
+        """
+        scale = 10 ** decimal_places
+        return array("q", (round(value * scale) for value in self.values))
+
+    def to_numpy(self) -> tuple:
+        """
+        Returns the dates as a datetime64 array and the values as a float64
+        array. The values share the memory of the series
+        """
+        if numpy is None:
+            raise ImportError("to_numpy() requires NumPy to be installed")
+
+        # epoch of datetime64, as a date ordinal
+        epoch_ordinal = datetime.date(1970, 1, 1).toordinal()
+        dates = (
+            numpy.frombuffer(self.ordinals, dtype="l") - epoch_ordinal
+        ).astype("datetime64[D]")
+        return dates, numpy.frombuffer(self.values, dtype="d")
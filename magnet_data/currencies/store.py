@@ -0,0 +1,197 @@
+# -*- encoding: utf-8 -*-
+"""
+A file with the values in CLP of every currency, that processes map in memory
+to read values without querying the database or the cache.
+
+The file starts with a header and a table with an entry per currency, followed
+by two int64 arrays per currency: the sorted date ordinals, and the values as
+fixed point numbers with DECIMAL_PLACES decimal places. Numbers are stored in
+the byte order of the machine, since the file is shared by its processes.
+"""
+
+# standard library
+from array import array
+from bisect import bisect_left
+from decimal import Decimal
+import datetime
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+# django
+from django.apps import apps
+
+# magnet data
+from magnet_data.conf import get_setting
+from magnet_data.currencies.enums import CurrencyAcronyms
+
+MAGIC = b"MDRS"
+VERSION = 1
+
+# the decimal places of CurrencyValue.value
+DECIMAL_PLACES = 6
+
+# magic, version, decimal places and number of currencies
+HEADER = struct.Struct("=4sIII")
+# currency, offset of its arrays and number of values
+ENTRY = struct.Struct("=8sQQ")
+
+# seconds between checks of whether the file was replaced
+CHECK_INTERVAL = 5
+
+
+class RateStore:
+    """
+    A rate store file mapped in memory. Lookups are a bisect over the mapped
+    arrays, without copying them
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as store_file:
+            stat = os.fstat(store_file.fileno())
+            self.file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self.mmap = mmap.mmap(store_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buffer = memoryview(self.mmap)
+        magic, version, decimal_places, count = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a rate store")
+        self.decimal_places = decimal_places
+
+        self.currencies = {}
+        for index in range(count):
+            currency, offset, length = ENTRY.unpack_from(
+                buffer, HEADER.size + index * ENTRY.size
+            )
+            size = length * 8
+            self.currencies[currency.rstrip(b"\0").decode()] = (
+                buffer[offset:offset + size].cast("q"),
+                buffer[offset + size:offset + 2 * size].cast("q"),
+            )
+
+    def get(self, currency: str, date: datetime.date):
+        """
+        Returns the value of {currency} in CLP on {date}, or None if it is not
+        in the store
+        """
+        arrays = self.currencies.get(currency)
+        if arrays is None:
+            return None
+
+        ordinals, values = arrays
+        ordinal = date.toordinal()
+        index = bisect_left(ordinals, ordinal)
+        if index == len(ordinals) or ordinals[index] != ordinal:
+            return None
+        return Decimal(values[index]).scaleb(-self.decimal_places)
+
+    def get_clp_values(self, date: datetime.date, currencies: list) -> dict:
+        """
+        Returns the values in CLP of {currencies} on {date} that are in the
+        store, by currency
+        """
+        clp_values = {}
+        for currency in currencies:
+            value = self.get(currency, date)
+            if value is not None:
+                clp_values[currency] = value
+        return clp_values
+
+    def is_current(self) -> bool:
+        """
+        Returns if the file was not replaced since it was mapped
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self.file_id
+
+
+def write_rate_store(path: str) -> int:
+    """
+    Writes every value in CLP stored in the database to a rate store at
+    {path}. The file is written next to it and then renamed, so processes
+    reading it never see a partial file. Returns the number of values written
+    """
+    CurrencyValue = apps.get_model(
+        app_label='magnet_data',
+        model_name='CurrencyValue'
+    )
+
+    scale = 10 ** DECIMAL_PLACES
+    arrays = {}
+    for base_currency, date, value in CurrencyValue.objects.filter(
+        counter_currency=CurrencyAcronyms.CLP,
+    ).order_by("base_currency", "date").values_list(
+        "base_currency", "date", "value"
+    ).iterator():
+        if base_currency not in arrays:
+            arrays[base_currency] = (array("q"), array("q"))
+        ordinals, values = arrays[base_currency]
+        ordinals.append(date.toordinal())
+        values.append(int(value * scale))
+
+    offset = HEADER.size + len(arrays) * ENTRY.size
+    header = HEADER.pack(MAGIC, VERSION, DECIMAL_PLACES, len(arrays))
+    entries = []
+    for currency, (ordinals, values) in arrays.items():
+        entries.append(ENTRY.pack(currency.encode(), offset, len(ordinals)))
+        offset += len(ordinals) * 16
+
+    directory = os.path.dirname(os.path.abspath(path))
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(file_descriptor, "wb") as store_file:
+            store_file.write(header)
+            store_file.write(b"".join(entries))
+            for ordinals, values in arrays.values():
+                store_file.write(ordinals.tobytes())
+                store_file.write(values.tobytes())
+            store_file.flush()
+            os.fsync(store_file.fileno())
+        os.chmod(temporary_path, 0o644)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+    return sum(len(ordinals) for ordinals, _ in arrays.values())
+
+
+stores = {}
+stores_lock = threading.Lock()
+
+
+def get_rate_store():
+    """
+    Returns the rate store at the MAGNET_DATA_RATE_STORE_PATH setting, mapped
+    once per process and mapped again when the file is replaced, or None if
+    the setting is not set or the file does not exist
+    """
+    path = get_setting("RATE_STORE_PATH")
+    if not path:
+        return None
+
+    now = time.monotonic()
+    store, checked_at = stores.get(path, (None, None))
+    if checked_at is not None and now - checked_at < CHECK_INTERVAL:
+        return store
+
+    with stores_lock:
+        store, checked_at = stores.get(path, (None, None))
+        if checked_at is not None and now - checked_at < CHECK_INTERVAL:
+            return store
+
+        if store is None or not store.is_current():
+            try:
+                store = RateStore(path)
+            except FileNotFoundError:
+                store = None
+        stores[path] = (store, now)
+
+    return store
@@ -1 +0,0 @@
-API_URL = "https://data.magnet.cl/api/v1/currencies/"
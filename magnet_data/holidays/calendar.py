@@ -0,0 +1,468 @@
+# -*- encoding: utf-8 -*-
+""" Compiled, in-memory holiday calendars """
+
+# standard library
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+import datetime
+import threading
+
+# django
+from django.apps import apps
+from django.utils import timezone
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+class YearNotLoaded(LookupError):
+    """
+    Exception raised when a computation needs a year that was not loaded
+
+    Attributes:
+        year -- the missing year
+    """
+
+    def __init__(self, year: int) -> None:
+        self.year = year
+        super().__init__(f"{year} was not loaded")
+
+
+class CompiledYear:
+    """
+    The holidays of a country on a given year, stored as a sorted array of
+    date ordinals, plus a prefix sum of the business days of the year:
+    business_days[i] is the number of business days before the i-th day of
+    the year
+    """
+
+    def __init__(self, year: int, holidays, compiled_at=None) -> None:
+        self.year = year
+        self.compiled_at = compiled_at
+        self.first_ordinal = datetime.date(year, 1, 1).toordinal()
+        self.holidays = array("l", sorted(date.toordinal() for date in holidays))
+
+        days = datetime.date(year, 12, 31).toordinal() - self.first_ordinal + 1
+        # date.weekday() is ordinal % 7 - 1, so saturday and sunday are 6 and 0
+        holidays_set = set(self.holidays)
+        self.business_days = array("H", [0])
+        count = 0
+        for ordinal in range(self.first_ordinal, self.first_ordinal + days):
+            if ordinal % 7 not in (6, 0) and ordinal not in holidays_set:
+                count += 1
+            self.business_days.append(count)
+
+    def __len__(self) -> int:
+        return len(self.business_days) - 1
+
+    def index(self, date: datetime.date) -> int:
+        return date.toordinal() - self.first_ordinal
+
+    def is_holiday(self, date: datetime.date) -> bool:
+        ordinal = date.toordinal()
+        index = bisect_left(self.holidays, ordinal)
+        return index < len(self.holidays) and self.holidays[index] == ordinal
+
+    def is_business_day(self, date: datetime.date) -> bool:
+        index = self.index(date)
+        return self.business_days[index + 1] > self.business_days[index]
+
+    def count_business_days(self, start_index: int, end_index: int) -> int:
+        """
+        Returns the number of business days between the days {start_index} and
+        {end_index} of the year, both included
+        """
+        return self.business_days[end_index + 1] - self.business_days[start_index]
+
+    def nth_business_day_after(self, index: int, count: int):
+        """
+        Returns the index of the {count}-th business day after the day {index}
+        of the year, or None if the year ends before that
+        """
+        target = self.business_days[index + 1] + count
+        if target > self.business_days[-1]:
+            return None
+        return bisect_left(self.business_days, target) - 1
+
+    def nth_business_day_before(self, index: int, count: int):
+        """
+        Returns the index of the {count}-th business day before the day {index}
+        of the year, or None if the year starts after that
+        """
+        target = self.business_days[index] - count
+        if target < 0:
+            return None
+        return bisect_right(self.business_days, target) - 1
+
+    def date(self, index: int) -> datetime.date:
+        return datetime.date.fromordinal(self.first_ordinal + index)
+
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def to_ordinals(dates):
+    """
+    Returns the ordinals of {dates}, as an int64 array if {dates} is a NumPy
+    datetime64 array, or as a list otherwise
+    """
+    if numpy is not None and isinstance(dates, numpy.ndarray):
+        return dates.astype("datetime64[D]").astype(numpy.int64) + EPOCH_ORDINAL
+    return [date.toordinal() for date in dates]
+
+
+def from_ordinals(ordinals):
+    """
+    Returns the dates of {ordinals}, as a datetime64 array if {ordinals} is a
+    NumPy array, or as a list otherwise
+    """
+    if numpy is not None and isinstance(ordinals, numpy.ndarray):
+        return (ordinals - EPOCH_ORDINAL).astype("datetime64[D]")
+    return [datetime.date.fromordinal(ordinal) for ordinal in ordinals]
+
+
+class BusinessDayIndex:
+    """
+    A prefix sum of the business days of consecutive compiled years, so any
+    date within them is located with a bisect. Dates are given as ordinals,
+    as python sequences or, when NumPy is installed, as NumPy arrays.
+    """
+
+    def __init__(self, compiled_years) -> None:
+        self.first_ordinal = 0
+        if compiled_years:
+            self.first_ordinal = compiled_years[0].first_ordinal
+        self.business_days = array("l", [0])
+        offset = 0
+        for compiled_year in compiled_years:
+            self.business_days.extend(
+                offset + count for count in compiled_year.business_days[1:]
+            )
+            offset = self.business_days[-1]
+
+    def is_business_day(self, ordinals) -> list:
+        business_days = self.business_days
+        first_ordinal = self.first_ordinal
+
+        if numpy is not None and isinstance(ordinals, numpy.ndarray):
+            business_days = numpy.frombuffer(business_days, dtype="l")
+            indexes = ordinals - first_ordinal
+            return business_days[indexes + 1] > business_days[indexes]
+
+        return [
+            business_days[ordinal - first_ordinal + 1]
+            > business_days[ordinal - first_ordinal]
+            for ordinal in ordinals
+        ]
+
+    def add_business_days(self, ordinals, business_days_count: int):
+        """
+        Returns the ordinals of the {business_days_count}-th business day after
+        each of {ordinals}, or None if any of them falls after the index
+        """
+        business_days = self.business_days
+        first_ordinal = self.first_ordinal
+
+        if numpy is not None and isinstance(ordinals, numpy.ndarray):
+            if business_days_count <= 0:
+                return ordinals.copy()
+            business_days = numpy.frombuffer(business_days, dtype="l")
+            targets = business_days[ordinals - first_ordinal + 1] + business_days_count
+            if (targets > business_days[-1]).any():
+                return None
+            return numpy.searchsorted(business_days, targets) - 1 + first_ordinal
+
+        if business_days_count <= 0:
+            return list(ordinals)
+
+        last_business_day = business_days[-1]
+        results = []
+        for ordinal in ordinals:
+            target = business_days[ordinal - first_ordinal + 1] + business_days_count
+            if target > last_business_day:
+                return None
+            results.append(bisect_left(business_days, target) - 1 + first_ordinal)
+        return results
+
+
+class HolidayCalendar:
+    """
+    Holidays of a single country. Each year is loaded from the Holiday table
+    the first time it is needed, after that every check is answered in memory.
+    """
+
+    def __init__(self, country_code: str) -> None:
+        self.country_code = country_code.upper()
+        self.years = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get_year(self, year: int) -> CompiledYear:
+        compiled_year = self.years.get(year)
+        if compiled_year is None:
+            compiled_year = self.load_years(year, year)[year]
+        return compiled_year
+
+    def load_years(self, first_year: int, last_year: int) -> dict:
+        """
+        Compiles every year between {first_year} and {last_year} that is not
+        compiled yet, reading all of them with a single query. Returns the
+        compiled years of the whole range, by year
+        """
+        compiled_years, missing_years = self.get_compiled_years(
+            first_year, last_year
+        )
+        if missing_years:
+            generation = self.generation
+            compiled_at = timezone.now()
+            dates = list(self.get_holidays_queryset(missing_years))
+            compiled_years.update(
+                self.compile_years(missing_years, dates, generation, compiled_at)
+            )
+        return compiled_years
+
+    async def aload_years(self, first_year: int, last_year: int) -> dict:
+        """
+        Async version of load_years, for django >= 4.1
+        """
+        compiled_years, missing_years = self.get_compiled_years(
+            first_year, last_year
+        )
+        if missing_years:
+            generation = self.generation
+            compiled_at = timezone.now()
+            dates = [
+                date async for date in self.get_holidays_queryset(missing_years)
+            ]
+            compiled_years.update(
+                self.compile_years(missing_years, dates, generation, compiled_at)
+            )
+        return compiled_years
+
+    def get_compiled_years(self, first_year: int, last_year: int) -> tuple:
+        """
+        Returns the years between {first_year} and {last_year} already
+        compiled, by year, and a list of the years that are not
+        """
+        compiled_years = {}
+        missing_years = []
+        for year in range(first_year, last_year + 1):
+            compiled_year = self.years.get(year)
+            if compiled_year is None:
+                missing_years.append(year)
+            else:
+                compiled_years[year] = compiled_year
+        return compiled_years, missing_years
+
+    def get_holidays_queryset(self, years: list):
+        Holiday = apps.get_model(app_label="magnet_data", model_name="Holiday")
+        return Holiday.objects.filter(
+            country_code=self.country_code,
+            date__range=[
+                datetime.date(years[0], 1, 1),
+                datetime.date(years[-1], 12, 31),
+            ],
+        ).values_list("date", flat=True)
+
+    def compile_years(self, years: list, dates: list, generation: int,
+                      compiled_at: datetime.datetime) -> dict:
+        """
+        Compiles {years} given the holiday {dates} read for them, and stores
+        them unless the calendar was invalidated after {generation}
+        """
+        holidays = {year: [] for year in years}
+        for date in dates:
+            if date.year in holidays:
+                holidays[date.year].append(date)
+
+        compiled_years = {
+            year: CompiledYear(year, year_dates, compiled_at)
+            for year, year_dates in holidays.items()
+        }
+
+        with self.lock:
+            # do not store what was read if the calendar was invalidated meanwhile
+            if generation == self.generation:
+                self.years.update(compiled_years)
+
+        return compiled_years
+
+    def get_index(self, first_year: int, last_year: int) -> "BusinessDayIndex":
+        """
+        Returns a business day index spanning from {first_year} to {last_year}
+        """
+        compiled_years = self.load_years(first_year, last_year)
+        return BusinessDayIndex(
+            [compiled_years[year] for year in range(first_year, last_year + 1)]
+        )
+
+    def invalidate(self, year: int = None) -> None:
+        """
+        Forget the compiled holidays of {year}, or of every year if no year is
+        given, so they are read again from the database
+        """
+        with self.lock:
+            self.generation += 1
+            if year is None:
+                self.years = {}
+            else:
+                self.years.pop(year, None)
+
+    def invalidate_before(self, year: int, updated_at: datetime.datetime) -> None:
+        """
+        Forget the compiled holidays of {year} if they were compiled before
+        {updated_at}
+        """
+        compiled_year = self.years.get(year)
+        if compiled_year is not None and compiled_year.compiled_at < updated_at:
+            self.invalidate(year)
+
+    def is_holiday(self, date: datetime.date) -> bool:
+        return self.get_year(date.year).is_holiday(date)
+
+    def is_business_day(self, date: datetime.date) -> bool:
+        return self.get_year(date.year).is_business_day(date)
+
+    def count_business_days(self,
+                            start_date: datetime.date,
+                            end_date: datetime.date) -> int:
+        """
+        Returns the number of business days between two dates, both included.
+        The years that are not compiled are read with a single query
+        """
+        compiled_years = self.load_years(start_date.year, end_date.year)
+        count = 0
+        for year in range(start_date.year, end_date.year + 1):
+            compiled_year = compiled_years[year]
+            start_index = 0
+            end_index = len(compiled_year) - 1
+            if year == start_date.year:
+                start_index = compiled_year.index(start_date)
+            if year == end_date.year:
+                end_index = compiled_year.index(end_date)
+            count += compiled_year.count_business_days(start_index, end_index)
+        return count
+
+    def count_holidays_during_weekdays(self,
+                                       start_date: datetime.date,
+                                       end_date: datetime.date) -> int:
+        """
+        Returns the number of holidays between two dates, both included, not
+        considering saturdays and sundays. The years that are not compiled are
+        read with a single query
+        """
+        compiled_years = self.load_years(start_date.year, end_date.year)
+        count = 0
+        start_ordinal = start_date.toordinal()
+        end_ordinal = end_date.toordinal()
+        for year in range(start_date.year, end_date.year + 1):
+            holidays = compiled_years[year].holidays
+            start_index = bisect_left(holidays, start_ordinal)
+            end_index = bisect_right(holidays, end_ordinal)
+            for ordinal in holidays[start_index:end_index]:
+                if ordinal % 7 not in (6, 0):
+                    count += 1
+        return count
+
+    def add_business_days(self,
+                          from_date: datetime.date,
+                          business_days_count: int,
+                          step: int = 1,
+                          prepare_year=None,
+                          years: dict = None) -> datetime.date:
+        """
+        Returns the date reached after counting {business_days_count} business
+        days from {from_date}, moving {step} days at a time.
+
+        Steps of 1 and -1 are answered with a bisect on the business days of
+        each year. {prepare_year} is called with every year before it is read.
+        If {years} is given, the compiled years are only read from it, and
+        YearNotLoaded is raised when the count needs another one.
+        """
+        def get_year(year):
+            if years is not None:
+                try:
+                    return years[year]
+                except KeyError:
+                    raise YearNotLoaded(year)
+            if prepare_year is not None:
+                prepare_year(year)
+            return self.get_year(year)
+
+        if step not in (1, -1):
+            final_date = from_date
+            while business_days_count > 0:
+                final_date += datetime.timedelta(days=step)
+                if get_year(final_date.year).is_business_day(final_date):
+                    business_days_count -= 1
+            return final_date
+
+        if business_days_count <= 0:
+            return from_date
+
+        compiled_year = get_year(from_date.year)
+        index = compiled_year.index(from_date)
+
+        while True:
+            if step == 1:
+                found = compiled_year.nth_business_day_after(
+                    index, business_days_count
+                )
+                if found is not None:
+                    return compiled_year.date(found)
+
+                business_days_count -= (
+                    compiled_year.business_days[-1]
+                    - compiled_year.business_days[index + 1]
+                )
+                compiled_year = get_year(compiled_year.year + 1)
+                index = -1
+            else:
+                found = compiled_year.nth_business_day_before(
+                    index, business_days_count
+                )
+                if found is not None:
+                    return compiled_year.date(found)
+
+                business_days_count -= compiled_year.business_days[index]
+                compiled_year = get_year(compiled_year.year - 1)
+                index = len(compiled_year)
+
+
+calendars = {}
+calendars_lock = threading.Lock()
+
+
+def get_calendar(country_code: str) -> HolidayCalendar:
+    """
+    Returns the process wide calendar of {country_code}
+    """
+    country_code = country_code.upper()
+    calendar = calendars.get(country_code)
+    if calendar is None:
+        with calendars_lock:
+            calendar = calendars.setdefault(
+                country_code, HolidayCalendar(country_code)
+            )
+    return calendar
+
+
+def invalidate(country_code: str, year: int = None) -> None:
+    """
+    Forget the compiled holidays of {country_code} on {year}, or on every year
+    if no year is given
+    """
+    calendar = calendars.get(country_code.upper())
+    if calendar is not None:
+        calendar.invalidate(year)
+
+
+def clear() -> None:
+    """
+    Forget every compiled calendar
+    """
+    with calendars_lock:
+        calendars.clear()
@@ -3,14 +3,21 @@
 
 # standard library
 import datetime
-import json
-from urllib.request import Request
-from urllib.request import urlopen
+import hashlib
 
 # django
+from django.db import IntegrityError
 from django.db import models
+from django.db import transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from magnet_data import resilience
+from magnet_data import transport
+from magnet_data import utils
+from magnet_data.transport import TransportError
+from magnet_data.singleflight import flights
+from . import calendar
 from .enums import Countries
 
 
@@ -39,29 +46,357 @@ class Holiday(models.Model):
 
     @classmethod
     def update_holidays(cls, country_code, year):
-        request = Request(
-            f'https://data.magnet.cl/api/v1/holidays/{country_code.lower()}/{year}/'
-        )
+        """
+        Replaces the holidays of {country_code} on {year} with the ones in the
+        api. Concurrent updates of the same year are coalesced into a single
+        fetch, and holidays that did not change since the last fetch are not
+        written again
+        """
+        def update():
+            refresh = HolidayRefresh.objects.filter(
+                country_code=country_code,
+                year=year,
+            ).first()
+            names, validators = cls.fetch_changed_holidays(
+                country_code, year, refresh
+            )
+            cls.save_changed_holidays(
+                country_code, year, names, validators, refresh
+            )
+
+        flights.do(cls.get_flight_key(country_code, year), update)
 
-        response = urlopen(request)
-        data = json.loads(response.read())
+    @classmethod
+    async def aupdate_holidays(cls, country_code, year):
+        """
+        Async version of update_holidays
+        """
+        async def update():
+            refresh = await HolidayRefresh.objects.filter(
+                country_code=country_code,
+                year=year,
+            ).afirst()
+            names, validators = await cls.afetch_changed_holidays(
+                country_code, year, refresh
+            )
+            await utils.run_sync(
+                cls.save_changed_holidays,
+                country_code, year, names, validators, refresh,
+            )
 
-        updated_ids = []
+        await flights.ado(cls.get_flight_key(country_code, year), update)
+
+    @staticmethod
+    def get_flight_key(country_code, year):
+        return f'holidays/{country_code.upper()}/{year}'
+
+    @staticmethod
+    def get_url(country_code, year):
+        return transport.get_url(f'holidays/{country_code.lower()}/{year}/')
+
+    @classmethod
+    def fetch_holidays(cls, country_code, year):
+        """
+        Returns the names of the holidays of {country_code} on {year} in the
+        api, by date
+        """
+        url = cls.get_url(country_code, year)
+        return cls.parse_holidays(resilience.get_json(url))
 
+    @classmethod
+    async def afetch_holidays(cls, country_code, year):
+        """
+        Async version of fetch_holidays
+        """
+        url = cls.get_url(country_code, year)
+        return cls.parse_holidays(await resilience.aget_json(url))
+
+    @classmethod
+    def fetch_changed_holidays(cls, country_code, year, refresh=None):
+        """
+        Returns the names of the holidays of {country_code} on {year} in the
+        api, by date, and the validators of the response to store in its
+        HolidayRefresh.
+
+        If {refresh}, the HolidayRefresh of the year, is given, the request is
+        conditional on the ETag and Last-Modified of the last response, and
+        the names are None if the api answers that they did not change, or
+        with the same content as the last time
+        """
+        url = cls.get_url(country_code, year)
+        headers = None
+        if refresh is not None:
+            headers = refresh.get_conditional_headers()
+        response = resilience.fetch(url, headers)
+        return cls.parse_changed_holidays(url, response, refresh)
+
+    @classmethod
+    async def afetch_changed_holidays(cls, country_code, year, refresh=None):
+        """
+        Async version of fetch_changed_holidays
+        """
+        url = cls.get_url(country_code, year)
+        headers = None
+        if refresh is not None:
+            headers = refresh.get_conditional_headers()
+        response = await resilience.afetch(url, headers)
+        return cls.parse_changed_holidays(url, response, refresh)
+
+    @classmethod
+    def parse_changed_holidays(cls, url, response, refresh):
+        if response.status == 304 and refresh is not None:
+            return None, {}
+        if not 200 <= response.status < 300:
+            raise TransportError(url, status=response.status)
+
+        validators = {
+            'content_hash': hashlib.sha256(response.body).hexdigest(),
+            'etag': response.headers.get('etag', ''),
+            'last_modified': response.headers.get('last-modified', ''),
+        }
+        if refresh is not None and refresh.content_hash == validators['content_hash']:
+            return None, validators
+        return cls.parse_holidays(response.json()), validators
+
+    @staticmethod
+    def parse_holidays(data):
+        names = {}
         for holiday_data in data['objects']:
             date_string = holiday_data['date']
             date = datetime.datetime.strptime(date_string, '%Y-%m-%d').date()
-            name = holiday_data['name']
+            names[date] = holiday_data['name']
+        return names
 
-            updated_ids.append(cls.objects.update_or_create(
-                date=date,
-                country_code=country_code,
-                defaults={
-                    'name': name,
-                },
-            )[0].id)
+    @classmethod
+    def save_holidays(cls, country_code, year, names):
+        """
+        Replaces the holidays of {country_code} on {year} with {names}, by date
+        """
+        cls.save_many_holidays({(country_code, year): names})
+
+    @classmethod
+    def save_changed_holidays(cls, country_code, year, names, validators,
+                              refresh=None):
+        """
+        Stores the {names} and {validators} returned by fetch_changed_holidays:
+        the holidays are only written if they changed, and the validators
+        only if they differ from the ones of {refresh}
+        """
+        if names is not None:
+            cls.save_holidays(country_code, year, names)
+
+        if refresh is not None:
+            changed_validators = {
+                field: value
+                for field, value in validators.items()
+                if getattr(refresh, field) != value
+            }
+            if changed_validators:
+                HolidayRefresh.objects.filter(pk=refresh.pk).update(
+                    **changed_validators
+                )
+
+    @classmethod
+    def save_many_holidays(cls, names_by_year):
+        """
+        Replaces the holidays of each (country code, year) of {names_by_year}
+        with its names by date, with a single bulk upsert and a delete per
+        country
+        """
+        holidays = {}
+        updated_years = set()
+        years_by_country = {}
+
+        for (country_code, year), names in names_by_year.items():
+            updated_years.add((country_code, year))
+            years_by_country.setdefault(country_code, set()).add(year)
+
+            for date, name in names.items():
+                updated_years.add((country_code, date.year))
+
+                holidays[(country_code, date)] = cls(
+                    date=date,
+                    country_code=country_code,
+                    name=name,
+                )
+
+        if not updated_years:
+            return
+
+        with transaction.atomic():
+            utils.bulk_upsert(
+                cls.objects.filter(
+                    country_code__in=list(years_by_country),
+                    date__in={date for _, date in holidays},
+                ),
+                list(holidays.values()),
+                unique_fields=['date', 'country_code'],
+                update_fields=['name'],
+            )
+
+            for country_code, years in years_by_country.items():
+                if len(years) == 1:
+                    years_filter = {'date__year': next(iter(years))}
+                else:
+                    years_filter = {'date__year__in': sorted(years)}
+                cls.objects.filter(
+                    country_code=country_code,
+                    **years_filter,
+                ).exclude(date__in=[
+                    date
+                    for holiday_country_code, date in holidays
+                    if holiday_country_code == country_code
+                ]).delete()
+
+        for country_code, updated_year in updated_years:
+            calendar.invalidate(country_code, updated_year)
 
+
+class HolidayRefresh(models.Model):
+    """
+    Stores when the holidays of a country on a given year were last fetched
+    from the api, so processes sharing the database fetch them once
+    """
+
+    country_code = models.CharField(
+        help_text=_("The code of the country of the refreshed holidays."),
+        max_length=2,
+        verbose_name=_("country code"),
+        choices=Countries.django_model_choices,
+    )
+    year = models.PositiveIntegerField(
+        help_text=_("The year of the refreshed holidays."),
+        verbose_name=_("year"),
+    )
+    updated_at = models.DateTimeField(
+        help_text=_("When the holidays were last fetched from the api and stored."),
+        null=True,
+        blank=True,
+        verbose_name=_("updated at"),
+    )
+    claimed_at = models.DateTimeField(
+        help_text=_("When the fetch in progress was claimed, if there is one."),
+        null=True,
+        blank=True,
+        verbose_name=_("claimed at"),
+    )
+    content_hash = models.CharField(
+        help_text=_("The SHA-256 hash of the last response of the api."),
+        max_length=64,
+        blank=True,
+        default="",
+        verbose_name=_("content hash"),
+    )
+    etag = models.CharField(
+        help_text=_("The ETag header of the last response of the api."),
+        max_length=255,
+        blank=True,
+        default="",
+        verbose_name=_("ETag"),
+    )
+    last_modified = models.CharField(
+        help_text=_("The Last-Modified header of the last response of the api."),
+        max_length=64,
+        blank=True,
+        default="",
+        verbose_name=_("last modified"),
+    )
+
+    class Meta:
+        verbose_name = _('holiday refresh')
+        verbose_name_plural = _('holiday refreshes')
+        unique_together = (("country_code", "year"),)
+
+    def __str__(self):
+        return f"{self.country_code}-{self.year}-{self.updated_at}"
+
+    def get_conditional_headers(self):
+        """
+        Returns the headers of a request that the api answers with a 304
+        status if the holidays did not change since the last response
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    @classmethod
+    def claim(cls, country_code, year, threshold, lease_threshold):
+        """
+        Claims the fetch of the holidays of {country_code} on {year}, unless
+        they were stored after {threshold}, or another process claimed it
+        after {lease_threshold} and may still be fetching them.
+
+        Returns a tuple of when the caller claimed the fetch, or None if it did
+        not, when the holidays were last stored, or None if they never were,
+        and whether another process is fetching them.
+        """
+        now = timezone.now()
+        refresh = cls.objects.filter(country_code=country_code, year=year).first()
+
+        if refresh is None:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(
+                        country_code=country_code,
+                        year=year,
+                        claimed_at=now,
+                    )
+            except IntegrityError:
+                # another process claimed it first
+                return None, None, True
+            return now, None, False
+
+        in_flight = (
+            refresh.claimed_at is not None
+            and refresh.claimed_at >= lease_threshold
+        )
+        if in_flight or (
+            refresh.updated_at is not None and refresh.updated_at >= threshold
+        ):
+            return None, refresh.updated_at, in_flight
+
+        claimed = cls.objects.filter(
+            pk=refresh.pk,
+            updated_at=refresh.updated_at,
+            claimed_at=refresh.claimed_at,
+        ).update(claimed_at=now)
+
+        if not claimed:
+            # another process claimed it first
+            return None, refresh.updated_at, True
+
+        return now, refresh.updated_at, False
+
+    @classmethod
+    def complete(cls, country_code, year, claimed_at):
+        """
+        Marks the holidays of {country_code} on {year} as stored now, ending
+        the fetch claimed at {claimed_at} unless another process took it over.
+        Returns when they were stored
+        """
+        now = timezone.now()
+        cls.objects.filter(
+            country_code=country_code,
+            year=year,
+            claimed_at=claimed_at,
+        ).update(updated_at=now, claimed_at=None)
+        return now
+
+    @classmethod
+    def release(cls, country_code, year, claimed_at, updated_at=None):
+        """
+        Ends the fetch of the holidays of {country_code} on {year} claimed at
+        {claimed_at} that failed, unless another process took the claim over.
+        If given, when they were last stored is set to {updated_at}
+        """
+        fields = {'claimed_at': None}
+        if updated_at is not None:
+            fields['updated_at'] = updated_at
         cls.objects.filter(
-            date__year=year,
             country_code=country_code,
-        ).exclude(id__in=updated_ids).delete()
+            year=year,
+            claimed_at=claimed_at,
+        ).update(**fields)
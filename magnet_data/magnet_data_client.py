@@ -1,9 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
 from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+from magnet_data.currencies.client import fetch_values
+from magnet_data.currencies.client import get_closed_months
+from magnet_data.currencies.client import get_content_hash
+from magnet_data.currencies.client import get_sync_state
+from magnet_data.currencies.client import is_closed_month
+from magnet_data.currencies.client import save_values
 from magnet_data.currencies.currency_pair import CurrencyPair
+from magnet_data.currencies.currency_pair import get_clp_values_on_date
+from magnet_data.currencies.currency_pair import get_last_dates
+from magnet_data.currencies.currency_pair import get_missing_months
 from magnet_data.currencies.enums import CurrencyAcronyms
+from magnet_data.holidays import calendar
 from magnet_data.holidays.enums import Countries
+from magnet_data import conf
+from magnet_data import resilience
 from magnet_data import utils
+import asyncio
 import datetime
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# seconds between checks of a fetch of holidays that another process claimed
+REFRESH_POLL_INTERVAL = 0.1
 
 
 class Currencies(CurrencyAcronyms):
@@ -17,6 +40,230 @@ class Currencies(CurrencyAcronyms):
             counter_currency=counter_currency
         )
 
+    @staticmethod
+    def matrix_on_date(date: datetime.date) -> dict:
+        """
+        Returns the value of every currency pair on a date, as a dict of dicts
+        where matrix[base_currency][counter_currency] is the same value that
+        get_pair(base_currency, counter_currency).on_date(date) returns, or
+        None if it is not known. Every value is read with a single query.
+        """
+        currencies = [
+            currency for currency, _ in CurrencyAcronyms.django_model_choices
+        ]
+        clp_values = get_clp_values_on_date(date, [
+            currency
+            for currency in currencies
+            if currency != CurrencyAcronyms.CLP
+        ])
+
+        matrix = {}
+        for base_currency in currencies:
+            matrix[base_currency] = {}
+            for counter_currency in currencies:
+                pair = CurrencyPair(
+                    base_currency=base_currency,
+                    counter_currency=counter_currency,
+                )
+                value = None
+                if (
+                    base_currency == counter_currency
+                    or pair.is_conversion_possible(date)
+                ):
+                    try:
+                        value = pair.cast_value(
+                            pair.get_value_from_clp_values(clp_values)
+                        )
+                    except KeyError:
+                        pass
+                matrix[base_currency][counter_currency] = value
+
+        return matrix
+
+    @staticmethod
+    def backfill(pairs: list,
+                 start_date: datetime.date,
+                 end_date: datetime.date,
+                 workers: int = 4) -> int:
+        """
+        Fetches every month between two dates that is missing from the
+        database for the currency pairs of {pairs}, given as CurrencyPair
+        objects or (base_currency, counter_currency) tuples.
+
+        Months are fetched concurrently by up to {workers} threads, and the
+        values of each currency are written with a single bulk upsert. Closed
+        months that were already fetched are skipped, even if they have gaps.
+        If a fetch fails, the months already fetched are stored before the
+        error is raised. Returns the number of months fetched.
+        """
+        currencies = []
+        for pair in pairs:
+            if not isinstance(pair, CurrencyPair):
+                pair = CurrencyPair(*pair)
+            if pair.base_currency == pair.counter_currency:
+                continue
+            for currency in pair.clp_currencies():
+                if currency not in currencies:
+                    currencies.append(currency)
+
+        last_dates = get_last_dates(currencies, start_date, end_date)
+
+        months = []
+        for currency in currencies:
+            currency_end_date = min(
+                end_date,
+                CurrencyPair(currency, CurrencyAcronyms.CLP).last_knowable_date(),
+            )
+            currency_last_dates = {
+                (year, month): date
+                for (last_date_currency, year, month), date in last_dates.items()
+                if last_date_currency == currency
+            }
+            for year, month in get_missing_months(
+                currency_last_dates, start_date, currency_end_date
+            ):
+                months.append((currency, year, month))
+
+        if not months:
+            return 0
+
+        closed_months = get_closed_months(
+            currencies, CurrencyAcronyms.CLP, start_date, end_date
+        )
+        months = [month for month in months if month not in closed_months]
+        Currencies.fetch_months(months, workers)
+        return len(months)
+
+    @staticmethod
+    def sync(currencies: list = None,
+             start_date: datetime.date = None,
+             force: bool = False,
+             workers: int = 4) -> dict:
+        """
+        Fetches the months of the values of {currencies} in CLP, every currency
+        by default, from the month of {start_date}, the current one by default,
+        until the month of the last knowable date of each currency, so CLF
+        months published beforehand are fetched too.
+
+        Closed months that were already fetched are skipped, unless {force}.
+        Months are fetched by up to {workers} threads, and only the ones that
+        changed are written. Returns the number of months fetched, changed and
+        skipped, by name.
+        """
+        if currencies is None:
+            currencies = [
+                currency for currency, _ in CurrencyAcronyms.django_model_choices
+                if currency != CurrencyAcronyms.CLP
+            ]
+        if start_date is None:
+            start_date = utils.today().replace(day=1)
+
+        months = []
+        end_date = start_date
+        for currency in currencies:
+            last_knowable_date = CurrencyPair(
+                currency, CurrencyAcronyms.CLP
+            ).last_knowable_date()
+            end_date = max(end_date, last_knowable_date)
+
+            year, month = start_date.year, start_date.month
+            while (year, month) <= (last_knowable_date.year, last_knowable_date.month):
+                months.append((currency, year, month))
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+        closed_months = set()
+        if not force:
+            closed_months = get_closed_months(
+                currencies, CurrencyAcronyms.CLP, start_date, end_date
+            )
+        fetched_months = [month for month in months if month not in closed_months]
+
+        return {
+            "fetched": len(fetched_months),
+            "changed": Currencies.fetch_months(fetched_months, workers),
+            "skipped": len(months) - len(fetched_months),
+        }
+
+    @staticmethod
+    def fetch_months(months: list, workers: int = 4) -> int:
+        """
+        Fetches the (currency, year, month) of {months} of values in CLP
+        concurrently, with up to {workers} threads.
+
+        The values and sync states of the months that changed since they were
+        last fetched are written with a single bulk upsert per currency, and
+        the unchanged months only get their sync state updated. If a fetch
+        fails, the months already fetched are stored before the error is
+        raised. Returns the number of months that changed.
+        """
+        if not months:
+            return 0
+
+        SyncState = apps.get_model(
+            app_label='magnet_data',
+            model_name='SyncState'
+        )
+
+        results = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                ((currency, year, month), executor.submit(
+                    fetch_values, year, month, currency, CurrencyAcronyms.CLP
+                ))
+                for currency, year, month in months
+            ]
+            for key, future in futures:
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+
+        content_hashes = {
+            key: get_content_hash(values) for key, values in results.items()
+        }
+        unchanged_pks = {True: [], False: []}
+        unchanged_months = set()
+        for sync_state in SyncState.objects.filter(
+            base_currency__in={currency for currency, _, _ in results},
+            counter_currency=CurrencyAcronyms.CLP,
+            year__in={year for _, year, _ in results},
+        ).only("base_currency", "year", "month", "content_hash"):
+            key = (sync_state.base_currency, sync_state.year, sync_state.month)
+            if content_hashes.get(key) == sync_state.content_hash:
+                unchanged_months.add(key)
+                unchanged_pks[is_closed_month(key[1], key[2])].append(sync_state.pk)
+
+        now = timezone.now()
+        for closed, pks in unchanged_pks.items():
+            if pks:
+                SyncState.objects.filter(pk__in=pks).update(
+                    fetched_at=now, closed=closed
+                )
+
+        values = {}
+        sync_states = {}
+        for key, month_values in results.items():
+            if key in unchanged_months:
+                continue
+            currency, year, month = key
+            values.setdefault(currency, {}).update(month_values)
+            sync_states.setdefault(currency, []).append(get_sync_state(
+                year, month, currency, CurrencyAcronyms.CLP, month_values,
+                content_hashes[key],
+            ))
+
+        for currency, currency_sync_states in sync_states.items():
+            save_values(
+                currency, CurrencyAcronyms.CLP, values[currency], currency_sync_states
+            )
+
+        if error is not None:
+            raise error
+
+        return len(results) - len(unchanged_months)
+
 
 class Holidays(Countries):
     def __init__(self):
@@ -24,23 +271,320 @@ class Holidays(Countries):
             app_label='magnet_data',
             model_name='Holiday'
         )
-        self.reset_cache()
+        self.refresh_cls = apps.get_model(
+            app_label='magnet_data',
+            model_name='HolidayRefresh'
+        )
+        self.last_updated = {}
 
     def reset_cache(self):
+        """
+        Forget when this instance checked the holidays, so the next update
+        checks again if any process fetched them during the last day
+        """
         self.last_updated = {}
 
+    def expire(self, country_code: str, year=None):
+        """
+        Makes the next update of any process fetch the holidays of
+        {country_code} on {year}, or on every year if no year is given. The
+        validators of the last responses are kept, so unchanged holidays are
+        not written again, and fetches in progress are not interrupted
+        """
+        country_code = country_code.upper()
+        refreshes = self.refresh_cls.objects.filter(country_code=country_code)
+        if year is not None:
+            refreshes = refreshes.filter(year=year)
+        refreshes.update(updated_at=None)
+
+        for key in list(self.last_updated):
+            if key[0] == country_code and year in (None, key[1]):
+                del self.last_updated[key]
+
     def update(self, country_code: str, year):
         """
-        Update values stored in the database with what the api returned
+        Update values stored in the database with what the api returned.
+
+        Holidays are fetched at most once a day per country and year, across
+        every process that shares the database. While another process fetches
+        them, the stored ones are used, or if there are none this waits until
+        they are stored instead of reading an empty year.
+
+        If the fetch fails, the holidays are fetched again once the circuit
+        breaker lets requests through, and meanwhile the stored ones are used.
+        If there are none stored for {year} the error is raised, and the next
+        update fetches them again.
+        """
+        country_code = country_code.upper()
+        if self.was_updated_recently(country_code, year):
+            return
+
+        claimed_at, in_flight = self.claim_update(country_code, year)
+        if in_flight and self.has_holidays(country_code, year):
+            # the stored holidays are used while another process refreshes them
+            return
+
+        while in_flight:
+            time.sleep(REFRESH_POLL_INTERVAL)
+            claimed_at, in_flight = self.claim_update(country_code, year)
+
+        if claimed_at is None:
+            return
+
+        try:
+            self.cls.update_holidays(country_code=country_code, year=year)
+        except Exception:
+            if not self.has_holidays(country_code, year):
+                self.release_update(country_code, year, claimed_at, wait=False)
+                raise
+            self.release_update(country_code, year, claimed_at)
+            logger.warning(
+                "Using the stored holidays of %s on %s", country_code, year,
+                exc_info=True,
+            )
+        else:
+            self.complete_update(country_code, year, claimed_at)
+
+    async def aupdate(self, country_code: str, year):
+        """
+        Async version of update, for django >= 4.1
+        """
+        country_code = country_code.upper()
+        if self.was_updated_recently(country_code, year):
+            return
+
+        claimed_at, in_flight = await utils.run_sync(
+            self.claim_update, country_code, year
+        )
+        if in_flight and await utils.run_sync(self.has_holidays, country_code, year):
+            return
+
+        while in_flight:
+            await asyncio.sleep(REFRESH_POLL_INTERVAL)
+            claimed_at, in_flight = await utils.run_sync(
+                self.claim_update, country_code, year
+            )
+
+        if claimed_at is None:
+            return
+
+        try:
+            await self.cls.aupdate_holidays(country_code=country_code, year=year)
+        except Exception:
+            if not await utils.run_sync(self.has_holidays, country_code, year):
+                await utils.run_sync(
+                    self.release_update, country_code, year, claimed_at, wait=False
+                )
+                raise
+            await utils.run_sync(self.release_update, country_code, year, claimed_at)
+            logger.warning(
+                "Using the stored holidays of %s on %s", country_code, year,
+                exc_info=True,
+            )
+        else:
+            await utils.run_sync(
+                self.complete_update, country_code, year, claimed_at
+            )
+
+    def was_updated_recently(self, country_code: str, year) -> bool:
+        """
+        Returns if this instance checked the holidays of {country_code} on
+        {year} during the last day
+        """
+        last_updated = self.last_updated.get((country_code, year))
+        threshold = timezone.now() - datetime.timedelta(1)
+        return last_updated is not None and last_updated >= threshold
+
+    def claim_update(self, country_code: str, year) -> tuple:
         """
-        now = datetime.datetime.now()
-        threshold = now - datetime.timedelta(1)
-        if (
-            self.last_updated.get(year) is None
-            or self.last_updated.get(year) < threshold
-        ):
-            self.last_updated[year] = now
-            self.cls.update_holidays(country_code=country_code.upper(), year=year)
+        Claims the fetch of the holidays of {country_code} on {year}, needed
+        when no process stored them during the last day.
+
+        Returns a tuple of when the caller claimed the fetch, or None if it
+        does not have to fetch them, and whether another process is fetching
+        them, in which case they must not be read until it stores them
+        """
+        now = timezone.now()
+        claimed_at, updated_at, in_flight = self.refresh_cls.claim(
+            country_code=country_code,
+            year=year,
+            threshold=now - datetime.timedelta(1),
+            lease_threshold=now - datetime.timedelta(
+                seconds=self.get_lease_timeout()
+            ),
+        )
+        if claimed_at is None and not in_flight:
+            self.last_updated[(country_code, year)] = now
+            # another process may have rewritten the year since it was compiled
+            if updated_at is not None:
+                calendar.get_calendar(country_code).invalidate_before(
+                    year, updated_at
+                )
+        return claimed_at, in_flight
+
+    @staticmethod
+    def get_lease_timeout() -> float:
+        """
+        Returns the seconds that a claim of a fetch of holidays lasts, so other
+        processes only take it over once the fetch can not be running anymore
+        """
+        lease_timeout = conf.get_setting("REFRESH_LEASE_TIMEOUT")
+        if lease_timeout is None:
+            lease_timeout = resilience.get_max_fetch_time() + 60
+        return lease_timeout
+
+    def complete_update(self, country_code: str, year, claimed_at) -> None:
+        """
+        Records that the holidays of {country_code} on {year}, whose fetch was
+        claimed at {claimed_at}, are stored
+        """
+        self.last_updated[(country_code, year)] = self.refresh_cls.complete(
+            country_code=country_code,
+            year=year,
+            claimed_at=claimed_at,
+        )
+
+    def release_update(self, country_code: str, year, claimed_at,
+                       wait: bool = True) -> None:
+        """
+        Releases the claim made at {claimed_at} of a fetch of the holidays of
+        {country_code} on {year} that failed. If {wait}, any process fetches
+        them again after MAGNET_DATA_CIRCUIT_BREAKER_TIMEOUT seconds instead of
+        a day, otherwise on its next update
+        """
+        if not wait:
+            self.refresh_cls.release(
+                country_code=country_code,
+                year=year,
+                claimed_at=claimed_at,
+            )
+            self.last_updated.pop((country_code, year), None)
+            return
+
+        retry_at = timezone.now() + datetime.timedelta(
+            seconds=conf.get_setting("CIRCUIT_BREAKER_TIMEOUT")
+        )
+        # updates are claimed when the last one is older than a day
+        updated_at = retry_at - datetime.timedelta(1)
+        self.refresh_cls.release(
+            country_code=country_code,
+            year=year,
+            claimed_at=claimed_at,
+            updated_at=updated_at,
+        )
+        self.last_updated[(country_code, year)] = updated_at
+
+    def has_holidays(self, country_code: str, year) -> bool:
+        return self.cls.objects.filter(
+            country_code=country_code,
+            date__year=year,
+        ).exists()
+
+    async def aload_years(self, country_code: str, first_year: int,
+                          last_year: int) -> dict:
+        """
+        Updates the holidays of {country_code} between two years, fetching
+        them concurrently, and returns the compiled years by year
+        """
+        await asyncio.gather(*[
+            self.aupdate(country_code, year)
+            for year in range(first_year, last_year + 1)
+        ])
+        return await calendar.get_calendar(country_code).aload_years(
+            first_year, last_year
+        )
+
+    def warm(self,
+             country_codes: list,
+             first_year: int,
+             last_year: int,
+             workers: int = 4,
+             force: bool = False) -> int:
+        """
+        Fetches the holidays of {country_codes} between two years that no
+        process fetched during the last day, or all of them if {force}, so
+        later updates do not call the api.
+
+        Years are fetched concurrently by up to {workers} threads with
+        conditional requests, and the ones that changed are written with a
+        single bulk upsert. If a fetch fails, the years already fetched are
+        stored before the error is raised. Returns the number of years
+        fetched.
+        """
+        country_codes = [country_code.upper() for country_code in country_codes]
+        years = [
+            (country_code, year)
+            for country_code in country_codes
+            for year in range(first_year, last_year + 1)
+        ]
+
+        now = timezone.now()
+        refreshes = {
+            (refresh.country_code, refresh.year): refresh
+            for refresh in self.refresh_cls.objects.filter(
+                country_code__in=country_codes,
+                year__range=[first_year, last_year],
+            )
+        }
+        if not force:
+            threshold = now - datetime.timedelta(1)
+            years = [
+                key for key in years
+                if key not in refreshes
+                or refreshes[key].updated_at is None
+                or refreshes[key].updated_at < threshold
+            ]
+
+        if not years:
+            return 0
+
+        results = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                (key, executor.submit(
+                    self.cls.fetch_changed_holidays, *key, refreshes.get(key)
+                ))
+                for key in years
+            ]
+            for key, future in futures:
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+
+        self.cls.save_many_holidays({
+            key: names for key, (names, _) in results.items() if names is not None
+        })
+
+        updated_refreshes = []
+        for (country_code, year), (_, validators) in results.items():
+            refresh = refreshes.get((country_code, year))
+            if refresh is None:
+                refresh = self.refresh_cls(country_code=country_code, year=year)
+            refresh.updated_at = now
+            for field, value in validators.items():
+                setattr(refresh, field, value)
+            updated_refreshes.append(refresh)
+
+        with transaction.atomic():
+            utils.bulk_upsert(
+                self.refresh_cls.objects.filter(
+                    country_code__in=country_codes,
+                    year__range=[first_year, last_year],
+                ),
+                updated_refreshes,
+                unique_fields=["country_code", "year"],
+                update_fields=["updated_at", "content_hash", "etag", "last_modified"],
+            )
+        for key in results:
+            self.last_updated[key] = now
+
+        if error is not None:
+            raise error
+
+        return len(years)
 
     def is_workday(self, date, country_code: str) -> bool:
         """
@@ -57,16 +601,83 @@ class Holidays(Countries):
             country-code -- ISO 3166 country code
         """
         self.update(country_code, date.year)
-        if date.weekday() == 5:  # Saturday
-            return False
+        return calendar.get_calendar(country_code).is_business_day(date)
 
-        if date.weekday() == 6:  # Sunday
-            return False
+    async def ais_business_day(self, date, country_code: str) -> bool:
+        """
+        Async version of is_business_day, for django >= 4.1
+        """
+        years = await self.aload_years(country_code, date.year, date.year)
+        return years[date.year].is_business_day(date)
 
-        return not self.cls.objects.filter(
-            date=date,
-            country_code=country_code.upper(),
-        ).exists()
+    def is_business_day_many(self, dates, country_code: str):
+        """
+        Returns, for each of the given dates, if it is not Saturday, Sunday, or
+        Holiday. Holidays are read with at most one query per range of years
+        not compiled yet.
+        Keyword arguments:
+            dates -- a sequence of dates, or a NumPy datetime64 array
+            country-code -- ISO 3166 country code
+        Returns a NumPy bool array if dates is a NumPy array, or a list
+        """
+        ordinals = calendar.to_ordinals(dates)
+        if len(ordinals) == 0:
+            index = calendar.BusinessDayIndex([])
+        else:
+            index = self.get_business_day_index(
+                country_code, min(ordinals), max(ordinals)
+            )
+        return index.is_business_day(ordinals)
+
+    def get_next_business_day_many(self,
+                                   from_dates,
+                                   country_code: str,
+                                   business_days_count: int = 1):
+        """
+        Returns, for each of the given dates, the date that is
+        {business_days_count} business days after it. Holidays are read with at
+        most one query per range of years not compiled yet.
+        Keyword arguments:
+            from_dates -- a sequence of dates, or a NumPy datetime64 array
+            country-code -- ISO 3166 country code
+            business_days_count -- number of business days to count (default 1)
+        Returns a NumPy datetime64 array if from_dates is a NumPy array, or a
+        list
+        """
+        ordinals = calendar.to_ordinals(from_dates)
+        if len(ordinals) == 0:
+            return calendar.from_ordinals(ordinals)
+
+        first_ordinal = min(ordinals)
+        # a generous guess of how far the results can be, extended if needed
+        last_ordinal = max(ordinals) + business_days_count * 2 + 31
+
+        while True:
+            index = self.get_business_day_index(
+                country_code, first_ordinal, last_ordinal
+            )
+            next_ordinals = index.add_business_days(ordinals, business_days_count)
+            if next_ordinals is not None:
+                break
+            last_ordinal += 366
+
+        return calendar.from_ordinals(next_ordinals)
+
+    def get_business_day_index(self,
+                               country_code: str,
+                               first_ordinal: int,
+                               last_ordinal: int) -> calendar.BusinessDayIndex:
+        """
+        Returns the business day index of {country_code} for the years between
+        the given date ordinals, updating each year first
+        """
+        first_year = datetime.date.fromordinal(int(first_ordinal)).year
+        last_year = datetime.date.fromordinal(int(last_ordinal)).year
+
+        for year in range(first_year, last_year + 1):
+            self.update(country_code, year)
+
+        return calendar.get_calendar(country_code).get_index(first_year, last_year)
 
     def get_next_working_day(self,
                              country_code: str,
@@ -94,23 +705,45 @@ class Holidays(Countries):
         if from_date is None:
             from_date = utils.today()
 
-        last_updated_year = from_date.year
-
-        self.update(country_code, year=last_updated_year)
+        self.update(country_code, year=from_date.year)
 
-        final_date = from_date
-
-        while business_days_count > 0:
-            final_date += datetime.timedelta(days=step)
-
-            if last_updated_year != final_date.year:
-                last_updated_year = final_date.year
-                self.update(country_code, year=last_updated_year)
+        return calendar.get_calendar(country_code).add_business_days(
+            from_date,
+            business_days_count,
+            step=step,
+            prepare_year=lambda year: self.update(country_code, year),
+        )
 
-            if self.is_workday(date=final_date, country_code=country_code):
-                business_days_count -= 1
+    async def aget_next_business_day(self,
+                                     country_code: str,
+                                     business_days_count: int = 1,
+                                     from_date: datetime.date = None,
+                                     step: int = 1) -> datetime.date:
+        """
+        Async version of get_next_business_day, for django >= 4.1. The years
+        the count is expected to need are fetched concurrently
+        """
+        if from_date is None:
+            from_date = utils.today()
 
-        return final_date
+        # a generous guess of the years needed, extended if needed
+        last_date = from_date + datetime.timedelta(
+            days=step * (business_days_count * 2 + 31)
+        )
+        first_year, last_year = sorted([from_date.year, last_date.year])
+
+        while True:
+            years = await self.aload_years(country_code, first_year, last_year)
+            try:
+                return calendar.get_calendar(country_code).add_business_days(
+                    from_date,
+                    business_days_count,
+                    step=step,
+                    years=years,
+                )
+            except calendar.YearNotLoaded as e:
+                first_year = min(first_year, e.year)
+                last_year = max(last_year, e.year)
 
     def get_holidays_count_during_weekdays(self,
                                            country_code: str,
@@ -127,18 +760,9 @@ class Holidays(Countries):
         for year in range(start_date.year, end_date.year + 1):
             self.update(country_code, year)
 
-        days = 0
-
-        holidays_dates = self.cls.objects.filter(
-            date__range=[start_date, end_date],
-            country_code=country_code.upper(),
-        ).values_list('date', flat=True)
-
-        for date in holidays_dates:
-            if date.weekday() not in (5, 6):  # not in sunday or saturday
-                days += 1
-
-        return days
+        return calendar.get_calendar(country_code).count_holidays_during_weekdays(
+            start_date, end_date
+        )
 
     def get_business_days_count(self, country_code: str,
                                 start_date: datetime.date,
@@ -150,29 +774,16 @@ class Holidays(Countries):
             start_date -- date to start counting from
             end_date -- date where to stop counting
         """
-        for year in range(start_date.year, end_date.year + 1):
-            self.update(country_code, year)
-
         if start_date > end_date:
             start_date, end_date = end_date, start_date
 
-        delta = (end_date - start_date).days + 1
-        full_weeks, remaining_days = divmod(delta, 7)
-        business_days = full_weeks * 5
-
-        for i in range(remaining_days):
-            if (start_date.weekday() + i) % 7 < 5:
-                business_days += 1
+        for year in range(start_date.year, end_date.year + 1):
+            self.update(country_code, year)
 
-        # get holidays
-        holidays_count = self.get_holidays_count_during_weekdays(
-            country_code=country_code,
-            start_date=start_date,
-            end_date=end_date
+        return calendar.get_calendar(country_code).count_business_days(
+            start_date, end_date
         )
 
-        return business_days - holidays_count
-
 
 class MagnetDataClient:
     def __init__(self) -> None:
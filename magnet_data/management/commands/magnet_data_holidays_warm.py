@@ -0,0 +1,90 @@
+# django
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+# magnet data
+from magnet_data import utils
+from magnet_data.holidays.enums import Countries
+from magnet_data.magnet_data_client import MagnetDataClient
+from magnet_data.transport import TransportError
+
+
+def parse_years(value: str) -> tuple:
+    """
+    Returns the first and last year of {value}, a year like 2024 or a range
+    of years like 2015-2030
+    """
+    first_year, _, last_year = value.partition("-")
+    try:
+        first_year = int(first_year)
+        last_year = int(last_year or first_year)
+    except ValueError:
+        raise CommandError(f"{value} is not a year or a range of years")
+
+    if first_year > last_year:
+        raise CommandError(f"{value} is not a range of years")
+    return first_year, last_year
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetches the holidays of many countries and years concurrently and "
+        "stores them, so business day checks do not call the api. Years "
+        "fetched by any process during the last day are skipped"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--countries",
+            default="CL",
+            help="Comma separated country codes, CL by default",
+        )
+        parser.add_argument(
+            "--years",
+            help=(
+                "A year or a range of years like 2015-2030, the current and the "
+                "next year by default"
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of years fetched concurrently",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Fetch the years fetched during the last day too",
+        )
+
+    def handle(self, *args, **options):
+        country_codes = [
+            country_code.strip().upper()
+            for country_code in options["countries"].split(",")
+        ]
+        valid_country_codes = dict(Countries.django_model_choices)
+        for country_code in country_codes:
+            if country_code not in valid_country_codes:
+                raise CommandError(f"{country_code} is not a valid country code")
+
+        if options["years"]:
+            first_year, last_year = parse_years(options["years"])
+        else:
+            first_year = utils.today().year
+            last_year = first_year + 1
+
+        try:
+            count = MagnetDataClient().holidays.warm(
+                country_codes,
+                first_year,
+                last_year,
+                workers=options["workers"],
+                force=options["force"],
+            )
+        except TransportError as e:
+            raise CommandError(f"The warm up failed: {e}")
+
+        self.stdout.write(
+            f"Fetched the holidays of {count} years of {', '.join(country_codes)}"
+        )
@@ -0,0 +1,30 @@
+# django
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+# magnet data
+from magnet_data.conf import get_setting
+from magnet_data.currencies.store import write_rate_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the currency values stored in the database to the rate store "
+        "file that every process maps in memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            help="Path of the file, MAGNET_DATA_RATE_STORE_PATH by default",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"] or get_setting("RATE_STORE_PATH")
+        if not path:
+            raise CommandError(
+                "Set MAGNET_DATA_RATE_STORE_PATH or give a --path"
+            )
+
+        count = write_rate_store(path)
+        self.stdout.write(f"Wrote {count} values to {path}")
@@ -0,0 +1,78 @@
+# standard library
+import datetime
+
+# django
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+# magnet data
+from magnet_data.currencies.enums import CurrencyAcronyms
+from magnet_data.magnet_data_client import MagnetDataClient
+from magnet_data.transport import TransportError
+
+
+def parse_month(value: str) -> datetime.date:
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise CommandError(f"{value} is not a month like 2022-07")
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetches the currency values of the months that may still change, and "
+        "stores the ones that changed. Closed months already fetched are "
+        "skipped"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--currencies",
+            help="Comma separated currencies to sync, every one by default",
+        )
+        parser.add_argument(
+            "--start",
+            help="First month to sync, like 2022-07, the current one by default",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Fetch closed months again",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of months fetched concurrently",
+        )
+
+    def handle(self, *args, **options):
+        currencies = None
+        if options["currencies"]:
+            currencies = [
+                currency.strip().upper()
+                for currency in options["currencies"].split(",")
+            ]
+            valid_currencies = dict(CurrencyAcronyms.django_model_choices)
+            for currency in currencies:
+                if currency not in valid_currencies or currency == CurrencyAcronyms.CLP:
+                    raise CommandError(f"{currency} is not a valid currency")
+
+        start_date = None
+        if options["start"]:
+            start_date = parse_month(options["start"])
+
+        try:
+            counts = MagnetDataClient().currencies.sync(
+                currencies=currencies,
+                start_date=start_date,
+                force=options["force"],
+                workers=options["workers"],
+            )
+        except TransportError as e:
+            raise CommandError(f"The sync failed: {e}")
+
+        self.stdout.write(
+            "Fetched {fetched} months, {changed} changed, "
+            "{skipped} closed months skipped".format(**counts)
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('magnet_data', '0004_holidayrefresh'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_currency', models.CharField(choices=[('CLP', 'CLP'), ('CLF', 'CLF'), ('USD', 'USD'), ('EUR', 'EUR')], help_text='The acronym of the base currency', max_length=5, verbose_name='base currency')),
+                ('counter_currency', models.CharField(choices=[('CLP', 'CLP'), ('CLF', 'CLF'), ('USD', 'USD'), ('EUR', 'EUR')], help_text='The acronym of the counter currency', max_length=5, verbose_name='counter currency')),
+                ('year', models.PositiveIntegerField(verbose_name='year')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='month')),
+                ('fetched_at', models.DateTimeField(help_text='When the values of the month were last fetched from the api', verbose_name='fetched at')),
+                ('row_count', models.PositiveIntegerField(help_text='The number of values of the month in the api', verbose_name='row count')),
+                ('content_hash', models.CharField(help_text='The SHA-256 hash of the values of the month in the api', max_length=64, verbose_name='content hash')),
+                ('closed', models.BooleanField(default=False, help_text='Whether the month had ended when it was fetched', verbose_name='closed')),
+            ],
+            options={
+                'verbose_name': 'sync state',
+                'verbose_name_plural': 'sync states',
+                'unique_together': {('base_currency', 'counter_currency', 'year', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('magnet_data', '0005_syncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='holidayrefresh',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', help_text='The SHA-256 hash of the last response of the api.', max_length=64, verbose_name='content hash'),
+        ),
+        migrations.AddField(
+            model_name='holidayrefresh',
+            name='etag',
+            field=models.CharField(blank=True, default='', help_text='The ETag header of the last response of the api.', max_length=255, verbose_name='ETag'),
+        ),
+        migrations.AddField(
+            model_name='holidayrefresh',
+            name='last_modified',
+            field=models.CharField(blank=True, default='', help_text='The Last-Modified header of the last response of the api.', max_length=64, verbose_name='last modified'),
+        ),
+    ]
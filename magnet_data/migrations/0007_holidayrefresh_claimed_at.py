@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('magnet_data', '0006_holidayrefresh_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='holidayrefresh',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When the fetch in progress was claimed, if there is one.', null=True, verbose_name='claimed at'),
+        ),
+        migrations.AlterField(
+            model_name='holidayrefresh',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, help_text='When the holidays were last fetched from the api and stored.', null=True, verbose_name='updated at'),
+        ),
+    ]
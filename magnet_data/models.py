@@ -1,4 +1,6 @@
 from .currencies.models import CurrencyValue
+from .currencies.models import SyncState
 from .holidays.models import Holiday
+from .holidays.models import HolidayRefresh
 
-__all__ = (CurrencyValue, Holiday)
+__all__ = (CurrencyValue, SyncState, Holiday, HolidayRefresh)
@@ -0,0 +1,258 @@
+# -*- encoding: utf-8 -*-
+""" Retries and a circuit breaker around the requests to the api """
+
+# standard library
+from urllib.parse import urlsplit
+import asyncio
+import random
+import time
+
+# django
+from django.core.cache import cache
+
+# magnet data
+from magnet_data import transport
+from magnet_data.conf import get_setting
+from magnet_data.transport import Response
+from magnet_data.transport import Transport
+from magnet_data.transport import TransportError
+
+
+class CircuitOpenError(TransportError):
+    """
+    Exception raised without requesting {url}, because the requests to its
+    host failed repeatedly and its circuit is open
+    """
+
+    def __init__(self, url: str) -> None:
+        super().__init__(url, reason="the circuit of its host is open")
+
+
+class CircuitBreaker:
+    """
+    Counts the consecutive failed requests to a host in the django cache, so
+    every process shares it. After MAGNET_DATA_CIRCUIT_BREAKER_THRESHOLD
+    failures the circuit opens, and requests fail without being made for
+    MAGNET_DATA_CIRCUIT_BREAKER_TIMEOUT seconds. Then a single request is let
+    through per timeout, which closes the circuit if it succeeds
+    """
+
+    def __init__(self, host: str) -> None:
+        self.host = host
+        self.failures_cache_key = f"md-circuit-{host}-failures"
+        self.open_cache_key = f"md-circuit-{host}-open"
+        self.probe_cache_key = f"md-circuit-{host}-probe"
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return bool(get_setting("CIRCUIT_BREAKER_THRESHOLD"))
+
+    def allow(self) -> bool:
+        """
+        Returns if a request to the host can be made
+        """
+        if not self.is_enabled():
+            return True
+
+        open_until = cache.get(self.open_cache_key)
+        if open_until is None:
+            return True
+        if time.time() < open_until:
+            return False
+        return cache.add(
+            self.probe_cache_key, True, get_setting("CIRCUIT_BREAKER_TIMEOUT")
+        )
+
+    async def aallow(self) -> bool:
+        """
+        Async version of allow, for django >= 4.0
+        """
+        if not self.is_enabled():
+            return True
+
+        open_until = await cache.aget(self.open_cache_key)
+        if open_until is None:
+            return True
+        if time.time() < open_until:
+            return False
+        return await cache.aadd(
+            self.probe_cache_key, True, get_setting("CIRCUIT_BREAKER_TIMEOUT")
+        )
+
+    def get_cache_keys(self) -> list:
+        return [self.failures_cache_key, self.open_cache_key, self.probe_cache_key]
+
+    def record_success(self) -> None:
+        if self.is_enabled():
+            cache.delete_many(self.get_cache_keys())
+
+    async def arecord_success(self) -> None:
+        if self.is_enabled():
+            await cache.adelete_many(self.get_cache_keys())
+
+    def record_failure(self) -> None:
+        if not self.is_enabled():
+            return
+
+        cache.add(self.failures_cache_key, 0, None)
+        try:
+            failures = cache.incr(self.failures_cache_key)
+        except ValueError:
+            # the key was deleted by a success in between
+            return
+
+        if failures >= get_setting("CIRCUIT_BREAKER_THRESHOLD"):
+            self.open()
+
+    async def arecord_failure(self) -> None:
+        if not self.is_enabled():
+            return
+
+        await cache.aadd(self.failures_cache_key, 0, None)
+        try:
+            failures = await cache.aincr(self.failures_cache_key)
+        except ValueError:
+            return
+
+        if failures >= get_setting("CIRCUIT_BREAKER_THRESHOLD"):
+            await self.aopen()
+
+    def open(self) -> None:
+        """
+        Opens the circuit, or opens it again after a failed probe
+        """
+        cache.set(self.open_cache_key, self.get_open_until(), None)
+        cache.delete(self.probe_cache_key)
+
+    async def aopen(self) -> None:
+        await cache.aset(self.open_cache_key, self.get_open_until(), None)
+        await cache.adelete(self.probe_cache_key)
+
+    @staticmethod
+    def get_open_until() -> float:
+        return time.time() + get_setting("CIRCUIT_BREAKER_TIMEOUT")
+
+    def is_open(self) -> bool:
+        """
+        Returns if requests to the host are failing without being made
+        """
+        return self.is_enabled() and cache.get(self.open_cache_key) is not None
+
+
+def get_circuit_breaker(url: str) -> CircuitBreaker:
+    """
+    Returns the circuit breaker of the host of {url}
+    """
+    return CircuitBreaker(urlsplit(url).netloc)
+
+
+def is_retryable(error: TransportError) -> bool:
+    """
+    Returns if the request that raised {error} may succeed if repeated: the
+    api could not be reached, was overloaded or failed
+    """
+    return error.status is None or error.status == 429 or error.status >= 500
+
+
+def get_backoff(attempt: int) -> float:
+    """
+    Returns the seconds to wait before retrying a request that failed
+    {attempt} + 1 times: a random time up to twice the one of the previous
+    attempt, so the clients of a failing host do not retry in sync
+    """
+    return random.uniform(0, get_setting("RETRY_BACKOFF") * 2 ** attempt)
+
+
+def get_max_fetch_time() -> float:
+    """
+    Returns the most seconds that fetch may take with the HTTP transport: every
+    attempt timing out while connecting and while reading, with the longest
+    wait before each retry
+    """
+    retries = get_setting("RETRIES")
+    attempt_time = get_setting("CONNECT_TIMEOUT") + get_setting("READ_TIMEOUT")
+    backoff_time = sum(
+        get_setting("RETRY_BACKOFF") * 2 ** attempt for attempt in range(retries)
+    )
+    return (retries + 1) * attempt_time + backoff_time
+
+
+def check_response(url: str, response: Response) -> Response:
+    """
+    Returns {response}, raising TransportError if its status may be temporary
+    """
+    if response.status == 429 or response.status >= 500:
+        raise TransportError(url, status=response.status)
+    return response
+
+
+def fetch(url: str, headers: dict = None) -> Response:
+    """
+    Returns the response of a GET request to {url}, retrying it up to
+    MAGNET_DATA_RETRIES times while it fails with an error that may be
+    temporary. Raises CircuitOpenError right away if its host is failing
+    """
+    circuit_breaker = get_circuit_breaker(url)
+    if not circuit_breaker.allow():
+        raise CircuitOpenError(url)
+
+    retries = get_setting("RETRIES")
+    for attempt in range(retries + 1):
+        try:
+            response = check_response(
+                url, transport.get_transport().fetch(url, headers)
+            )
+        except TransportError as error:
+            if not is_retryable(error):
+                # the host answered, so it is up
+                circuit_breaker.record_success()
+                raise
+            if attempt == retries:
+                circuit_breaker.record_failure()
+                raise
+            time.sleep(get_backoff(attempt))
+        else:
+            circuit_breaker.record_success()
+            return response
+
+
+async def afetch(url: str, headers: dict = None) -> Response:
+    """
+    Async version of fetch
+    """
+    circuit_breaker = get_circuit_breaker(url)
+    if not await circuit_breaker.aallow():
+        raise CircuitOpenError(url)
+
+    retries = get_setting("RETRIES")
+    for attempt in range(retries + 1):
+        try:
+            response = check_response(
+                url, await transport.get_transport().afetch(url, headers)
+            )
+        except TransportError as error:
+            if not is_retryable(error):
+                await circuit_breaker.arecord_success()
+                raise
+            if attempt == retries:
+                await circuit_breaker.arecord_failure()
+                raise
+            await asyncio.sleep(get_backoff(attempt))
+        else:
+            await circuit_breaker.arecord_success()
+            return response
+
+
+def get_json(url: str):
+    """
+    Returns the decoded json body of {url}, fetched like fetch does, raising
+    TransportError if the response is not successful
+    """
+    return Transport.decode_json(url, fetch(url))
+
+
+async def aget_json(url: str):
+    """
+    Async version of get_json
+    """
+    return Transport.decode_json(url, await afetch(url))
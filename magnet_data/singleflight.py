@@ -0,0 +1,157 @@
+# -*- encoding: utf-8 -*-
+""" Coalescing of concurrent identical calls """
+
+# standard library
+import asyncio
+import threading
+import time
+
+# django
+from django.core.cache import cache
+
+# magnet data
+from magnet_data.conf import get_setting
+
+# seconds between checks of a lock held by another process
+POLL_INTERVAL = 0.05
+
+
+def get_lock_cache_key(key: str) -> str:
+    """
+    Returns the cache key of the cross process lock of {key}
+    """
+    return f"md-flight-{key}"
+
+
+class Call:
+    """
+    A call in flight, that the calls with the same key wait for
+    """
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs a single call at a time per key: calls made while another one with
+    the same key is in flight wait for it and get its result, or its error.
+
+    If the MAGNET_DATA_SINGLE_FLIGHT_TIMEOUT setting is set, calls are also
+    coalesced across processes with a lock in the django cache. Processes can
+    not share results, so the coalesced functions are meant to store them where
+    every process reads them, like the database, and a process that waited for
+    another one gets None.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.async_calls = {}
+
+    def do(self, key: str, function, *args, **kwargs):
+        """
+        Returns the result of {function} called with {args} and {kwargs}, or
+        of the call with the same {key} already in flight
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self.calls[key] = Call()
+
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = run_locked(key, function, *args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+
+        return call.result
+
+    async def ado(self, key: str, function, *args, **kwargs):
+        """
+        Async version of do, where {function} is a coroutine function. Calls
+        are coalesced with the ones made on the same event loop
+        """
+        loop = asyncio.get_event_loop()
+        call_key = (id(loop), key)
+
+        future = self.async_calls.get(call_key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self.async_calls[call_key] = loop.create_future()
+        try:
+            result = await arun_locked(key, function, *args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            # the error is raised here, so it does not need waiters
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self.async_calls[call_key]
+            # the call was cancelled or interrupted, and so are its waiters
+            if not future.done():
+                future.cancel()
+
+        return result
+
+
+def run_locked(key: str, function, *args, **kwargs):
+    """
+    Calls {function} holding the cross process lock of {key}, if enabled. If
+    another process holds it, waits until it is released and returns None
+    """
+    timeout = get_setting("SINGLE_FLIGHT_TIMEOUT")
+    if not timeout:
+        return function(*args, **kwargs)
+
+    lock_cache_key = get_lock_cache_key(key)
+    if cache.add(lock_cache_key, True, timeout):
+        try:
+            return function(*args, **kwargs)
+        finally:
+            cache.delete(lock_cache_key)
+
+    deadline = time.monotonic() + timeout
+    while cache.get(lock_cache_key) and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+    return None
+
+
+async def arun_locked(key: str, function, *args, **kwargs):
+    """
+    Async version of run_locked
+    """
+    timeout = get_setting("SINGLE_FLIGHT_TIMEOUT")
+    if not timeout:
+        return await function(*args, **kwargs)
+
+    lock_cache_key = get_lock_cache_key(key)
+    if await cache.aadd(lock_cache_key, True, timeout):
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            await cache.adelete(lock_cache_key)
+
+    deadline = time.monotonic() + timeout
+    while await cache.aget(lock_cache_key) and time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+    return None
+
+
+flights = SingleFlight()
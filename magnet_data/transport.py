@@ -0,0 +1,247 @@
+# -*- encoding: utf-8 -*-
+""" Transports used to read the magnet data api """
+
+# standard library
+from http.client import HTTPConnection
+from http.client import HTTPException
+from http.client import HTTPSConnection
+from urllib.parse import urlsplit
+import asyncio
+import functools
+import gzip
+import json
+import threading
+
+# django
+from django.utils.module_loading import import_string
+
+# magnet data
+from magnet_data.conf import get_setting
+
+
+class TransportError(Exception):
+    """
+    Exception raised when the api could not be reached, or answered with an
+    error
+
+    Attributes:
+        url -- the url that was requested
+        status -- the status of the response, or None if there was no response
+    """
+
+    def __init__(self, url: str, status: int = None, reason: str = "") -> None:
+        self.url = url
+        self.status = status
+        self.reason = reason
+        if status is None:
+            message = f"{url} could not be read: {reason}"
+        else:
+            message = f"{url} answered with status {status}"
+        super().__init__(message)
+
+
+class Response:
+    """
+    A response of the api, with its headers by lowercase name and its body
+    already decompressed
+    """
+
+    def __init__(self, status: int, headers: dict, body: bytes) -> None:
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class Transport:
+    """
+    Base class of the transports. A transport only needs to implement fetch
+    """
+
+    def fetch(self, url: str, headers: dict = None) -> Response:
+        """
+        Returns the response of a GET request to {url}, whatever its status
+        """
+        raise NotImplementedError
+
+    def get_json(self, url: str, headers: dict = None):
+        """
+        Returns the decoded json body of {url}, raising TransportError if the
+        response is not successful
+        """
+        return self.decode_json(url, self.fetch(url, headers))
+
+    async def afetch(self, url: str, headers: dict = None) -> Response:
+        """
+        Returns the response of a GET request to {url} without blocking the
+        event loop. Unless a transport implements it natively, fetch runs on the
+        default executor of the loop, so concurrent requests run in parallel
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.fetch, url, headers)
+        )
+
+    async def aget_json(self, url: str, headers: dict = None):
+        """
+        Async version of get_json
+        """
+        return self.decode_json(url, await self.afetch(url, headers))
+
+    @staticmethod
+    def decode_json(url: str, response: Response):
+        if not 200 <= response.status < 300:
+            raise TransportError(url, status=response.status)
+        return response.json()
+
+    def close(self) -> None:
+        pass
+
+
+class HTTPTransport(Transport):
+    """
+    Reads the api over HTTP keeping one connection per host and thread alive,
+    so consecutive requests do not pay a new TCP and TLS handshake. Responses
+    are requested gzipped.
+    """
+
+    def __init__(self, connect_timeout: float = None,
+                 read_timeout: float = None) -> None:
+        if connect_timeout is None:
+            connect_timeout = get_setting("CONNECT_TIMEOUT")
+        if read_timeout is None:
+            read_timeout = get_setting("READ_TIMEOUT")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.local = threading.local()
+
+    def get_connections(self) -> dict:
+        try:
+            return self.local.connections
+        except AttributeError:
+            self.local.connections = {}
+            return self.local.connections
+
+    def get_connection(self, scheme: str, netloc: str) -> HTTPConnection:
+        connections = self.get_connections()
+        connection = connections.get((scheme, netloc))
+        if connection is None:
+            if scheme == "https":
+                connection_class = HTTPSConnection
+            else:
+                connection_class = HTTPConnection
+            connection = connection_class(netloc, timeout=self.connect_timeout)
+            connections[(scheme, netloc)] = connection
+        return connection
+
+    def fetch(self, url: str, headers: dict = None) -> Response:
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        request_headers = {"Accept-Encoding": "gzip"}
+        request_headers.update(headers or {})
+
+        for attempt in range(2):
+            connection = self.get_connection(parts.scheme, parts.netloc)
+            reused = connection.sock is not None
+            try:
+                if connection.sock is None:
+                    connection.connect()
+                    connection.sock.settimeout(self.read_timeout)
+                connection.request("GET", path, headers=request_headers)
+                response = connection.getresponse()
+                body = response.read()
+            except ConnectionError as error:
+                connection.close()
+                # the server may close idle connections, so a reused connection
+                # is retried once on a new one
+                if reused and attempt == 0:
+                    continue
+                raise TransportError(url, reason=str(error)) from error
+            except (HTTPException, OSError) as error:
+                connection.close()
+                raise TransportError(url, reason=str(error)) from error
+            break
+
+        if response.will_close:
+            connection.close()
+
+        response_headers = {
+            name.lower(): value for name, value in response.getheaders()
+        }
+        if response_headers.get("content-encoding") == "gzip":
+            body = gzip.decompress(body)
+
+        return Response(response.status, response_headers, body)
+
+    def close(self) -> None:
+        """
+        Closes the connections of the current thread
+        """
+        connections = self.get_connections()
+        for connection in connections.values():
+            connection.close()
+        connections.clear()
+
+
+class StubTransport(Transport):
+    """
+    A transport that answers from {responses} instead of the network, meant
+    for tests. {responses} is either a callable that gets the url and returns
+    a response, or a sequence of responses returned in order. A response is a
+    Response, a string or bytes with a json body, or an object with a read()
+    method like the ones urlopen returns.
+
+    Every request is recorded in requests as an (url, headers) tuple
+    """
+
+    def __init__(self, responses=()) -> None:
+        if callable(responses):
+            self.responses = responses
+        else:
+            responses = iter(responses)
+            self.responses = lambda url: next(responses)
+        self.requests = []
+
+    def fetch(self, url: str, headers: dict = None) -> Response:
+        self.requests.append((url, headers or {}))
+        response = self.responses(url)
+
+        if isinstance(response, Response):
+            return response
+        if isinstance(response, str):
+            return Response(200, {}, response.encode("utf-8"))
+        if isinstance(response, bytes):
+            return Response(200, {}, response)
+        return Response(getattr(response, "status", 200), {}, response.read())
+
+
+transports = {}
+transports_lock = threading.Lock()
+
+
+def get_transport() -> Transport:
+    """
+    Returns the transport set in the MAGNET_DATA_TRANSPORT setting, which is
+    either a Transport or the dotted path of a Transport class that is created
+    once per process
+    """
+    transport = get_setting("TRANSPORT")
+    if not isinstance(transport, str):
+        return transport
+
+    with transports_lock:
+        if transport not in transports:
+            transports[transport] = import_string(transport)()
+        return transports[transport]
+
+
+def get_url(path: str) -> str:
+    """
+    Returns the url of {path} in the api
+    """
+    return f"{get_setting('API_URL')}{path}"
@@ -1,9 +1,67 @@
 import datetime
+
+import django
 from django.utils import timezone
 
+try:
+    from asgiref.sync import sync_to_async
+except ImportError:  # pragma: no cover
+    # django < 3.0
+    sync_to_async = None
+
 
 def today() -> datetime.date:
     """
     This method obtains today's date in local time
     """
     return timezone.localtime(timezone.now()).date()
+
+
+def bulk_upsert(queryset, objects: list, unique_fields: list,
+                update_fields: list) -> None:
+    """
+    Inserts {objects}, updating the {update_fields} of the rows that already
+    exist with the same {unique_fields}. {queryset} must contain every existing
+    row that can conflict with {objects}; it is only read on Django versions
+    without bulk_create(update_conflicts=True).
+
+    Call it inside a transaction.
+    """
+    if not objects:
+        return
+
+    if django.VERSION >= (4, 1):
+        queryset.model.objects.bulk_create(
+            objects,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=update_fields,
+        )
+        return
+
+    def get_key(obj):
+        return tuple(getattr(obj, field) for field in unique_fields)
+
+    existing_objects = {get_key(obj): obj for obj in queryset}
+    new_objects = []
+    updated_objects = []
+
+    for obj in objects:
+        existing_object = existing_objects.get(get_key(obj))
+        if existing_object is None:
+            new_objects.append(obj)
+        else:
+            for field in update_fields:
+                setattr(existing_object, field, getattr(obj, field))
+            updated_objects.append(existing_object)
+
+    queryset.model.objects.bulk_create(new_objects)
+    queryset.model.objects.bulk_update(updated_objects, update_fields)
+
+
+async def run_sync(function, *args, **kwargs):
+    """
+    Calls the blocking {function} from async code, on the thread django uses
+    for synchronous database access
+    """
+    return await sync_to_async(function)(*args, **kwargs)
@@ -18,6 +18,16 @@ DATABASES = {
     }
 }
 
+if os.environ.get("MAGNETDATA_TEST_POSTGRES_NAME"):
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ["MAGNETDATA_TEST_POSTGRES_NAME"],
+        "USER": os.environ.get("MAGNETDATA_TEST_POSTGRES_USER", ""),
+        "PASSWORD": os.environ.get("MAGNETDATA_TEST_POSTGRES_PASSWORD", ""),
+        "HOST": os.environ.get("MAGNETDATA_TEST_POSTGRES_HOST", ""),
+        "PORT": os.environ.get("MAGNETDATA_TEST_POSTGRES_PORT", ""),
+    }
+
 INSTALLED_APPS = [
     "django.contrib.admin",
     "django.contrib.auth",
@@ -26,6 +36,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "magnet_data.apps.MagnetDataConfig",
+    "benchmarks",
 ]
 
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
@@ -0,0 +1,27 @@
+# django
+from django.core.cache import cache
+from django.test import TestCase
+
+# magnet data
+from benchmarks import operations
+
+
+class TestBenchmarks(TestCase):
+    def test_operations(self):
+        cache.set("key", "value")
+        results = operations.run(repeat=2, rounds=1)
+
+        # the benchmarks do not clear the cache of the project
+        self.assertEqual(cache.get("key"), "value")
+
+        operation_names = {result["operation"] for result in results}
+        self.assertEqual(len(operation_names), 8)
+
+        for result in results:
+            if result["state"] == "cold":
+                self.assertGreater(result["http_calls"], 0, result)
+            elif result["state"] == "database":
+                self.assertEqual(result["http_calls"], 0, result)
+            elif result["operation"] != "update_values, a month":
+                self.assertEqual(result["queries"], 0, result)
+                self.assertEqual(result["http_calls"], 0, result)
@@ -1,16 +1,42 @@
 # standard library
 from decimal import Decimal
+from io import StringIO
 from unittest.mock import MagicMock
 from unittest.mock import patch
+from unittest import skipIf
 import datetime
+import threading
 
 # django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.db.models import Sum
+from django.test import override_settings
 from django.test.testcases import TestCase
+from django.test.testcases import TransactionTestCase
+from django.utils import timezone
 
 # magnet data
 from magnet_data.magnet_data_client import MagnetDataClient
 from magnet_data import utils
+from magnet_data.currencies.cache import LocalCache
+from magnet_data.currencies.cache import currency_cache
+from magnet_data.currencies.client import save_values
+from magnet_data.currencies.client import update_values
+from magnet_data.currencies.currency_pair import StaleValue
+from magnet_data.currencies.currency_pair import month_range
+from magnet_data.currencies.exceptions import ValueNotFoundException
+from magnet_data.currencies.expressions import ConvertCurrency
+from magnet_data.holidays import calendar
+from magnet_data.models import CurrencyValue
 from magnet_data.models import Holiday
+from magnet_data.models import HolidayRefresh
+from magnet_data.models import SyncState
+from magnet_data.transport import Response
+from magnet_data.transport import StubTransport
+from magnet_data.transport import TransportError
 from magnet_data.admin import HolidayAdmin
 
 from django.test import Client
@@ -18,8 +44,73 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.contrib.admin.sites import site
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def mock_response(content: str) -> MagicMock:
+    response = MagicMock()
+    response.read.return_value = content.encode("utf-8")
+    response.status = 200
+    return response
+
+
+def mock_currency_values(values: dict) -> MagicMock:
+    objects = [
+        '{"date": "%s", "value": "%s"}' % (date, value)
+        for date, value in sorted(values.items())
+    ]
+    return mock_response('{"objects": [%s]}' % ", ".join(objects))
+
+
+def july_2022_values(currency: str) -> dict:
+    """
+    Values of {currency} in CLP on july 2022. USD and EUR are not published
+    on weekends
+    """
+    values = {}
+    for day in range(1, 32):
+        date = datetime.date(2022, 7, day)
+        if currency == "CLF":
+            values[date] = Decimal("33000") + day
+        elif date.weekday() < 5:
+            values[date] = Decimal("900") + day
+    return values
+
+
+def stub_transport(test_case: TestCase, responses) -> StubTransport:
+    """
+    Makes the api answer with {responses} until {test_case} ends
+    """
+    transport = StubTransport(responses)
+    transport_patch = patch(
+        "magnet_data.transport.get_transport", return_value=transport
+    )
+    transport_patch.start()
+    test_case.addCleanup(transport_patch.stop)
+    return transport
+
+
+def mock_currencies_api(test_case: TestCase,
+                        values_by_currency: dict) -> StubTransport:
+    def get_response(url):
+        base_currency, _, year, month = url.split("/")[-5:-1]
+        return mock_currency_values({
+            date: value
+            for date, value in values_by_currency.get(base_currency.upper(), {}).items()
+            if (date.year, date.month) == (int(year), int(month))
+        })
+
+    return stub_transport(test_case, get_response)
+
 
 class TestCurrencies(TestCase):
+    def setUp(self):
+        cache.clear()
+        currency_cache.clear_local()
+
     def test_currencies(self):
         magnet_data_client = MagnetDataClient()
         currencies = magnet_data_client.currencies
@@ -115,8 +206,718 @@ class TestCurrencies(TestCase):
         clf_in_usd_on_tomorrow = usd_to_clf_converter.latest()
         self.assertLess(clf_in_usd_on_tomorrow, 1)
 
+    def test_update_values_upserts_the_month_in_bulk(self):
+        july = {
+            datetime.date(2022, 7, day): Decimal("900") + day
+            for day in range(1, 32)
+        }
+        stub_transport(self, [
+            mock_currency_values(july),
+            mock_currency_values({
+                date: value + 1 for date, value in july.items()
+            }),
+            mock_currency_values({
+                date: value + 1 for date, value in july.items()
+            }),
+        ])
+
+        # the update of an unchanged sync state, a savepoint, a single insert
+        # of the values and one of the sync state, and the savepoint release
+        with self.assertNumQueries(5):
+            update_values(2022, 7, "USD", "CLP")
+        self.assertEqual(CurrencyValue.objects.count(), 31)
+
+        with self.assertNumQueries(5):
+            update_values(2022, 7, "USD", "CLP")
+        self.assertEqual(CurrencyValue.objects.count(), 31)
+        self.assertEqual(
+            CurrencyValue.objects.get(date=datetime.date(2022, 7, 5)).value,
+            Decimal("906"),
+        )
+
+        # unchanged months are not written again
+        with self.assertNumQueries(1):
+            update_values(2022, 7, "USD", "CLP")
+        sync_state = SyncState.objects.get()
+        self.assertEqual(sync_state.row_count, 31)
+        self.assertTrue(sync_state.closed)
+
+    @patch("magnet_data.utils.django.VERSION", (4, 0))
+    def test_update_values_without_upsert_support(self):
+        stub_transport(self, [
+            mock_currency_values({
+                datetime.date(2022, 7, 4): "900",
+                datetime.date(2022, 7, 5): "901",
+            }),
+            mock_currency_values({
+                datetime.date(2022, 7, 5): "911",
+                datetime.date(2022, 7, 6): "912",
+            }),
+        ])
+
+        update_values(2022, 7, "USD", "CLP")
+        update_values(2022, 7, "USD", "CLP")
+
+        self.assertEqual(
+            dict(CurrencyValue.objects.values_list("date", "value")),
+            {
+                datetime.date(2022, 7, 4): Decimal("900"),
+                datetime.date(2022, 7, 5): Decimal("911"),
+                datetime.date(2022, 7, 6): Decimal("912"),
+            },
+        )
+
+    def test_on_month(self):
+        transport = mock_currencies_api(self, {
+            "USD": july_2022_values("USD"),
+            "CLF": july_2022_values("CLF"),
+        })
+        currencies = MagnetDataClient().currencies
+
+        usd_to_clp_converter = currencies.get_pair(currencies.USD, currencies.CLP)
+        usd_in_clp_on_july = usd_to_clp_converter.on_month(2022, 7)
+        self.assertEqual(usd_in_clp_on_july, july_2022_values("USD"))
+        self.assertEqual(len(transport.requests), 1)
+
+        # the month is cached as a single entry
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                usd_to_clp_converter.on_month(2022, 7), usd_in_clp_on_july
+            )
+
+        # weekends without values do not make a closed month incomplete
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                usd_to_clp_converter.on_month(2022, 7), usd_in_clp_on_july
+            )
+        self.assertEqual(len(transport.requests), 1)
+
+    def test_on_month_of_inverse_and_non_CLP_pairs(self):
+        usd_values = july_2022_values("USD")
+        clf_values = july_2022_values("CLF")
+        transport = mock_currencies_api(self, {"USD": usd_values, "CLF": clf_values})
+        currencies = MagnetDataClient().currencies
+
+        clp_to_clf_converter = currencies.get_pair(currencies.CLP, currencies.CLF)
+        self.assertEqual(
+            clp_to_clf_converter.on_month(2022, 7),
+            {date: 1 / value for date, value in clf_values.items()},
+        )
+        self.assertEqual(len(transport.requests), 1)
+
+        usd_to_clf_converter = currencies.get_pair(currencies.USD, currencies.CLF)
+        clf_in_usd_on_july = usd_to_clf_converter.on_month(2022, 7)
+        self.assertEqual(len(transport.requests), 2)
+        self.assertEqual(
+            clf_in_usd_on_july,
+            {date: clf_values[date] / value for date, value in usd_values.items()},
+        )
+        self.assertEqual(
+            clf_in_usd_on_july[datetime.date(2022, 7, 5)],
+            usd_to_clf_converter.on_date(datetime.date(2022, 7, 5)),
+        )
+
+        self.assertEqual(
+            currencies.get_pair(currencies.USD, currencies.USD).on_month(2022, 2),
+            {
+                datetime.date(2022, 2, day): Decimal(1)
+                for day in range(1, 29)
+            },
+        )
+
+    def test_on_range(self):
+        start_date = datetime.date(2020, 11, 15)
+        end_date = datetime.date(2022, 2, 10)
+        usd_values = {}
+        clf_values = {}
+        date = datetime.date(2020, 11, 1)
+        while date <= datetime.date(2022, 2, 28):
+            clf_values[date] = Decimal("30000") + date.day
+            if date.weekday() < 5:
+                usd_values[date] = Decimal("800") + date.month
+            date += datetime.timedelta(days=1)
+        transport = mock_currencies_api(self, {"USD": usd_values, "CLF": clf_values})
+        currencies = MagnetDataClient().currencies
+
+        # a month that is already stored is not fetched again
+        usd_to_clp_converter = currencies.get_pair(currencies.USD, currencies.CLP)
+        usd_to_clp_converter.on_month(2021, 6)
+        self.assertEqual(len(transport.requests), 1)
+
+        values = usd_to_clp_converter.on_range(start_date, end_date, chunk_size=50)
+        self.assertEqual(len(transport.requests), 1)
+        self.assertEqual(
+            list(values),
+            [
+                (date, value)
+                for date, value in sorted(usd_values.items())
+                if start_date <= date <= end_date
+            ],
+        )
+        self.assertEqual(len(transport.requests), 16)
+
+        # once stored, streaming the range only reads the database
+        with self.assertNumQueries(2):
+            list(usd_to_clp_converter.on_range(start_date, end_date))
+
+        clf_to_usd_converter = currencies.get_pair(currencies.CLF, currencies.USD)
+        self.assertEqual(
+            list(clf_to_usd_converter.on_range(start_date, end_date, chunk_size=7)),
+            [
+                (date, value / clf_values[date])
+                for date, value in sorted(usd_values.items())
+                if start_date <= date <= end_date
+            ],
+        )
+        self.assertEqual(len(transport.requests), 32)
+
+    @patch("magnet_data.utils.today", return_value=datetime.date(2022, 7, 20))
+    def test_open_months_are_not_fetched_again_until_the_misses_expire(
+        self, mock_today
+    ):
+        usd_values = {
+            date: value
+            for date, value in july_2022_values("USD").items()
+            if date.day < 20
+        }
+        transport = mock_currencies_api(self, {"USD": usd_values})
+        usd_to_clp_converter = MagnetDataClient().currencies.get_pair("USD", "CLP")
+        start_date = datetime.date(2022, 7, 1)
+        today = datetime.date(2022, 7, 20)
+
+        # the value of today is not published yet
+        for _ in range(3):
+            list(usd_to_clp_converter.on_range(start_date, today))
+        self.assertEqual(len(transport.requests), 1)
+
+        with override_settings(MAGNET_DATA_NEGATIVE_CACHE_TIMEOUT=0):
+            list(usd_to_clp_converter.on_range(start_date, today))
+        self.assertEqual(len(transport.requests), 2)
+
+    def test_on_date_misses_are_cached(self):
+        usd_values = july_2022_values("USD")
+        transport = mock_currencies_api(self, {"USD": usd_values})
+        usd_to_clp_converter = MagnetDataClient().currencies.get_pair("USD", "CLP")
+        saturday = datetime.date(2022, 7, 2)
+
+        with self.assertRaises(ValueNotFoundException):
+            usd_to_clp_converter.on_date(saturday)
+        self.assertEqual(len(transport.requests), 1)
+
+        # the miss costs a single cache lookup now
+        with self.assertNumQueries(0):
+            with self.assertRaises(ValueNotFoundException):
+                usd_to_clp_converter.on_date(saturday)
+        self.assertEqual(len(transport.requests), 1)
+
+        # until the value is published
+        usd_values[saturday] = Decimal("930")
+        update_values(2022, 7, "USD", "CLP")
+        self.assertEqual(usd_to_clp_converter.on_date(saturday), Decimal("930"))
+
+    def test_asof(self):
+        transport = mock_currencies_api(self, {
+            "USD": july_2022_values("USD"),
+            "EUR": july_2022_values("EUR"),
+        })
+        currencies = MagnetDataClient().currencies
+        usd_to_clp_converter = currencies.get_pair("USD", "CLP")
+        saturday = datetime.date(2022, 7, 2)
+
+        # the month is fetched once, and the friday value is returned
+        self.assertEqual(usd_to_clp_converter.asof(saturday), Decimal("901"))
+        self.assertEqual(len(transport.requests), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                usd_to_clp_converter.on_date(saturday, fallback="previous"),
+                Decimal("901"),
+            )
+
+        # stored months answer with a single query
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                usd_to_clp_converter.asof(datetime.date(2022, 7, 10)),
+                Decimal("908"),
+            )
+        self.assertEqual(len(transport.requests), 1)
+
+        # inverse and non CLP pairs, without fetching the closed month of USD
+        # again
+        self.assertEqual(
+            currencies.get_pair("CLP", "USD").asof(saturday), 1 / Decimal("901")
+        )
+        self.assertEqual(
+            currencies.get_pair("USD", "EUR").asof(datetime.date(2022, 7, 17)),
+            Decimal("915") / Decimal("915"),
+        )
+
+        # dates without any previous value are misses, fetched once
+        june_date = datetime.date(2022, 6, 15)
+        for _ in range(2):
+            with self.assertRaises(ValueNotFoundException):
+                usd_to_clp_converter.asof(june_date)
+        self.assertEqual(len(transport.requests), 3)
+
+        with self.assertRaises(ValueError):
+            usd_to_clp_converter.on_date(saturday, fallback="next")
+
+    def test_misses_on_closed_months_are_not_fetched_again(self):
+        transport = mock_currencies_api(self, {
+            "USD": july_2022_values("USD"),
+            "EUR": july_2022_values("EUR"),
+        })
+        currencies = MagnetDataClient().currencies
+        usd_to_clp_converter = currencies.get_pair("USD", "CLP")
+        usd_to_eur_converter = currencies.get_pair("USD", "EUR")
+        saturday = datetime.date(2022, 7, 2)
+
+        for _ in range(2):
+            for converter in (usd_to_clp_converter, usd_to_eur_converter):
+                with self.assertRaises(ValueNotFoundException):
+                    converter.on_date(saturday)
+            self.assertEqual(
+                usd_to_clp_converter.asof(datetime.date(2022, 7, 3)),
+                Decimal("901"),
+            )
+
+            # the misses expire, but the months were closed when fetched
+            cache.clear()
+            currency_cache.clear_local()
+
+        self.assertEqual(len(transport.requests), 2)
+
+    @override_settings(MAGNET_DATA_NEGATIVE_CACHE_TIMEOUT=0)
+    @patch("magnet_data.utils.today", return_value=datetime.date(2022, 7, 20))
+    def test_on_date_misses_are_not_cached_if_disabled(self, mock_today):
+        transport = mock_currencies_api(self, {"USD": july_2022_values("USD")})
+        usd_to_clp_converter = MagnetDataClient().currencies.get_pair("USD", "CLP")
+
+        for call_count in (1, 2):
+            with self.assertRaises(ValueNotFoundException):
+                usd_to_clp_converter.on_date(datetime.date(2022, 7, 2))
+            self.assertEqual(len(transport.requests), call_count)
+
+    @override_settings(MAGNET_DATA_LOCAL_CACHE_SIZE=100)
+    def test_local_cache(self):
+        usd_values = july_2022_values("USD")
+        mock_currencies_api(self, {"USD": usd_values})
+        usd_to_clp_converter = MagnetDataClient().currencies.get_pair("USD", "CLP")
+        date = datetime.date(2022, 7, 5)
+
+        self.assertEqual(usd_to_clp_converter.on_date(date), usd_values[date])
+        self.assertEqual(currency_cache.stats()["hits"], 0)
+
+        # past values are answered by the local cache alone
+        cache.clear()
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.assertEqual(usd_to_clp_converter.on_date(date), usd_values[date])
+        self.assertEqual(currency_cache.stats()["hits"], 10)
+
+        # until update_values writes them again
+        usd_values[date] = Decimal("1000")
+        update_values(2022, 7, "USD", "CLP")
+        self.assertEqual(usd_to_clp_converter.on_date(date), Decimal("1000"))
+
+    def test_local_cache_is_bounded_and_expires(self):
+        local_cache = LocalCache(max_size=2)
+        with patch("magnet_data.currencies.cache.time.monotonic", return_value=0):
+            local_cache.set("a", 1, None)
+            local_cache.set("b", 2, 10)
+            self.assertEqual(local_cache.get_many(["a"]), {"a": 1})
+            local_cache.set("c", 3, 10)
+
+            # b was the least recently used
+            self.assertEqual(
+                local_cache.get_many(["a", "b", "c"]), {"a": 1, "c": 3}
+            )
+
+        with patch("magnet_data.currencies.cache.time.monotonic", return_value=10):
+            self.assertEqual(local_cache.get_many(["a", "c"]), {"a": 1})
+
+        self.assertEqual(local_cache.stats(), {"hits": 4, "misses": 2, "size": 1})
+
+    def test_matrix_on_date(self):
+        date = datetime.date(2022, 7, 5)
+        clp_values = {"USD": Decimal("927.53"), "EUR": Decimal("960.12")}
+        transport = mock_currencies_api(self, {
+            "USD": {date: clp_values["USD"]},
+            "EUR": {date: clp_values["EUR"]},
+            "CLF": {},
+        })
+        currencies = MagnetDataClient().currencies
+
+        matrix = currencies.matrix_on_date(date)
+        self.assertEqual(len(transport.requests), 3)
+
+        self.assertEqual(set(matrix), {"CLP", "CLF", "USD", "EUR"})
+        for base_currency, values in matrix.items():
+            for counter_currency, value in values.items():
+                pair = currencies.get_pair(base_currency, counter_currency)
+                if value is None:
+                    with self.assertRaises(ValueNotFoundException):
+                        pair.on_date(date)
+                else:
+                    self.assertEqual(value, pair.on_date(date))
+
+        self.assertEqual(matrix["USD"]["CLP"], Decimal("927.53"))
+        self.assertEqual(matrix["CLP"]["USD"], 1 / Decimal("927.53"))
+        self.assertEqual(
+            matrix["USD"]["EUR"], Decimal("960.12") / Decimal("927.53")
+        )
+        self.assertEqual(matrix["EUR"]["EUR"], 1)
+        self.assertIsNone(matrix["CLF"]["CLP"])
+        self.assertIsNone(matrix["USD"]["CLF"])
+
+        # CLF is remembered as missing, the rest is read with one query
+        with self.assertNumQueries(1):
+            self.assertEqual(currencies.matrix_on_date(date), matrix)
+        self.assertEqual(len(transport.requests), 3)
+
+    def test_non_CLP_on_date_reads_both_currencies_at_once(self):
+        date = datetime.date(2022, 7, 5)
+        mock_currencies_api(self, {
+            "USD": {date: Decimal("927.53")},
+            "CLF": {date: Decimal("33152.68")},
+        })
+        update_values(2022, 7, "USD", "CLP")
+        update_values(2022, 7, "CLF", "CLP")
+
+        usd_to_clf_converter = MagnetDataClient().currencies.get_pair("USD", "CLF")
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                usd_to_clf_converter.on_date(date),
+                Decimal("33152.68") / Decimal("927.53"),
+            )
+
+    def test_convert_many(self):
+        usd_values = july_2022_values("USD")
+        clf_values = july_2022_values("CLF")
+        transport = mock_currencies_api(self, {"USD": usd_values, "CLF": clf_values})
+        currencies = MagnetDataClient().currencies
+        rows = [
+            (Decimal(amount), datetime.date(2022, 7, day))
+            for amount in ("10.5", "1", "0")
+            for day in (1, 5, 6, 29)
+        ]
+
+        usd_to_clp_converter = currencies.get_pair(currencies.USD, currencies.CLP)
+        self.assertEqual(
+            usd_to_clp_converter.convert_many(iter(rows)),
+            [amount * usd_values[date] for amount, date in rows],
+        )
+        self.assertEqual(len(transport.requests), 1)
+
+        # once stored, every row is converted with a single query
+        clp_to_usd_converter = currencies.get_pair(currencies.CLP, currencies.USD)
+        with self.assertNumQueries(1):
+            converted_amounts = clp_to_usd_converter.convert_many(rows)
+        self.assertEqual(
+            converted_amounts,
+            [amount * (1 / usd_values[date]) for amount, date in rows],
+        )
+
+        usd_to_clf_converter = currencies.get_pair(currencies.USD, currencies.CLF)
+        self.assertEqual(
+            usd_to_clf_converter.convert_many(rows),
+            [
+                amount * usd_to_clf_converter.on_date(date)
+                for amount, date in rows
+            ],
+        )
+        self.assertEqual(len(transport.requests), 2)
+
+        # floats, as ledger exports often have them, are converted to Decimals
+        converted_amounts = usd_to_clp_converter.convert_many([
+            (10.5, datetime.date(2022, 7, 1)),
+            (0.1, datetime.date(2022, 7, 5)),
+        ])
+        self.assertEqual(converted_amounts, [
+            Decimal("10.5") * usd_values[datetime.date(2022, 7, 1)],
+            Decimal("0.1") * usd_values[datetime.date(2022, 7, 5)],
+        ])
+        for converted_amount in converted_amounts:
+            self.assertIsInstance(converted_amount, Decimal)
+
+        self.assertEqual(usd_to_clp_converter.convert_many([]), [])
+        with self.assertRaises(ValueNotFoundException):
+            usd_to_clp_converter.convert_many([(1, datetime.date(2022, 7, 2))])
+
+    def test_convert_currency_expression(self):
+        usd_values = july_2022_values("USD")
+        clf_values = july_2022_values("CLF")
+        mock_currencies_api(self, {"USD": usd_values, "CLF": clf_values})
+        update_values(2022, 7, "USD", "CLP")
+        update_values(2022, 7, "CLF", "CLP")
+        currencies = MagnetDataClient().currencies
+
+        # convert the id of each USD row, as an amount, on the date of the row
+        queryset = CurrencyValue.objects.filter(base_currency="USD")
+        for base_currency, counter_currency in (
+            ("USD", "CLP"),
+            ("CLP", "CLF"),
+            ("USD", "CLF"),
+            ("EUR", "EUR"),
+        ):
+            converted_amounts = dict(queryset.annotate(
+                converted_amount=ConvertCurrency(
+                    F("id"),
+                    base=base_currency,
+                    counter=counter_currency,
+                    date=F("date"),
+                ),
+            ).values_list("id", "converted_amount"))
+
+            pair = currencies.get_pair(base_currency, counter_currency)
+            for currency_value in queryset:
+                self.assertAlmostEqual(
+                    converted_amounts[currency_value.id],
+                    currency_value.id * pair.on_date(currency_value.date),
+                    places=6,
+                )
+
+        # amounts whose value is not stored convert to NULL
+        self.assertIsNone(
+            CurrencyValue.objects.annotate(
+                converted_amount=ConvertCurrency(
+                    F("value"), base="EUR", counter="CLP", date=F("date")
+                ),
+            ).values_list("converted_amount", flat=True).first()
+        )
+
+        # and converted amounts can be aggregated
+        total = queryset.aggregate(
+            total=Sum(ConvertCurrency(
+                10, base="USD", counter="CLP", date=F("date")
+            ))
+        )["total"]
+        self.assertAlmostEqual(total, 10 * sum(usd_values.values()), places=6)
+
+        self.assertEqual(
+            queryset.annotate(
+                converted_amount=ConvertCurrency(
+                    1, base="USD", counter="CLP", date=datetime.date(2022, 7, 5)
+                ),
+            ).filter(converted_amount__gt=900).count(),
+            len(usd_values),
+        )
+
+    def test_backfill(self):
+        def get_values(currency, year, month):
+            start_date, end_date = month_range(year, month)
+            return {
+                start_date + datetime.timedelta(days=days): Decimal("900") + days
+                for days in range((end_date - start_date).days + 1)
+                if currency == "CLF"
+                or (start_date + datetime.timedelta(days=days)).weekday() < 5
+            }
+
+        def get_response(url):
+            base_currency, _, year, month = url.split("/")[-5:-1]
+            return mock_currency_values(
+                get_values(base_currency.upper(), int(year), int(month))
+            )
+
+        transport = stub_transport(self, get_response)
+        update_values(2022, 7, "USD", "CLP")
+        self.assertEqual(len(transport.requests), 1)
+
+        currencies = MagnetDataClient().currencies
+        months_count = currencies.backfill(
+            [("USD", "CLF"), currencies.get_pair("CLP", "EUR"), ("CLP", "CLP")],
+            datetime.date(2022, 5, 1),
+            datetime.date(2022, 8, 31),
+            workers=3,
+        )
+
+        # every month of CLF and EUR, and the months of USD but july
+        self.assertEqual(months_count, 11)
+        self.assertEqual(len(transport.requests), 12)
+        for currency in ("USD", "CLF", "EUR"):
+            expected_values = {}
+            for month in range(5, 9):
+                expected_values.update(get_values(currency, 2022, month))
+            self.assertEqual(
+                dict(
+                    CurrencyValue.objects.filter(
+                        base_currency=currency
+                    ).values_list("date", "value")
+                ),
+                expected_values,
+            )
+
+        # complete months are not fetched again
+        self.assertEqual(
+            currencies.backfill(
+                [("USD", "CLF"), ("EUR", "CLP")],
+                datetime.date(2022, 5, 1),
+                datetime.date(2022, 8, 31),
+            ),
+            0,
+        )
+        self.assertEqual(len(transport.requests), 12)
+
+    def test_backfill_stores_the_months_fetched_before_an_error(self):
+        def get_response(url):
+            if "/2022/06/" in url:
+                raise TransportError(url, status=500)
+            return mock_currency_values(july_2022_values("CLF"))
+
+        stub_transport(self, get_response)
+
+        with self.assertRaises(TransportError):
+            MagnetDataClient().currencies.backfill(
+                [("CLF", "CLP")],
+                datetime.date(2022, 6, 1),
+                datetime.date(2022, 7, 31),
+            )
+        self.assertEqual(CurrencyValue.objects.count(), 31)
+
+    async def test_async_on_date(self):
+        usd_values = july_2022_values("USD")
+        clf_values = july_2022_values("CLF")
+        transport = mock_currencies_api(self, {"USD": usd_values, "CLF": clf_values})
+        currencies = MagnetDataClient().currencies
+        date = datetime.date(2022, 7, 5)
+
+        # both currencies are fetched together
+        usd_to_clf_converter = currencies.get_pair(currencies.USD, currencies.CLF)
+        self.assertEqual(
+            await usd_to_clf_converter.aon_date(date),
+            clf_values[date] / usd_values[date],
+        )
+        self.assertEqual(len(transport.requests), 2)
+
+        usd_to_clp_converter = currencies.get_pair(currencies.USD, currencies.CLP)
+        self.assertEqual(await usd_to_clp_converter.aon_date(date), usd_values[date])
+        self.assertEqual(
+            await currencies.get_pair("CLP", "CLF").aon_date(date),
+            1 / clf_values[date],
+        )
+        self.assertEqual(len(transport.requests), 2)
+
+        # misses are not fetched again on closed months, like on_date does
+        for _ in range(2):
+            with self.assertRaises(ValueNotFoundException):
+                await usd_to_clp_converter.aon_date(datetime.date(2022, 7, 9))
+            self.assertEqual(len(transport.requests), 2)
+
+        with patch("magnet_data.utils.today", return_value=date):
+            self.assertEqual(await usd_to_clp_converter.anow(), usd_values[date])
+            self.assertEqual(await usd_to_clp_converter.alatest(), usd_values[date])
+
+    def test_series(self):
+        usd_values = july_2022_values("USD")
+        clf_values = july_2022_values("CLF")
+        transport = mock_currencies_api(self, {"USD": usd_values, "CLF": clf_values})
+        currencies = MagnetDataClient().currencies
+        start_date = datetime.date(2022, 7, 1)
+        end_date = datetime.date(2022, 7, 31)
+
+        usd_series = currencies.get_pair("USD", "CLP").series(start_date, end_date)
+        self.assertEqual(len(transport.requests), 1)
+        self.assertEqual(
+            list(usd_series),
+            [(date, float(value)) for date, value in sorted(usd_values.items())],
+        )
+
+        # pairs without CLP and inverse pairs are computed on the series
+        usd_to_clf_series = currencies.get_pair("USD", "CLF").series(
+            start_date, end_date
+        )
+        self.assertEqual(len(transport.requests), 2)
+        # the last stored dates, and the values of both currencies
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                currencies.get_pair("USD", "CLF").series(start_date, end_date),
+                usd_to_clf_series,
+            )
+        self.assertEqual(len(usd_to_clf_series), len(usd_values))
+        for date, value in usd_to_clf_series:
+            self.assertAlmostEqual(
+                value, float(clf_values[date] / usd_values[date]), places=12
+            )
+
+        clp_to_clf_series = currencies.get_pair("CLP", "CLF").series(
+            start_date, end_date
+        )
+        self.assertEqual(len(clp_to_clf_series), 31)
+        self.assertAlmostEqual(
+            clp_to_clf_series[datetime.date(2022, 7, 9)],
+            1 / float(clf_values[datetime.date(2022, 7, 9)]),
+            places=15,
+        )
+        self.assertEqual(len(transport.requests), 2)
+
+        self.assertEqual(
+            len(currencies.get_pair("EUR", "EUR").series(start_date, end_date)), 31
+        )
+
+
+@patch("magnet_data.utils.today", return_value=datetime.date(2022, 7, 6))
+class TestStaleWhileRevalidate(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        currency_cache.clear_local()
+        self.usd_values = july_2022_values("USD")
+        self.transport = mock_currencies_api(self, {"USD": self.usd_values})
+        save_values("USD", "CLP", {
+            date: value
+            for date, value in self.usd_values.items()
+            if date.day <= 5
+        })
+
+    def test_stale_value_is_returned_while_refreshing(self, mock_today):
+        # the refresh waits for the stale values to be checked
+        refresh_released = threading.Event()
+        get_response = self.transport.responses
+
+        def get_released_response(url):
+            refresh_released.wait(5)
+            return get_response(url)
+
+        self.transport.responses = get_released_response
+        usd_to_clp_converter = MagnetDataClient().currencies.get_pair("USD", "CLP")
+
+        value = usd_to_clp_converter.now(allow_stale=True)
+        self.assertIsInstance(value, StaleValue)
+        self.assertEqual(value, self.usd_values[datetime.date(2022, 7, 5)])
+        self.assertEqual(value.date, datetime.date(2022, 7, 5))
+        refresh_thread = usd_to_clp_converter.refresh_thread
+
+        # a single refresh is started
+        value = usd_to_clp_converter.latest(allow_stale=True)
+        self.assertIsInstance(value, StaleValue)
+        self.assertIs(usd_to_clp_converter.refresh_thread, refresh_thread)
+
+        refresh_released.set()
+        refresh_thread.join()
+        self.assertEqual(len(self.transport.requests), 1)
+
+        value = usd_to_clp_converter.now(allow_stale=True)
+        self.assertNotIsInstance(value, StaleValue)
+        self.assertEqual(value, self.usd_values[datetime.date(2022, 7, 6)])
+
+    def test_stale_values_are_opt_in(self, mock_today):
+        clp_to_usd_converter = MagnetDataClient().currencies.get_pair("CLP", "USD")
+
+        value = clp_to_usd_converter.now()
+        self.assertNotIsInstance(value, StaleValue)
+        self.assertEqual(value, 1 / self.usd_values[datetime.date(2022, 7, 6)])
+
+        mock_today.return_value = datetime.date(2022, 8, 1)
+        with override_settings(MAGNET_DATA_STALE_WHILE_REVALIDATE=True):
+            value = clp_to_usd_converter.now()
+        self.assertIsInstance(value, StaleValue)
+        self.assertEqual(value, 1 / self.usd_values[datetime.date(2022, 7, 29)])
+        clp_to_usd_converter.refresh_thread.join()
+
 
 class TestHolidays(TestCase):
+    def setUp(self):
+        calendar.clear()
+
     def test_holidays(self):
         magnet_data_client = MagnetDataClient()
         self.assertEqual(Holiday.objects.count(), 0)
@@ -184,8 +985,7 @@ class TestHolidays(TestCase):
         self.assertFalse(holidays.is_workday(datetime.date(2020, 9, 18), holidays.CL))
         self.assertFalse(holidays.is_workday(datetime.date(2024, 1, 1), holidays.CL))
 
-    @patch("magnet_data.holidays.models.urlopen")
-    def test_holiday_name_change(self, mock_urlopen):
+    def test_holiday_name_change(self):
         initial_response_content = """
         {
             "objects": [
@@ -219,13 +1019,13 @@ class TestHolidays(TestCase):
         updated_response.status = 200
         updated_response.read.return_value = updated_response_content.encode("utf-8")
 
-        mock_urlopen.side_effect = [initial_response, updated_response]
+        transport = stub_transport(self, [initial_response, updated_response])
         magnet_data_client = MagnetDataClient()
-        self.assertEqual(mock_urlopen.call_count, 0)
+        self.assertEqual(len(transport.requests), 0)
 
         holidays = magnet_data_client.holidays
         holidays.update(country_code=holidays.CL, year=2023)
-        self.assertEqual(mock_urlopen.call_count, 1)
+        self.assertEqual(len(transport.requests), 1)
 
         holiday_queryset = Holiday.objects.filter(
             country_code=holidays.CL,
@@ -234,13 +1034,12 @@ class TestHolidays(TestCase):
         self.assertTrue(holiday_queryset.filter(name="Feliz Año").exists())
 
         # test that holiday was updated
-        holidays.reset_cache()
+        holidays.expire(holidays.CL, 2023)
         holidays.update(country_code=holidays.CL, year=2023)
-        self.assertEqual(mock_urlopen.call_count, 2)
+        self.assertEqual(len(transport.requests), 2)
         self.assertTrue(holiday_queryset.filter(name="Nuevo Año").exists())
 
-    @patch("magnet_data.holidays.models.urlopen")
-    def test_holiday_date_change(self, mock_urlopen):
+    def test_holiday_date_change(self):
         """
         Test that when a holiday changes date, the original date is deleted
         """
@@ -288,24 +1087,508 @@ class TestHolidays(TestCase):
         updated_response.status = 200
         updated_response.read.return_value = updated_response_content.encode("utf-8")
 
-        mock_urlopen.side_effect = [initial_response, updated_response]
+        transport = stub_transport(self, [initial_response, updated_response])
         magnet_data_client = MagnetDataClient()
-        self.assertEqual(mock_urlopen.call_count, 0)
+        self.assertEqual(len(transport.requests), 0)
 
         holidays = magnet_data_client.holidays
         holidays.update(country_code=holidays.CL, year=2023)
-        self.assertEqual(mock_urlopen.call_count, 1)
+        self.assertEqual(len(transport.requests), 1)
 
         self.assertEqual(Holiday.objects.count(), 4)
 
         # test that holiday was updated
-        holidays.reset_cache()
+        holidays.expire(holidays.CL, 2023)
         holidays.update(country_code=holidays.CL, year=2023)
-        self.assertEqual(mock_urlopen.call_count, 2)
+        self.assertEqual(len(transport.requests), 2)
         self.assertEqual(Holiday.objects.count(), 4)
 
         self.assertTrue(Holiday.objects.filter(date="2023-01-02").count() == 1)
 
+    def test_business_days_are_answered_in_memory(self):
+        stub_transport(self, [
+            mock_response(
+                '{"objects": [{"date": "2023-01-02", "name": "Feriado"}]}'
+            ),
+            mock_response(
+                '{"objects": [{"date": "2023-01-03", "name": "Feriado"}]}'
+            ),
+        ])
+        holidays = MagnetDataClient().holidays
+        holidays.update(country_code=holidays.CL, year=2023)
+
+        # the first check compiles the year
+        with self.assertNumQueries(1):
+            self.assertFalse(
+                holidays.is_business_day(datetime.date(2023, 1, 2), holidays.CL)
+            )
+
+        with self.assertNumQueries(0):
+            for day in range(1, 32):
+                holidays.is_business_day(datetime.date(2023, 1, day), holidays.CL)
+            self.assertTrue(
+                holidays.is_business_day(datetime.date(2023, 1, 3), holidays.CL)
+            )
+            self.assertFalse(
+                holidays.is_business_day(datetime.date(2023, 1, 7), holidays.CL)
+            )
+
+        # rewriting the year invalidates the compiled calendar
+        holidays.expire(holidays.CL, 2023)
+        holidays.update(country_code=holidays.CL, year=2023)
+        self.assertTrue(
+            holidays.is_business_day(datetime.date(2023, 1, 2), holidays.CL)
+        )
+        self.assertFalse(
+            holidays.is_business_day(datetime.date(2023, 1, 3), holidays.CL)
+        )
+
+    def test_business_day_arithmetic_uses_the_compiled_index(self):
+        holidays_by_year = {
+            2022: ["2022-12-08", "2022-12-25"],
+            2023: ["2023-01-02", "2023-04-07", "2023-09-18", "2023-09-19"],
+            2024: ["2024-01-01", "2024-09-18", "2024-09-19", "2024-09-20"],
+        }
+
+        self.mock_holidays_api(holidays_by_year)
+        holidays = MagnetDataClient().holidays
+        holiday_dates = {
+            datetime.date.fromisoformat(date)
+            for dates in holidays_by_year.values()
+            for date in dates
+        }
+
+        def is_business_day(date):
+            return date.weekday() < 5 and date not in holiday_dates
+
+        def walk(from_date, count, step):
+            final_date = from_date
+            while count > 0:
+                final_date += datetime.timedelta(days=step)
+                if is_business_day(final_date):
+                    count -= 1
+            return final_date
+
+        for from_date in (
+            datetime.date(2022, 12, 31),
+            datetime.date(2023, 1, 1),
+            datetime.date(2023, 9, 15),
+            datetime.date(2023, 12, 29),
+            datetime.date(2024, 1, 6),
+        ):
+            for count in (0, 1, 3, 30, 250):
+                for step in (1, -1, 3):
+                    self.assertEqual(
+                        holidays.get_next_business_day(
+                            country_code=holidays.CL,
+                            business_days_count=count,
+                            from_date=from_date,
+                            step=step,
+                        ),
+                        walk(from_date, count, step),
+                        (from_date, count, step),
+                    )
+
+        # once compiled, counting 250 business days does not touch the database
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                holidays.get_next_business_day(
+                    country_code=holidays.CL,
+                    business_days_count=250,
+                    from_date=datetime.date(2023, 1, 1),
+                ),
+                walk(datetime.date(2023, 1, 1), 250, 1),
+            )
+
+            start_date = datetime.date(2022, 12, 1)
+            end_date = datetime.date(2024, 12, 31)
+            self.assertEqual(
+                holidays.get_business_days_count(holidays.CL, start_date, end_date),
+                len([
+                    days
+                    for days in range((end_date - start_date).days + 1)
+                    if is_business_day(start_date + datetime.timedelta(days=days))
+                ]),
+            )
+            self.assertEqual(
+                holidays.get_business_days_count(holidays.CL, end_date, start_date),
+                holidays.get_business_days_count(holidays.CL, start_date, end_date),
+            )
+            self.assertEqual(
+                holidays.get_holidays_count_during_weekdays(
+                    holidays.CL, start_date, end_date
+                ),
+                9,
+            )
+
+    def mock_holidays_api(self, holidays_by_year):
+        def get_response(url):
+            year = int(url.rstrip("/").split("/")[-1])
+            objects = [
+                '{"date": "%s", "name": "Feriado"}' % date
+                for date in holidays_by_year.get(year, [])
+            ]
+            return mock_response('{"objects": [%s]}' % ", ".join(objects))
+
+        return stub_transport(self, get_response)
+
+    async def test_async_business_days(self):
+        transport = self.mock_holidays_api({
+            2022: ["2022-12-26"],
+            2023: ["2023-01-02"],
+            2024: ["2024-01-01"],
+        })
+        holidays = MagnetDataClient().holidays
+
+        self.assertFalse(
+            await holidays.ais_business_day(datetime.date(2023, 1, 2), holidays.CL)
+        )
+        self.assertTrue(
+            await holidays.ais_business_day(datetime.date(2023, 1, 3), holidays.CL)
+        )
+        self.assertEqual(len(transport.requests), 1)
+
+        self.assertEqual(
+            await holidays.aget_next_business_day(
+                holidays.CL,
+                from_date=datetime.date(2022, 12, 30),
+                business_days_count=2,
+            ),
+            datetime.date(2023, 1, 4),
+        )
+        self.assertEqual(
+            await holidays.aget_next_business_day(
+                holidays.CL,
+                from_date=datetime.date(2023, 12, 29),
+                step=-1,
+                business_days_count=260,
+            ),
+            datetime.date(2022, 12, 29),
+        )
+        self.assertEqual(
+            await holidays.aget_next_business_day(
+                holidays.CL,
+                from_date=datetime.date(2023, 12, 29),
+                step=2,
+                business_days_count=3,
+            ),
+            datetime.date(2024, 1, 8),
+        )
+        self.assertEqual(len(transport.requests), 3)
+
+    def test_business_day_batches(self):
+        self.mock_holidays_api({
+            2023: ["2023-01-02", "2023-12-25"],
+            2024: ["2024-01-01"],
+        })
+        holidays = MagnetDataClient().holidays
+        dates = [
+            datetime.date(2023, 1, 1) + datetime.timedelta(days=days)
+            for days in range(0, 730, 3)
+        ]
+        for year in (2023, 2024, 2025):
+            holidays.update(holidays.CL, year)
+
+        # a single query compiles every year of the batch
+        with self.assertNumQueries(1):
+            is_business_day = holidays.is_business_day_many(dates, holidays.CL)
+        self.assertEqual(
+            is_business_day,
+            [holidays.is_business_day(date, holidays.CL) for date in dates],
+        )
+
+        # and another one the year that the last results fall into
+        with self.assertNumQueries(1):
+            next_business_days = holidays.get_next_business_day_many(
+                dates, holidays.CL, 3
+            )
+        self.assertEqual(
+            next_business_days,
+            [
+                holidays.get_next_business_day(
+                    holidays.CL, business_days_count=3, from_date=date
+                )
+                for date in dates
+            ],
+        )
+
+        self.assertEqual(holidays.is_business_day_many([], holidays.CL), [])
+        self.assertEqual(holidays.get_next_business_day_many([], holidays.CL, 3), [])
+
+    def test_counts_compile_their_years_with_a_single_query(self):
+        self.mock_holidays_api({
+            2023: ["2023-01-02", "2023-12-25"],
+            2024: ["2024-01-01"],
+            2025: [],
+        })
+        holidays = MagnetDataClient().holidays
+        for year in (2023, 2024, 2025):
+            holidays.update(holidays.CL, year)
+        holidays_calendar = calendar.get_calendar(holidays.CL)
+        start_date = datetime.date(2023, 1, 1)
+        end_date = datetime.date(2025, 12, 31)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                holidays_calendar.count_business_days(start_date, end_date), 780
+            )
+
+        calendar.clear()
+        holidays_calendar = calendar.get_calendar(holidays.CL)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                holidays_calendar.count_holidays_during_weekdays(
+                    start_date, end_date
+                ),
+                3,
+            )
+
+    @skipIf(numpy is None, "NumPy is not installed")
+    def test_business_day_batches_on_numpy_arrays(self):
+        self.mock_holidays_api({
+            2023: ["2023-01-02", "2023-12-25"],
+            2024: ["2024-01-01"],
+        })
+        holidays = MagnetDataClient().holidays
+        dates = [
+            datetime.date(2023, 1, 1) + datetime.timedelta(days=days)
+            for days in range(0, 730, 3)
+        ]
+        array = numpy.array(dates, dtype="datetime64[D]")
+
+        is_business_day = holidays.is_business_day_many(array, holidays.CL)
+        self.assertEqual(is_business_day.dtype, numpy.bool_)
+        self.assertEqual(
+            is_business_day.tolist(),
+            holidays.is_business_day_many(dates, holidays.CL),
+        )
+
+        next_business_days = holidays.get_next_business_day_many(
+            array, holidays.CL, 300
+        )
+        self.assertEqual(next_business_days.dtype, numpy.dtype("datetime64[D]"))
+        self.assertEqual(
+            next_business_days.tolist(),
+            holidays.get_next_business_day_many(dates, holidays.CL, 300),
+        )
+
+    def test_refreshes_are_shared_per_country_and_year(self):
+        transport = self.mock_holidays_api({2023: ["2023-01-02"]})
+
+        holidays = MagnetDataClient().holidays
+        holidays.update(country_code=holidays.CL, year=2023)
+        self.assertEqual(len(transport.requests), 1)
+
+        # other clients, as other processes would, reuse the refresh
+        other_holidays = MagnetDataClient().holidays
+        other_holidays.update(country_code=holidays.CL, year=2023)
+        self.assertEqual(len(transport.requests), 1)
+
+        # but each country is refreshed on its own
+        other_holidays.update(country_code=holidays.AR, year=2023)
+        self.assertEqual(len(transport.requests), 2)
+        other_holidays.update(country_code=holidays.CL, year=2024)
+        self.assertEqual(len(transport.requests), 3)
+
+        self.assertEqual(
+            set(HolidayRefresh.objects.values_list("country_code", "year")),
+            {("CL", 2023), ("AR", 2023), ("CL", 2024)},
+        )
+
+        # a day later, the first client to check fetches them again
+        HolidayRefresh.objects.update(
+            updated_at=timezone.now() - datetime.timedelta(days=2)
+        )
+        MagnetDataClient().holidays.update(country_code=holidays.CL, year=2023)
+        self.assertEqual(len(transport.requests), 4)
+        MagnetDataClient().holidays.update(country_code=holidays.CL, year=2023)
+        self.assertEqual(len(transport.requests), 4)
+
+    def test_refreshes_from_other_processes_invalidate_the_calendar(self):
+        transport = self.mock_holidays_api({2023: ["2023-01-02"]})
+        holidays = MagnetDataClient().holidays
+        self.assertFalse(
+            holidays.is_business_day(datetime.date(2023, 1, 2), holidays.CL)
+        )
+
+        # another process rewrites the year
+        Holiday.objects.filter(date=datetime.date(2023, 1, 2)).delete()
+        HolidayRefresh.objects.update(updated_at=timezone.now())
+
+        self.assertTrue(
+            MagnetDataClient().holidays.is_business_day(
+                datetime.date(2023, 1, 2), holidays.CL
+            )
+        )
+        self.assertEqual(len(transport.requests), 1)
+
+    def test_years_being_fetched_by_other_processes_are_not_read(self):
+        transport = self.mock_holidays_api({2022: ["2022-09-19"]})
+
+        # another process claimed the year, and has not stored it yet
+        HolidayRefresh.objects.create(
+            country_code="CL", year=2022, claimed_at=timezone.now()
+        )
+
+        def store_holidays(seconds):
+            Holiday.objects.create(
+                country_code="CL", date=datetime.date(2022, 9, 19), name="Feriado"
+            )
+            HolidayRefresh.objects.update(
+                updated_at=timezone.now(), claimed_at=None
+            )
+
+        holidays = MagnetDataClient().holidays
+        with patch("time.sleep", side_effect=store_holidays) as mock_sleep:
+            self.assertFalse(
+                holidays.is_business_day(datetime.date(2022, 9, 19), holidays.CL)
+            )
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertEqual(len(transport.requests), 0)
+
+        # a claim that outlived its lease is taken over
+        HolidayRefresh.objects.update(
+            updated_at=timezone.now() - datetime.timedelta(days=2),
+            claimed_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+        MagnetDataClient().holidays.update(holidays.CL, 2022)
+        self.assertEqual(len(transport.requests), 1)
+        refresh = HolidayRefresh.objects.get()
+        self.assertIsNone(refresh.claimed_at)
+        self.assertGreater(
+            refresh.updated_at, timezone.now() - datetime.timedelta(minutes=1)
+        )
+
+    def test_reset_cache_keeps_the_refreshes_of_other_processes(self):
+        transport = self.mock_holidays_api({2023: ["2023-01-02"]})
+        holidays = MagnetDataClient().holidays
+        holidays.update(holidays.CL, 2023)
+        refresh = HolidayRefresh.objects.get()
+
+        # the refresh of the last day is reused
+        holidays.reset_cache()
+        holidays.update(holidays.CL, 2023)
+        self.assertEqual(len(transport.requests), 1)
+        self.assertEqual(
+            HolidayRefresh.objects.get().content_hash, refresh.content_hash
+        )
+
+        # until the year is expired for every process
+        holidays.expire(holidays.AR)
+        MagnetDataClient().holidays.update(holidays.CL, 2023)
+        self.assertEqual(len(transport.requests), 1)
+        holidays.expire(holidays.CL)
+        MagnetDataClient().holidays.update(holidays.CL, 2023)
+        self.assertEqual(len(transport.requests), 2)
+
+    def test_stored_holidays_are_read_while_other_processes_fetch_them(self):
+        transport = self.mock_holidays_api({2022: ["2022-09-19"]})
+        Holiday.objects.create(
+            country_code="CL", date=datetime.date(2022, 9, 19), name="Feriado"
+        )
+
+        # another process claimed the year a while ago, but a fetch with the
+        # default timeouts and retries may still be running
+        HolidayRefresh.objects.create(
+            country_code="CL",
+            year=2022,
+            updated_at=timezone.now() - datetime.timedelta(days=2),
+            claimed_at=timezone.now() - datetime.timedelta(seconds=90),
+        )
+
+        holidays = MagnetDataClient().holidays
+        with patch("time.sleep") as mock_sleep:
+            self.assertFalse(
+                holidays.is_business_day(datetime.date(2022, 9, 19), holidays.CL)
+            )
+        self.assertFalse(mock_sleep.called)
+        self.assertEqual(len(transport.requests), 0)
+
+    def test_unchanged_holidays_are_not_written(self):
+        transport = self.mock_holidays_api({2023: ["2023-01-02"]})
+        holidays = MagnetDataClient().holidays
+        holidays.update(holidays.CL, 2023)
+
+        # the same response a day later
+        HolidayRefresh.objects.update(
+            updated_at=timezone.now() - datetime.timedelta(days=2)
+        )
+        with patch.object(Holiday, "save_holidays") as mock_save_holidays:
+            MagnetDataClient().holidays.update(holidays.CL, 2023)
+        self.assertEqual(len(transport.requests), 2)
+        self.assertFalse(mock_save_holidays.called)
+
+    def test_holidays_are_requested_conditionally(self):
+        body = b'{"objects": [{"date": "2023-01-02", "name": "Feriado"}]}'
+        transport = stub_transport(self, [
+            Response(200, {"etag": '"v1"', "last-modified": "Mon"}, body),
+            Response(304, {}, b""),
+        ])
+        holidays = MagnetDataClient().holidays
+        holidays.update(holidays.CL, 2023)
+
+        refresh = HolidayRefresh.objects.get()
+        self.assertEqual(refresh.etag, '"v1"')
+        self.assertEqual(len(refresh.content_hash), 64)
+
+        HolidayRefresh.objects.update(
+            updated_at=timezone.now() - datetime.timedelta(days=2)
+        )
+        with patch.object(Holiday, "save_holidays") as mock_save_holidays:
+            MagnetDataClient().holidays.update(holidays.CL, 2023)
+        self.assertFalse(mock_save_holidays.called)
+        self.assertEqual(
+            transport.requests[1][1],
+            {"If-None-Match": '"v1"', "If-Modified-Since": "Mon"},
+        )
+        self.assertFalse(
+            holidays.is_business_day(datetime.date(2023, 1, 2), holidays.CL)
+        )
+
+    def test_warm(self):
+        transport = self.mock_holidays_api({
+            2022: ["2022-12-26"],
+            2023: ["2023-01-02"],
+        })
+        # a stored holiday that is not in the api anymore
+        Holiday.objects.create(
+            country_code="PE", date=datetime.date(2023, 6, 29), name="Feriado"
+        )
+
+        stdout = StringIO()
+        call_command(
+            "magnet_data_holidays_warm",
+            countries="CL,PE",
+            years="2022-2023",
+            workers=2,
+            stdout=stdout,
+        )
+        self.assertIn("Fetched the holidays of 4 years of CL, PE", stdout.getvalue())
+        self.assertEqual(len(transport.requests), 4)
+        self.assertEqual(
+            set(Holiday.objects.values_list("country_code", "date")),
+            {
+                ("CL", datetime.date(2022, 12, 26)),
+                ("CL", datetime.date(2023, 1, 2)),
+                ("PE", datetime.date(2022, 12, 26)),
+                ("PE", datetime.date(2023, 1, 2)),
+            },
+        )
+
+        # business days are answered without calling the api
+        holidays = MagnetDataClient().holidays
+        self.assertFalse(
+            holidays.is_business_day(datetime.date(2023, 1, 2), holidays.PE)
+        )
+        self.assertEqual(len(transport.requests), 4)
+
+        # years fetched during the last day are skipped
+        holidays.warm(["CL", "AR"], 2023, 2023)
+        self.assertEqual(len(transport.requests), 5)
+
+        with self.assertRaises(CommandError):
+            call_command("magnet_data_holidays_warm", years="2030-2015")
+
 
 class AdminSiteTests(TestCase):
     def setUp(self):
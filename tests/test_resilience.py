@@ -0,0 +1,167 @@
+# standard library
+from decimal import Decimal
+from unittest.mock import patch
+import datetime
+
+# django
+from django.core.cache import cache
+from django.test import TestCase
+from django.test import override_settings
+from django.utils import timezone
+
+# magnet data
+from magnet_data import resilience
+from magnet_data.currencies.cache import currency_cache
+from magnet_data.currencies.client import save_values
+from magnet_data.holidays.models import Holiday
+from magnet_data.holidays.models import HolidayRefresh
+from magnet_data.magnet_data_client import MagnetDataClient
+from magnet_data.resilience import CircuitOpenError
+from magnet_data.transport import Response
+from magnet_data.transport import TransportError
+from tests.test_django_magnet_data import stub_transport
+
+URL = "https://data.magnet.cl/api/v1/currencies/usd/clp/2022/07/"
+
+
+def failing_response(url):
+    raise TransportError(url, reason="timed out")
+
+
+@override_settings(
+    MAGNET_DATA_RETRY_BACKOFF=0,
+    MAGNET_DATA_CIRCUIT_BREAKER_THRESHOLD=2,
+)
+class TestResilience(TestCase):
+    def setUp(self):
+        cache.clear()
+        currency_cache.clear_local()
+
+    def test_temporary_errors_are_retried(self):
+        transport = stub_transport(self, [
+            Response(503, {}, b""),
+            Response(429, {}, b""),
+            '{"objects": []}',
+        ])
+        self.assertEqual(resilience.get_json(URL), {"objects": []})
+        self.assertEqual(len(transport.requests), 3)
+
+        transport = stub_transport(self, [Response(404, {}, b"")])
+        with self.assertRaises(TransportError):
+            resilience.get_json(URL)
+        self.assertEqual(len(transport.requests), 1)
+
+    @override_settings(MAGNET_DATA_RETRIES=0)
+    def test_circuit_breaker(self):
+        transport = stub_transport(self, failing_response)
+        circuit_breaker = resilience.get_circuit_breaker(URL)
+
+        for _ in range(2):
+            with self.assertRaises(TransportError):
+                resilience.get_json(URL)
+        self.assertTrue(circuit_breaker.is_open())
+
+        # requests fail fast while the circuit is open
+        with self.assertRaises(CircuitOpenError):
+            resilience.get_json(URL)
+        self.assertEqual(len(transport.requests), 2)
+
+        # then a single request probes the host
+        with patch("time.time", return_value=circuit_breaker.get_open_until() + 1):
+            self.assertTrue(circuit_breaker.allow())
+            self.assertFalse(circuit_breaker.allow())
+            circuit_breaker.record_success()
+
+        self.assertFalse(circuit_breaker.is_open())
+        stub_transport(self, ['{"objects": []}'])
+        self.assertEqual(resilience.get_json(URL), {"objects": []})
+
+    async def test_async_circuit_breaker(self):
+        transport = stub_transport(self, failing_response)
+
+        with override_settings(MAGNET_DATA_RETRIES=1):
+            for _ in range(2):
+                with self.assertRaises(TransportError):
+                    await resilience.aget_json(URL)
+        with self.assertRaises(CircuitOpenError):
+            await resilience.aget_json(URL)
+        self.assertEqual(len(transport.requests), 4)
+
+    @override_settings(MAGNET_DATA_RETRY_BACKOFF=0.5)
+    def test_max_fetch_time(self):
+        # three attempts of 5 seconds to connect and 30 to read, and the waits
+        # of up to 0.5 and 1 second before the retries
+        self.assertEqual(resilience.get_max_fetch_time(), 106.5)
+
+    def test_failed_holiday_updates_are_released(self):
+        transport = stub_transport(self, failing_response)
+
+        # without stored holidays the error is raised, and the next update
+        # fetches them again instead of reading an empty year
+        with self.assertRaises(TransportError):
+            MagnetDataClient().holidays.update("CL", 2022)
+        refresh = HolidayRefresh.objects.get(country_code="CL", year=2022)
+        self.assertIsNone(refresh.claimed_at)
+        self.assertIsNone(refresh.updated_at)
+
+        # the stored holidays are used while the api is down
+        Holiday.objects.create(
+            country_code="CL", date=datetime.date(2022, 9, 19), name="Fiestas"
+        )
+        holidays = MagnetDataClient().holidays
+        with self.assertLogs("magnet_data", "WARNING"):
+            self.assertFalse(
+                holidays.is_business_day(datetime.date(2022, 9, 19), "CL")
+            )
+        self.assertEqual(len(transport.requests), 6)
+
+        # and they are fetched again after the circuit breaker timeout, not a day
+        refresh.refresh_from_db()
+        retry_at = refresh.updated_at + datetime.timedelta(1)
+        self.assertLess(retry_at, timezone.now() + datetime.timedelta(minutes=1))
+
+    def test_invalid_holiday_responses_are_released(self):
+        transport = stub_transport(self, lambda url: b"<html>maintenance</html>")
+
+        with self.assertRaises(ValueError):
+            MagnetDataClient().holidays.update("CL", 2023)
+        with self.assertRaises(ValueError):
+            MagnetDataClient().holidays.is_business_day(
+                datetime.date(2023, 9, 18), "CL"
+            )
+        self.assertEqual(len(transport.requests), 2)
+
+        Holiday.objects.create(
+            country_code="CL", date=datetime.date(2023, 9, 18), name="Fiestas"
+        )
+        stub_transport(self, lambda url: '{"results": []}')
+        with self.assertLogs("magnet_data", "WARNING"):
+            self.assertFalse(
+                MagnetDataClient().holidays.is_business_day(
+                    datetime.date(2023, 9, 18), "CL"
+                )
+            )
+
+    async def test_failed_async_holiday_updates_are_released(self):
+        transport = stub_transport(self, lambda url: b"<html>maintenance</html>")
+
+        with self.assertRaises(ValueError):
+            await MagnetDataClient().holidays.aupdate("CL", 2023)
+        with self.assertRaises(ValueError):
+            await MagnetDataClient().holidays.aupdate("CL", 2023)
+        self.assertEqual(len(transport.requests), 2)
+
+    def test_asof_uses_stored_values_while_the_api_fails(self):
+        save_values("USD", "CLP", {datetime.date(2022, 7, 1): Decimal("901")})
+        transport = stub_transport(self, failing_response)
+        usd_to_clp_converter = MagnetDataClient().currencies.get_pair("USD", "CLP")
+
+        with self.assertLogs("magnet_data", "WARNING"):
+            self.assertEqual(
+                usd_to_clp_converter.asof(datetime.date(2022, 7, 20)),
+                Decimal("901"),
+            )
+        self.assertEqual(len(transport.requests), 3)
+
+        with self.assertRaises(TransportError):
+            usd_to_clp_converter.asof(datetime.date(2022, 6, 20))
@@ -0,0 +1,114 @@
+# standard library
+from unittest import skipIf
+from unittest.mock import patch
+import datetime
+
+# django
+from django.test import SimpleTestCase
+
+# magnet data
+from magnet_data.currencies.series import CurrencySeries
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestCurrencySeries(SimpleTestCase):
+    def setUp(self):
+        # a friday, then the next monday and wednesday
+        self.series = CurrencySeries.from_values({
+            datetime.date(2022, 7, 29): 900,
+            datetime.date(2022, 8, 1): 910,
+            datetime.date(2022, 8, 3): 920,
+        })
+
+    def test_lookups(self):
+        self.assertEqual(len(self.series), 3)
+        self.assertEqual(self.series[datetime.date(2022, 8, 1)], 910.0)
+        with self.assertRaises(KeyError):
+            self.series[datetime.date(2022, 7, 30)]
+
+        self.assertIsNone(self.series.asof(datetime.date(2022, 7, 28)))
+        self.assertEqual(self.series.asof(datetime.date(2022, 7, 29)), 900.0)
+        self.assertEqual(self.series.asof(datetime.date(2022, 7, 31)), 900.0)
+        self.assertEqual(self.series.asof(datetime.date(2023, 1, 1)), 920.0)
+
+        self.assertEqual(list(self.series), [
+            (datetime.date(2022, 7, 29), 900.0),
+            (datetime.date(2022, 8, 1), 910.0),
+            (datetime.date(2022, 8, 3), 920.0),
+        ])
+
+    def test_forward_fill(self):
+        self.assertEqual(
+            list(self.series.forward_fill(datetime.date(2022, 8, 4))),
+            [
+                (datetime.date(2022, 7, 29), 900.0),
+                (datetime.date(2022, 7, 30), 900.0),
+                (datetime.date(2022, 7, 31), 900.0),
+                (datetime.date(2022, 8, 1), 910.0),
+                (datetime.date(2022, 8, 2), 910.0),
+                (datetime.date(2022, 8, 3), 920.0),
+                (datetime.date(2022, 8, 4), 920.0),
+            ],
+        )
+        self.assertEqual(len(CurrencySeries().forward_fill()), 0)
+
+    def test_resample_month_end(self):
+        self.assertEqual(
+            list(self.series.resample_month_end()),
+            [
+                (datetime.date(2022, 7, 31), 900.0),
+                (datetime.date(2022, 8, 31), 920.0),
+            ],
+        )
+
+    def check_operations(self):
+        self.assertEqual(
+            list(self.series.inverse()),
+            [
+                (datetime.date(2022, 7, 29), 1 / 900),
+                (datetime.date(2022, 8, 1), 1 / 910),
+                (datetime.date(2022, 8, 3), 1 / 920),
+            ],
+        )
+
+        other_series = CurrencySeries.from_values({
+            datetime.date(2022, 7, 29): 3,
+            datetime.date(2022, 8, 2): 4,
+            datetime.date(2022, 8, 3): 5,
+        })
+        self.assertEqual(
+            list(self.series.divide(other_series)),
+            [
+                (datetime.date(2022, 7, 29), 300.0),
+                (datetime.date(2022, 8, 3), 184.0),
+            ],
+        )
+
+    @skipIf(numpy is None, "NumPy is not installed")
+    def test_operations(self):
+        self.check_operations()
+
+        dates, values = self.series.to_numpy()
+        self.assertEqual(
+            list(dates),
+            list(numpy.array(["2022-07-29", "2022-08-01", "2022-08-03"],
+                             dtype="datetime64[D]")),
+        )
+        self.assertEqual(values.dtype, numpy.float64)
+        self.assertEqual(list(values), [900.0, 910.0, 920.0])
+
+    @patch("magnet_data.currencies.series.numpy", None)
+    def test_operations_without_numpy(self):
+        self.check_operations()
+
+        with self.assertRaises(ImportError):
+            self.series.to_numpy()
+
+    def test_fixed_point(self):
+        series = CurrencySeries.from_values({datetime.date(2022, 7, 29): "927.53"})
+        self.assertEqual(list(series.to_fixed_point()), [927530000])
+        self.assertEqual(list(series.to_fixed_point(2)), [92753])
@@ -0,0 +1,169 @@
+# standard library
+from unittest.mock import patch
+import asyncio
+import threading
+import time
+
+# django
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.test import override_settings
+
+# magnet data
+from magnet_data.currencies.client import update_values
+from magnet_data.singleflight import SingleFlight
+from magnet_data.singleflight import get_lock_cache_key
+from magnet_data.transport import StubTransport
+
+
+def run_in_threads(function, count: int) -> list:
+    """
+    Calls {function} from {count} threads at once, and returns what each call
+    returned or raised
+    """
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = function()
+        except BaseException as e:
+            results[index] = e
+
+    threads = [
+        threading.Thread(target=run, args=(index,)) for index in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.flights = SingleFlight()
+        self.calls = []
+
+    def slow_function(self, result):
+        self.calls.append(result)
+        time.sleep(0.2)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def test_concurrent_calls_are_coalesced(self):
+        results = run_in_threads(
+            lambda: self.flights.do("key", self.slow_function, {"value": 1}), 5
+        )
+
+        self.assertEqual(len(self.calls), 1)
+        for result in results:
+            self.assertIs(result, self.calls[0])
+
+        # calls made after the first one ended run again
+        self.flights.do("key", self.slow_function, {"value": 2})
+        self.flights.do("other key", self.slow_function, {"value": 3})
+        self.assertEqual(len(self.calls), 3)
+
+    def test_errors_are_shared(self):
+        error = ValueError("unavailable")
+        results = run_in_threads(
+            lambda: self.flights.do("key", self.slow_function, error), 3
+        )
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results, [error] * 3)
+
+    def test_interruptions_are_shared(self):
+        class Interrupted(BaseException):
+            pass
+
+        def interrupted_function():
+            self.slow_function(None)
+            raise error
+
+        error = Interrupted()
+        results = run_in_threads(
+            lambda: self.flights.do("key", interrupted_function), 3
+        )
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results, [error] * 3)
+
+    @override_settings(MAGNET_DATA_SINGLE_FLIGHT_TIMEOUT=5)
+    def test_calls_wait_for_other_processes(self):
+        lock_cache_key = get_lock_cache_key("key")
+
+        self.assertEqual(self.flights.do("key", self.slow_function, 1), 1)
+        self.assertIsNone(cache.get(lock_cache_key))
+
+        # another process holds the lock for a while
+        cache.add(lock_cache_key, True, 5)
+        threading.Timer(0.2, cache.delete, args=(lock_cache_key,)).start()
+
+        start = time.monotonic()
+        self.assertIsNone(self.flights.do("key", self.slow_function, 2))
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(self.calls, [1])
+
+    async def test_async_calls_are_coalesced(self):
+        async def slow_function(result):
+            self.calls.append(result)
+            await asyncio.sleep(0.1)
+            return result
+
+        results = await asyncio.gather(*[
+            self.flights.ado("key", slow_function, {"value": 1})
+            for _ in range(5)
+        ])
+
+        self.assertEqual(len(self.calls), 1)
+        for result in results:
+            self.assertIs(result, self.calls[0])
+
+    async def test_async_errors_are_shared(self):
+        async def failing_function():
+            self.calls.append(None)
+            await asyncio.sleep(0.1)
+            raise ValueError("unavailable")
+
+        results = await asyncio.gather(*[
+            self.flights.ado("key", failing_function) for _ in range(3)
+        ], return_exceptions=True)
+
+        self.assertEqual(len(self.calls), 1)
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+
+    async def test_async_cancellations_are_shared(self):
+        async def slow_function():
+            self.calls.append(None)
+            await asyncio.sleep(1)
+
+        leader = asyncio.ensure_future(self.flights.ado("key", slow_function))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(self.flights.ado("key", slow_function))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(waiter, 0.5)
+        self.assertEqual(len(self.calls), 1)
+
+        # the next call runs again
+        self.assertIsNone(await self.flights.ado("key", slow_function))
+        self.assertEqual(len(self.calls), 2)
+
+    @patch("magnet_data.currencies.client.sync_values")
+    def test_concurrent_updates_fetch_once(self, mock_sync_values):
+        def get_response(url):
+            time.sleep(0.2)
+            return '{"objects": [{"date": "2022-07-05", "value": "900"}]}'
+
+        transport = StubTransport(get_response)
+        with patch("magnet_data.transport.get_transport", return_value=transport):
+            run_in_threads(lambda: update_values(2022, 7, "USD", "CLP"), 5)
+
+        self.assertEqual(len(transport.requests), 1)
+        self.assertEqual(mock_sync_values.call_count, 1)
@@ -0,0 +1,100 @@
+# standard library
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+import datetime
+import os
+import tempfile
+
+# django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.test import override_settings
+
+# magnet data
+from magnet_data.currencies import store
+from magnet_data.currencies.cache import currency_cache
+from magnet_data.currencies.client import save_values
+from magnet_data.currencies.store import RateStore
+from magnet_data.currencies.store import write_rate_store
+from magnet_data.magnet_data_client import MagnetDataClient
+
+
+class TestRateStore(TestCase):
+    def setUp(self):
+        cache.clear()
+        currency_cache.clear_local()
+        store.stores.clear()
+        self.addCleanup(store.stores.clear)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "rates")
+
+        save_values("USD", "CLP", {
+            datetime.date(2022, 7, 4): Decimal("927.53"),
+            datetime.date(2022, 7, 5): Decimal("932.080001"),
+        })
+        save_values("CLF", "CLP", {
+            datetime.date(2022, 7, 5): Decimal("33152.68"),
+        })
+
+    def test_values_are_read_from_the_store(self):
+        stdout = StringIO()
+        call_command("magnet_data_rate_store", path=self.path, stdout=stdout)
+        self.assertIn("Wrote 3 values", stdout.getvalue())
+
+        currencies = MagnetDataClient().currencies
+        date = datetime.date(2022, 7, 5)
+        with override_settings(MAGNET_DATA_RATE_STORE_PATH=self.path):
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    currencies.get_pair("USD", "CLP").on_date(date),
+                    Decimal("932.080001"),
+                )
+                self.assertEqual(
+                    currencies.get_pair("CLP", "CLF").on_date(date),
+                    1 / Decimal("33152.68"),
+                )
+                self.assertEqual(
+                    currencies.get_pair("USD", "CLF").on_date(date),
+                    Decimal("33152.68") / Decimal("932.080001"),
+                )
+
+            # values that are not in the store are read as usual
+            save_values("USD", "CLP", {datetime.date(2022, 7, 6): Decimal("940")})
+            with self.assertNumQueries(1):
+                self.assertEqual(
+                    currencies.get_pair("USD", "CLP").on_date(
+                        datetime.date(2022, 7, 6)
+                    ),
+                    Decimal("940"),
+                )
+
+    def test_replaced_files_are_mapped_again(self):
+        write_rate_store(self.path)
+        date = datetime.date(2022, 7, 6)
+
+        with override_settings(MAGNET_DATA_RATE_STORE_PATH=self.path):
+            rate_store = store.get_rate_store()
+            self.assertIsNone(rate_store.get("USD", date))
+
+            save_values("USD", "CLP", {date: Decimal("940")})
+            write_rate_store(self.path)
+
+            # the file is checked again after a while
+            self.assertIs(store.get_rate_store(), rate_store)
+            with patch("magnet_data.currencies.store.CHECK_INTERVAL", 0):
+                rate_store = store.get_rate_store()
+            self.assertEqual(rate_store.get("USD", date), Decimal("940"))
+            self.assertEqual(rate_store.get("EUR", date), None)
+
+    def test_missing_and_invalid_files(self):
+        with override_settings(MAGNET_DATA_RATE_STORE_PATH=self.path):
+            self.assertIsNone(store.get_rate_store())
+
+        with open(self.path, "wb") as store_file:
+            store_file.write(b"not a rate store")
+        with self.assertRaises(ValueError):
+            RateStore(self.path)
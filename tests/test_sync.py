@@ -0,0 +1,96 @@
+# standard library
+from io import StringIO
+from unittest.mock import patch
+import datetime
+
+# django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+# magnet data
+from magnet_data.currencies.cache import currency_cache
+from magnet_data.magnet_data_client import MagnetDataClient
+from magnet_data.models import CurrencyValue
+from magnet_data.models import SyncState
+from tests.test_django_magnet_data import july_2022_values
+from tests.test_django_magnet_data import mock_currencies_api
+
+
+@patch("magnet_data.utils.today", return_value=datetime.date(2022, 7, 12))
+class TestSync(TestCase):
+    def setUp(self):
+        cache.clear()
+        currency_cache.clear_local()
+
+        # USD is published until the 20th of july
+        self.usd_values = {
+            date: value
+            for date, value in july_2022_values("USD").items()
+            if date.day <= 20
+        }
+        clf_values = july_2022_values("CLF")
+        for date, value in list(clf_values.items()):
+            clf_values[date.replace(month=8)] = value
+        self.transport = mock_currencies_api(self, {
+            "USD": self.usd_values,
+            "CLF": clf_values,
+        })
+
+    def sync(self, **options) -> str:
+        stdout = StringIO()
+        call_command(
+            "magnet_data_sync", currencies="USD,CLF", stdout=stdout, **options
+        )
+        return stdout.getvalue()
+
+    def test_sync(self, mock_today):
+        # the current month, and the months of CLF published beforehand
+        self.assertIn("Fetched 3 months, 3 changed, 0 closed", self.sync())
+        self.assertEqual(CurrencyValue.objects.count(), 14 + 31 + 31)
+        self.assertEqual(
+            set(SyncState.objects.values_list(
+                "base_currency", "year", "month", "row_count", "closed"
+            )),
+            {
+                ("USD", 2022, 7, 14, False),
+                ("CLF", 2022, 7, 31, False),
+                ("CLF", 2022, 8, 31, False),
+            },
+        )
+
+        # unchanged months are not written again
+        with patch("magnet_data.magnet_data_client.save_values") as mock_save_values:
+            self.assertIn("Fetched 3 months, 0 changed, 0 closed", self.sync())
+        self.assertFalse(mock_save_values.called)
+
+        # once july ends it is fetched a last time, and never again
+        mock_today.return_value = datetime.date(2022, 8, 10)
+        self.assertIn(
+            "Fetched 5 months, 2 changed, 0 closed", self.sync(start="2022-07")
+        )
+        self.assertIn(
+            "Fetched 3 months, 0 changed, 2 closed", self.sync(start="2022-07")
+        )
+        self.assertIn(
+            "Fetched 5 months, 0 changed, 0 closed",
+            self.sync(start="2022-07", force=True),
+        )
+        self.assertEqual(len(self.transport.requests), 19)
+
+    def test_closed_months_are_complete(self, mock_today):
+        mock_today.return_value = datetime.date(2022, 8, 10)
+        self.sync(start="2022-07")
+        requests = len(self.transport.requests)
+
+        # july has no USD values after the 20th, but it was closed when fetched
+        values = MagnetDataClient().currencies.get_pair("USD", "CLP").on_month(2022, 7)
+        self.assertEqual(len(values), 14)
+        self.assertEqual(len(self.transport.requests), requests)
+
+    def test_invalid_options(self, mock_today):
+        with self.assertRaises(CommandError):
+            call_command("magnet_data_sync", currencies="UF")
+        with self.assertRaises(CommandError):
+            call_command("magnet_data_sync", start="july")
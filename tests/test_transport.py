@@ -0,0 +1,157 @@
+# standard library
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import asyncio
+import gzip
+import threading
+import time
+
+# django
+from django.test import SimpleTestCase
+from django.test import override_settings
+
+# magnet data
+from magnet_data import transport
+from magnet_data.transport import HTTPTransport
+from magnet_data.transport import Response
+from magnet_data.transport import StubTransport
+from magnet_data.transport import TransportError
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        self.server.paths.append(self.path)
+
+        if self.path == "/slow/":
+            time.sleep(0.5)
+        if self.path == "/missing/":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = b'{"objects": []}'
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        # close the connection without telling the client, like servers do
+        # with idle connections
+        if self.path == "/close/":
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients that time out leave broken pipes behind
+        pass
+
+
+class TestHTTPTransport(SimpleTestCase):
+    def setUp(self):
+        self.server = APIServer(("127.0.0.1", 0), APIHandler)
+        self.server.connections = set()
+        self.server.paths = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        self.transport = HTTPTransport(connect_timeout=1, read_timeout=0.2)
+        self.addCleanup(self.transport.close)
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            self.assertEqual(
+                self.transport.get_json(f"{self.url}/values/"), {"objects": []}
+            )
+
+        self.assertEqual(len(self.server.paths), 5)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_closed_connections_are_reopened(self):
+        self.transport.get_json(f"{self.url}/close/")
+        time.sleep(0.05)
+
+        self.assertEqual(
+            self.transport.get_json(f"{self.url}/values/"), {"objects": []}
+        )
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_gzip(self):
+        response = self.transport.fetch(f"{self.url}/values/")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.body, b'{"objects": []}')
+
+    def test_errors(self):
+        with self.assertRaises(TransportError) as context:
+            self.transport.get_json(f"{self.url}/missing/")
+        self.assertEqual(context.exception.status, 404)
+
+        with self.assertRaises(TransportError) as context:
+            self.transport.get_json(f"{self.url}/slow/")
+        self.assertIsNone(context.exception.status)
+
+        # the connection is not reused after a timeout
+        self.assertEqual(
+            self.transport.get_json(f"{self.url}/values/"), {"objects": []}
+        )
+
+
+class TestAsyncTransport(SimpleTestCase):
+    async def test_concurrent_fetches_run_in_parallel(self):
+        def get_response(url):
+            time.sleep(0.2)
+            return '{"url": "%s"}' % url
+
+        stub_transport = StubTransport(get_response)
+        start = time.monotonic()
+        results = await asyncio.gather(*[
+            stub_transport.aget_json(f"https://api/{number}/")
+            for number in range(4)
+        ])
+
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertEqual(
+            results, [{"url": f"https://api/{number}/"} for number in range(4)]
+        )
+
+    async def test_errors(self):
+        stub_transport = StubTransport([Response(503, {}, b"")])
+        with self.assertRaises(TransportError) as context:
+            await stub_transport.aget_json("https://api/")
+        self.assertEqual(context.exception.status, 503)
+
+
+class TestGetTransport(SimpleTestCase):
+    def test_default_transport_is_shared(self):
+        self.assertIsInstance(transport.get_transport(), HTTPTransport)
+        self.assertIs(transport.get_transport(), transport.get_transport())
+
+    def test_transport_setting(self):
+        stub_transport = StubTransport(['{"objects": [1]}'])
+        with override_settings(MAGNET_DATA_TRANSPORT=stub_transport):
+            self.assertEqual(
+                transport.get_transport().get_json("https://api/"),
+                {"objects": [1]},
+            )
+        self.assertEqual(stub_transport.requests, [("https://api/", {})])
+
+    @override_settings(MAGNET_DATA_API_URL="http://localhost:8000/api/")
+    def test_api_url_setting(self):
+        self.assertEqual(
+            transport.get_url("holidays/cl/2023/"),
+            "http://localhost:8000/api/holidays/cl/2023/",
+        )